@@ -1,39 +1,45 @@
-import os
 import streamlit as st
-import pandas as pd
-from dotenv import load_dotenv
-from supabase import create_client, Client
-from datetime import datetime # Import datetime for random comment function
+from supabase import Client
 
 # Importiere die Funktionen aus deinen Modulen
+from app_modules.db import get_client, get_user_client, has_credentials, new_client
 from app_modules.eintragen import main_app_eintragen
 from app_modules.auswertung import main_app_auswertung
 # from app_modules.map import main_app_map # ENTFERNT: Öffentliche Karte wird nicht mehr verwendet
 from app_modules.utils import display_last_climbed_rocks
 from app_modules.filtermap import show_filter_map_page
+from app_modules.quotes import random_quote
+from app_modules.home import HomeData, load_home_data
+from app_modules.leaderboard import show_leaderboard_page
+from app_modules.catalog import reload_catalog
 
-# .env laden
-load_dotenv()
-
-# Supabase-Verbindung initialisieren (Globale Initialisierung)
-SUPABASE_URL = os.environ.get("SUPABASE_URL")
-SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
-
+# Supabase-Verbindung holen (der Client wird einmal pro Prozess erstellt und wiederverwendet)
 supabase: Client = None # Initialisiere supabase als None
 is_supabase_ready = False # Neuer Status-Flag für Supabase-Verbindung
 
-if not SUPABASE_URL or not SUPABASE_KEY:
+if not has_credentials():
     st.error("FEHLER: SUPABASE_URL oder SUPABASE_KEY wurden nicht gefunden. Stellen Sie sicher, dass Ihre .env-Datei korrekt ist und die Variablen gesetzt sind.")
     st.info("Die Anwendung kann ohne Datenbankverbindung nicht gestartet werden.")
 else:
     try:
-        supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+        supabase = get_client()
         is_supabase_ready = True # Setze Flag auf True, wenn Verbindung erfolgreich
     except Exception as e:
         st.error(f"FEHLER: Verbindung zur Supabase-Datenbank fehlgeschlagen: {e}")
         st.info("Bitte überprüfen Sie Ihre Internetverbindung und die Supabase-Konfiguration.")
 
 
+def get_auth_client() -> Client:
+    """
+    Eigener Client pro Sitzung für Login/Logout, damit die Anmeldung eines Benutzers
+    nicht den geteilten Daten-Client der anderen Sitzungen verändert. Nach dem Login
+    laufen alle Abfragen mit Benutzerdaten über diesen Client (get_user_client).
+    """
+    if st.session_state.get("auth_client") is None:
+        st.session_state.auth_client = new_client()
+    return st.session_state.auth_client
+
+
 # --- ✅ FERTIGES UX-FARBSCHEMA (WCAG + Hover optimiert) ---
 
 # === MARKENFARBEN ===
@@ -222,112 +228,54 @@ html, body, .stMarkdown p, .stText, .stDataFrame,
 
 
 # --- NEUE FUNKTION: Zufälligen Kommentar anzeigen ---
-def display_random_comment(supabase_client: Client, user_id: str):
+def display_random_comment(supabase_client: Client, user_id: str, home_data: HomeData | None = None):
     """
     Holt einen zufälligen Kommentar des Benutzers zusammen mit Gipfelname und Datum
     und zeigt ihn in einem formatierten Kasten an.
+    home_data: bereits vom Home-Loader geladenes Zitat, sonst wird hier geladen.
     """
     # Überschrift "Zitat" in HIGHLIGHT_COLOR 
     st.markdown(f'<div class="headline-fonts" style="font-size: 16px; color: {HIGHLIGHT_COLOR};">Zitat</div>', unsafe_allow_html=True)
 
-    # --- KONFIGURIERE DEN KOMMENTAR-SPALTENNAMEN HIER ---
-    # Dieser Name MUSS GENAU dem Spaltennamen in deiner Supabase-Tabelle entsprechen.
-    # Beispiel: 'kommentar', 'notes', 'comments', 'bemerkung'
-    COMMENT_COLUMN_NAME_IN_DB = 'kommentar' # <--- HIER ANPASSEN, WENN DER NAME IN DER DB ANDERS IST!
-
-    # --- DEBUG SCHALTER ---
-    # Setze diesen auf True, um die Spaltennamen und Daten im Terminal zu sehen.
-    # Nach dem Debugging auf False setzen oder entfernen.
-    DEBUG_MODE_RANDOM_COMMENT = False # Standardmäßig auf False gesetzt, kann bei Bedarf auf True gesetzt werden
-
     try:
-        # Gezielter Abruf von Begehungen mit Kommentaren für den aktuellen Benutzer
-        # Wir holen nur die benötigten Spalten: gipfel_id, datum, und die Kommentarspalte
-        comment_ascents_data = supabase_client.table("ascents").select(
-            f"gipfel_id, datum, {COMMENT_COLUMN_NAME_IN_DB}"
-        ).eq("user_id", user_id).execute().data
-
-        comment_df = pd.DataFrame(comment_ascents_data)
-
-        if DEBUG_MODE_RANDOM_COMMENT:
-            print(f"\n--- DEBUG (app.py - Kommentar-Abruf) ---")
-            print(f"Spalten in 'comment_df' nach Abruf: {comment_df.columns.tolist()}")
-            if COMMENT_COLUMN_NAME_IN_DB in comment_df.columns:
-                print(f"'{COMMENT_COLUMN_NAME_IN_DB}' existiert in 'comment_df'.")
-                print(f"Datentyp von '{COMMENT_COLUMN_NAME_IN_DB}': {comment_df[COMMENT_COLUMN_NAME_IN_DB].dtype}")
-                print(f"Erste 5 Einträge von '{COMMENT_COLUMN_NAME_IN_DB}':\n{comment_df[COMMENT_COLUMN_NAME_IN_DB].head()}")
-                print(f"Anzahl nicht-leerer Kommentare (vor Filterung): {comment_df[COMMENT_COLUMN_NAME_IN_DB].notna().sum()}")
-            else:
-                print(f"WARNUNG: Spalte '{COMMENT_COLUMN_NAME_IN_DB}' NICHT in 'comment_df' vorhanden nach Abruf!")
-            print("--- ENDE DEBUG ---\n")
-
-        if not comment_df.empty and COMMENT_COLUMN_NAME_IN_DB in comment_df.columns:
-            # Datum konvertieren und Kommentarspalte bereinigen
-            comment_df['datum'] = pd.to_datetime(comment_df['datum'], errors='coerce')
-            comment_df[COMMENT_COLUMN_NAME_IN_DB] = comment_df[COMMENT_COLUMN_NAME_IN_DB].astype(str).replace('None', '').str.strip()
-
-            # Filtere nach nicht-leeren Kommentaren und gültigem Datum
-            filtered_comments = comment_df[
-                comment_df[COMMENT_COLUMN_NAME_IN_DB].notna() &
-                (comment_df[COMMENT_COLUMN_NAME_IN_DB] != '') &
-                comment_df['datum'].notna()
-            ].copy()
-
-            if not filtered_comments.empty:
-                # Hole die Rocks-Daten, um den Gipfelnamen zu bekommen
-                unique_gipfel_ids = filtered_comments['gipfel_id'].unique().tolist()
-                rocks_data = supabase_client.table("rocks").select("id, name").in_("id", unique_gipfel_ids).execute().data
-                rocks_df = pd.DataFrame(rocks_data)
-
-                # Mergen der Kommentare mit den Gipfelnamen
-                merged_for_display = filtered_comments.merge(
-                    rocks_df,
-                    left_on='gipfel_id',
-                    right_on='id',
-                    how='left'
-                ).rename(columns={'name': 'Gipfel_Name'})
-
-                # Zufällige Auswahl eines Eintrags
-                random_entry = merged_for_display.sample(n=1).iloc[0]
-
-                rock_name = random_entry['Gipfel_Name'] if pd.notna(random_entry['Gipfel_Name']) else "Unbekannter Gipfel"
-                datum = random_entry['datum'].strftime('%d.%m.%Y')
-                kommentar = random_entry[COMMENT_COLUMN_NAME_IN_DB]
-
-                st.markdown(f"""
-                <div style="
-                    background-color: {BG_COLOR};
-                    padding: 15px;
-                    border-radius: 10px;
-                    border: 1px solid {PLOT_OUTLINE_COLOR};
-                    margin-top: 20px;
-                    min-height: 200px; /* Angepasste Mindesthöhe für den Kasten */
-                    display: flex;
-                    flex-direction: column;
-                    justify-content: center;
-                ">
-                    <p style="font-family: 'Noto Sans', sans-serif; color: {TEXT_COLOR}; font-size: 16px; margin-bottom: 5px;">
-                        <b>Gipfel:</b> {rock_name}
-                    </p>
-                    <p style="font-family: 'Noto Sans', sans-serif; color: {TEXT_COLOR}; font-size: 18px; margin-bottom: 15px;">
-                        <b>Datum:</b> {datum}
-                    </p>
-                    <p style="font-family: 'Noto Sans', sans-serif; color: {TEXT_COLOR}; font-size: 20px; font-style: italic;">
-                        "{kommentar}"
-                    </p>
-                </div>
-                """, unsafe_allow_html=True)
-            else:
-                st.info("Keine Einträge mit Kommentaren gefunden, um ein Zitat anzuzeigen.")
+        # Ein zufälliges Zitat: eine Zeile aus dem Kommentar-Index, Gipfelname aus dem Katalog
+        if home_data is None:
+            quote = random_quote(user_id, supabase_client)
+        elif home_data.quote_error is not None:
+            raise home_data.quote_error
+        else:
+            quote = home_data.quote
+
+        if quote is not None:
+            rock_name = quote['rock_name'] if quote['rock_name'] else "Unbekannter Gipfel"
+            datum = quote['datum'].strftime('%d.%m.%Y')
+            kommentar = quote['kommentar']
+
+            st.markdown(f"""
+            <div style="
+                background-color: {BG_COLOR};
+                padding: 15px;
+                border-radius: 10px;
+                border: 1px solid {PLOT_OUTLINE_COLOR};
+                margin-top: 20px;
+                min-height: 200px; /* Angepasste Mindesthöhe für den Kasten */
+                display: flex;
+                flex-direction: column;
+                justify-content: center;
+            ">
+                <p style="font-family: 'Noto Sans', sans-serif; color: {TEXT_COLOR}; font-size: 16px; margin-bottom: 5px;">
+                    <b>Gipfel:</b> {rock_name}
+                </p>
+                <p style="font-family: 'Noto Sans', sans-serif; color: {TEXT_COLOR}; font-size: 18px; margin-bottom: 15px;">
+                    <b>Datum:</b> {datum}
+                </p>
+                <p style="font-family: 'Noto Sans', sans-serif; color: {TEXT_COLOR}; font-size: 20px; font-style: italic;">
+                    "{kommentar}"
+                </p>
+            </div>
+            """, unsafe_allow_html=True)
         else:
-            missing_cols = []
-            if COMMENT_COLUMN_NAME_IN_DB not in comment_df.columns:
-                missing_cols.append(f"'{COMMENT_COLUMN_NAME_IN_DB}' (Kommentarspalte)")
-            if 'gipfel_id' not in comment_df.columns:
-                missing_cols.append("'gipfel_id'")
-            if 'datum' not in comment_df.columns:
-                missing_cols.append("'datum'")
-            st.warning(f"Fehlende Spalten für Zufallszitat: {', '.join(missing_cols)}. Bitte prüfen Sie die Daten.")
+            st.info("Keine Einträge mit Kommentaren gefunden, um ein Zitat anzuzeigen.")
 
     except Exception as e:
         st.error(f"Fehler beim Anzeigen des zufälligen Kommentars: {e}")
@@ -357,7 +305,7 @@ def login_register_ui():
             if st.button("Login", use_container_width=True):
                 if supabase:
                     try:
-                        response = supabase.auth.sign_in_with_password({"email": email, "password": password})
+                        response = get_auth_client().auth.sign_in_with_password({"email": email, "password": password})
                         st.session_state.user_id = response.user.id
                         st.session_state.user_email = response.user.email
                         st.session_state.current_page = "home_private"
@@ -372,7 +320,7 @@ def login_register_ui():
             if st.button("Registrieren", use_container_width=True):
                 if supabase:
                     try:
-                        response = supabase.auth.sign_up({"email": email, "password": password})
+                        response = get_auth_client().auth.sign_up({"email": email, "password": password})
                         st.session_state.user_id = response.user.id
                         st.session_state.user_email = response.user.email
                         st.session_state.current_page = "home_private"
@@ -387,8 +335,9 @@ def login_register_ui():
 def logout_ui():
     st.sidebar.markdown(f"Eingeloggt als: **{st.session_state.user_email}**")
     if st.sidebar.button("Logout"):
-        if supabase:
-            supabase.auth.sign_out()
+        if st.session_state.get("auth_client") is not None:
+            st.session_state.auth_client.auth.sign_out()
+            st.session_state.auth_client = None
         st.session_state.user_id = None
         st.session_state.user_email = None
         st.session_state.current_page = "home_public"
@@ -428,8 +377,13 @@ def private_navigation_ui():
         st.session_state.current_page = "filterkarte"
     if st.sidebar.button("Statistik"):
         st.session_state.current_page = "statistik"
+    if st.sidebar.button("Rangliste"):
+        st.session_state.current_page = "rangliste"
 
     st.sidebar.markdown("---")
+    if st.sidebar.button("Felsdaten neu laden", help="Nach Änderungen an Felsen oder Routen in der Datenbank"):
+        reload_catalog()
+        st.sidebar.success("Felsdaten werden neu geladen.")
     logout_ui()
 
 # --- Haupt-App-Layout ---
@@ -454,24 +408,31 @@ def main_app_flow():
             login_register_ui()
 
     elif st.session_state.user_id:
+        # Benutzerdaten über den angemeldeten Client der Sitzung (RLS als 'authenticated')
+        user_client = get_user_client()
         if st.session_state.current_page == "home_private":
             st.header(f"Willkommen zurück, {st.session_state.user_email}!")
             st.write("Dies ist Ihre persönliche Felsenapp-Startseite.")
             st.write("Wählen Sie eine Option aus der Navigation in der Seitenleiste.")
 
             st.markdown("---")
+            # Zitat und letzte Gipfel gemeinsam (parallel) laden
+            home_data = load_home_data(st.session_state.user_id, user_client, num_rocks=10)
             # Zitat oben, dann die letzten Gipfel
-            display_random_comment(supabase, st.session_state.user_id)
+            display_random_comment(user_client, st.session_state.user_id, home_data=home_data)
             st.markdown("---") # Trennlinie zwischen Zitat und letzten Gipfeln
-            display_last_climbed_rocks(supabase, st.session_state.user_id, num_rocks=10)
+            display_last_climbed_rocks(user_client, st.session_state.user_id, num_rocks=10,
+                                       last_climbs=home_data.last_climbs, error=home_data.last_climbs_error)
             st.markdown("---")
 
         elif st.session_state.current_page == "eintragen":
             main_app_eintragen()
         elif st.session_state.current_page == "filterkarte":
-            show_filter_map_page(supabase)
+            show_filter_map_page(user_client)
         elif st.session_state.current_page == "statistik":
             main_app_auswertung()
+        elif st.session_state.current_page == "rangliste":
+            show_leaderboard_page(user_client)
         else:
             st.error("Unbekannte Seite oder Zugriff verweigert. Bitte wählen Sie eine Seite aus der Navigation.")
             st.session_state.current_page = "home_private"
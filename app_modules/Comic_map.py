@@ -2,27 +2,17 @@ import streamlit as st
 import pandas as pd
 import folium
 from streamlit_folium import st_folium
-from supabase import create_client, Client
-import os
-from dotenv import load_dotenv
-import math
+import numpy as np
 
-# Lade Umgebungsvariablen
-load_dotenv()
+from app_modules.catalog import get_catalog
+from app_modules.db import fetch_all_rows, has_credentials
+from app_modules.invalidation import depends_on
+from app_modules.map_geometry import triangle_feature_collection, triangle_layer
 
-url = os.getenv("SUPABASE_URL")
-key = os.getenv("SUPABASE_KEY")
-
-if not url or not key:
+if not has_credentials():
     st.error("Fehler: SUPABASE_URL oder SUPABASE_KEY wurden nicht gefunden. Stellen Sie sicher, dass Ihre .env-Datei korrekt ist.")
     st.stop()
 
-try:
-    supabase: Client = create_client(url, key)
-except Exception as e:
-    st.error(f"Fehler beim Erstellen des Supabase-Clients: {e}")
-    st.stop()
-
 # Globale Liste, um Debug-Nachrichten zu sammeln
 debug_messages = []
 
@@ -39,63 +29,45 @@ def display_debug_info():
     else:
         st.info("Keine Debugging-Informationen gesammelt (oder alle Debug-Nachrichten sind deaktiviert).")
 
+@depends_on("ascents")
 @st.cache_data
+def fetch_ascents():
+    """Holt alle Begehungen aus Supabase."""
+    return pd.DataFrame(fetch_all_rows("ascents", "id, datum, gipfel_id, route_id, partnerin, stil, kommentar, bewertung"))
+
 def fetch_data():
     """
-    Holt alle notwendigen Daten aus Supabase:
-    Sektoren, Rocks (mit verknüpftem Sektornamen), Routen und Begehungen.
+    Holt alle notwendigen Daten:
+    Sektoren, Rocks (mit verknüpftem Sektornamen) und Routen aus dem Katalog,
+    Begehungen aus Supabase.
     """
     try:
         add_debug_message("DEBUG FETCH_DATA: Start fetching data.")
 
-        # 1. Sektoren laden
-        sectors_response = supabase.table("sector").select("id, name").execute()
-        sectors_df = pd.DataFrame(sectors_response.data)
+        # 1.-3. Sektoren, Felsen (mit Gebiet) und Routen aus dem gemeinsamen Katalog
+        catalog = get_catalog()
+
+        sectors_df = catalog.sectors
         add_debug_message(f"DEBUG FETCH_DATA: Sektoren geladen: {len(sectors_df)}")
         if sectors_df.empty:
             st.warning("Keine Sektoren vorhanden.")
             return pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
-        sectors_df['id'] = sectors_df['id'].astype(int)
 
-        # 2. Felsen laden
-        rocks_response = supabase.table("rocks").select("id, name, sector_id, latitude, longitude, hoehe").execute()
-        rocks_df = pd.DataFrame(rocks_response.data)
+        # Kopie, da app() die Felsen-Tabelle um weitere Spalten ergänzt
+        rocks_df = catalog.rocks.copy()
         add_debug_message(f"DEBUG FETCH_DATA: Felsen geladen: {len(rocks_df)}")
         if rocks_df.empty:
             st.warning("Keine Felsen vorhanden.")
             return pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
-        rocks_df['id'] = rocks_df['id'].astype(int)
-        rocks_df['sector_id'] = rocks_df['sector_id'].astype(int)
-
-        # Verknüpfen mit Sector-Name und Rock-ID erhalten
-        rocks_df = rocks_df.merge(
-            sectors_df,
-            left_on="sector_id",
-            right_on="id",
-            how="left",
-            suffixes=('_rock', '_sector')
-        )
-        rocks_df.rename(columns={
-            "id_rock": "id",        # ID des Felsens wiederherstellen
-            "name_rock": "name",    # Name des Felsens
-            "name_sector": "gebiet" # Gebiet vom Sektor
-        }, inplace=True)
-        rocks_df.drop(columns=['id_sector'], errors='ignore', inplace=True)
-
-        # 3. Routen laden
-        routes_response = supabase.table("routes").select("id, rock_id, name, grade, number, stern").execute()
-        routes_df = pd.DataFrame(routes_response.data)
+
+        routes_df = catalog.routes
         add_debug_message(f"DEBUG FETCH_DATA: Routen geladen: {len(routes_df)}")
         if routes_df.empty:
             st.warning("Keine Routen vorhanden.")
             return rocks_df, pd.DataFrame(), pd.DataFrame(), sectors_df
-        routes_df['id'] = routes_df['id'].astype(int)
-        routes_df['rock_id'] = routes_df['rock_id'].astype(int)
-        routes_df['stern'] = routes_df.get('stern', False).astype(bool)
 
         # 4. Begehungen laden
-        ascents_response = supabase.table("ascents").select("id, datum, gipfel_id, route_id, partnerin, stil, kommentar, bewertung").execute()
-        ascents_df = pd.DataFrame(ascents_response.data)
+        ascents_df = fetch_ascents()
         add_debug_message(f"DEBUG FETCH_DATA: Begehungen geladen: {len(ascents_df)}")
         if ascents_df.empty:
             st.info("Keine Begehungen vorhanden.")
@@ -121,17 +93,35 @@ def fetch_data():
         return pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
 
 
-def make_triangle(lat, lon, size=0.001):
-    if pd.isna(lat) or pd.isna(lon) or pd.isna(size) or size <= 0:
-        return None
-    try:
-        return [
-            [lat + size, lon],
-            [lat - size / 2, lon - size * math.sqrt(3)/2],
-            [lat - size / 2, lon + size * math.sqrt(3)/2],
-        ]
-    except TypeError:
-        return None
+@depends_on("ascents", "routes")
+@st.cache_data
+def fetch_rock_ascent_summary():
+    """
+    Höchste Bewertung (max_rating_per_rock) und erster Kommentar (kommentar) pro Rock,
+    über route_id -> rock_id aus allen Begehungen. Index = Rock-id.
+    """
+    ascents_df = fetch_ascents()
+    summary = pd.DataFrame(columns=['max_rating_per_rock', 'kommentar'], index=pd.Index([], name='rock_id'))
+    if ascents_df.empty or not {'route_id', 'bewertung', 'kommentar', 'datum'}.issubset(ascents_df.columns):
+        return summary
+
+    route_rocks = get_catalog().routes.set_index('id')['rock_id']
+    ascents_df = ascents_df.assign(
+        rock_id=pd.to_numeric(ascents_df['route_id'], errors='coerce').map(route_rocks),
+        bewertung=pd.to_numeric(ascents_df['bewertung'], errors='coerce').fillna(0).astype(int),
+        datum=pd.to_datetime(ascents_df['datum'], errors='coerce'),
+    ).dropna(subset=['rock_id'])
+    if ascents_df.empty:
+        return summary
+
+    max_rating = ascents_df.groupby('rock_id')['bewertung'].max()
+    # Kommentar der ersten Begehung (nach Datum) mit Kommentar
+    first_comment = ascents_df.dropna(subset=['kommentar']).sort_values('datum').drop_duplicates('rock_id').set_index('rock_id')['kommentar']
+    summary = pd.DataFrame({'max_rating_per_rock': max_rating, 'kommentar': first_comment})
+    summary.index = summary.index.astype(int)
+    summary.index.name = 'rock_id'
+    return summary
+
 
 def app():
     st.set_page_config(layout="wide")
@@ -148,52 +138,15 @@ def app():
     add_debug_message(f"DEBUG APP: rocks_df columns: {rocks_df.columns.tolist()}")
 
     # --- Vorberechnungen für Rocks (basierend auf Routen und Begehungen) ---
-    # 🔹 Berechne die Anzahl der Routen pro Rock
-    if 'id' in routes_df.columns and 'rock_id' in routes_df.columns:
-        route_counts = routes_df.groupby("rock_id").size().reset_index(name="anzahl_routen")
-        rocks_df = rocks_df.merge(route_counts, left_on="id", right_on="rock_id", how="left", suffixes=('', '_route_count'))
-        rocks_df["anzahl_routen"] = rocks_df["anzahl_routen"].fillna(0).astype(int)
-        rocks_df.drop(columns=['rock_id_route_count'], errors='ignore', inplace=True)
-    else:
-        st.warning("Spalten 'id' oder 'rock_id' fehlen in 'routes_df', 'anzahl_routen' kann nicht berechnet werden.")
-        rocks_df["anzahl_routen"] = 0
-
-    # 🔹 Ermittle, ob Rock einen Stern hat (basiert auf routes.stern)
-    if 'stern' in routes_df.columns and 'rock_id' in routes_df.columns:
-        rock_has_star = routes_df.groupby('rock_id')['stern'].any().reset_index(name='rock_has_star')
-        rocks_df = rocks_df.merge(rock_has_star, left_on='id', right_on='rock_id', how='left', suffixes=('', '_star'))
-        rocks_df['rock_has_star'] = rocks_df['rock_has_star'].fillna(False).astype(bool)
-        rocks_df.drop(columns=['rock_id_star'], errors='ignore', inplace=True)
-        add_debug_message(f"DEBUG APP: rocks_df 'rock_has_star' unique values: {rocks_df['rock_has_star'].unique()}")
-    else:
-        rocks_df['rock_has_star'] = False
-
-    # 🔹 Bestimme die höchste Bewertung pro Rock (basierend auf ascents.bewertung - ORIGINALNAME)
-    # Beachte: 'bewertung' und 'gipfel_id' (ehemals rock_id in ascents) sind die originalen Namen
-    if 'bewertung' in ascents_df.columns and 'route_id' in ascents_df.columns and 'id' in routes_df.columns and 'rock_id' in routes_df.columns:
-        # Merge ascents with routes to get rock_id for ascents
-        # HIER WICHTIG: ascents_df['gipfel_id'] ist der Rock/Peak, daher direkt verwenden
-        # Wir brauchen die route_id, um zu sehen, welche ascents zu welcher Route gehören
-        
-        # Falls du eine Verknüpfung über route_id -> rock_id machen willst:
-        ascents_with_rock_id = ascents_df.merge(routes_df[['id', 'rock_id']], left_on='route_id', right_on='id', how='left', suffixes=('_ascent', '_route'))
-        
-        # Den Fall behandeln, dass ascents.gipfel_id direkt der rock_id entspricht (falls so gedacht)
-        # Wenn 'gipfel_id' direkt der 'rock_id' des Felsens ist, können wir das nutzen:
-        # ascents_with_rock_id = ascents_df.rename(columns={'gipfel_id': 'rock_id_for_merge'}) # Rename for clarity if needed
+    # 🔹 Anzahl der Routen und Stern pro Rock kommen aus der Zusammenfassung im Katalog
+    rocks_df = rocks_df.join(get_catalog().rock_summary[["anzahl_routen", "rock_has_star"]], on="id")
+    add_debug_message(f"DEBUG APP: rocks_df 'rock_has_star' unique values: {rocks_df['rock_has_star'].unique()}")
 
-        # Drop NaNs from rock_id after merge
-        ascents_with_rock_id = ascents_with_rock_id.dropna(subset=['rock_id'])
-        
-        if not ascents_with_rock_id.empty:
-            max_rating_per_rock = ascents_with_rock_id.groupby('rock_id')['bewertung'].max().reset_index(name='max_rating_per_rock')
-            rocks_df = rocks_df.merge(max_rating_per_rock, left_on='id', right_on='rock_id', how='left', suffixes=('', '_rating'))
-            rocks_df['max_rating_per_rock'] = rocks_df['max_rating_per_rock'].fillna(0).astype(int)
-            rocks_df.drop(columns=['rock_id_rating'], errors='ignore', inplace=True)
-        else:
-            rocks_df['max_rating_per_rock'] = 0
-    else:
-        rocks_df['max_rating_per_rock'] = 0
+    # 🔹 Höchste Bewertung und erster Kommentar pro Rock (einmal berechnet, siehe fetch_rock_ascent_summary)
+    ascent_summary = fetch_rock_ascent_summary()
+    rocks_df = rocks_df.join(ascent_summary, on="id")
+    rocks_df['max_rating_per_rock'] = rocks_df['max_rating_per_rock'].fillna(0).astype(int)
+    rocks_df['kommentar'] = rocks_df['kommentar'].fillna("").astype(str)
 
     # 🔹 Bestimme für jeden ROCK, ob er mindestens EINE gemachte Route hat (has_done_route)
     # Hier verwenden wir die originalen Spaltennamen aus ascents_df ('route_id' und 'gipfel_id')
@@ -207,41 +160,6 @@ def app():
         rocks_df['has_done_route'] = False
 
 
-    # 🔹 Kommentar zum Rock mergen (basierend auf dem ersten Ascent für diesen Rock)
-    # Hier verwenden wir die originalen Spaltennamen aus ascents_df ('kommentar', 'gipfel_id', 'datum')
-    if 'kommentar' not in rocks_df.columns:
-        rocks_df['kommentar'] = "" # Originalname wiederherstellen
-
-    if not ascents_df.empty and 'kommentar' in ascents_df.columns and 'route_id' in ascents_df.columns and 'gipfel_id' in ascents_df.columns and 'datum' in ascents_df.columns:
-        # Merge ascents with routes to get rock_id for each ascent comment
-        ascents_routes_merged = ascents_df.merge(routes_df[['id', 'rock_id']], left_on='route_id', right_on='id', how='left', suffixes=('_ascent', '_route'))
-        
-        # Filter out rows where rock_id or comment are missing after merge
-        ascents_routes_merged = ascents_routes_merged.dropna(subset=['rock_id', 'kommentar']) # 'kommentar' ist der Originalname
-
-        if not ascents_routes_merged.empty:
-            # Ensure 'datum' is datetime for sorting
-            ascents_routes_merged['datum'] = pd.to_datetime(ascents_routes_merged['datum'], errors='coerce')
-            ascents_routes_merged = ascents_routes_merged.sort_values(by='datum', ascending=True)
-            
-            # Get the unique rock_id and its first associated comment
-            rock_comments = ascents_routes_merged.drop_duplicates(subset=['rock_id'], keep='first')[['rock_id', 'kommentar']] # 'kommentar_ascent' nach dem Merge
-            rock_comments.rename(columns={'kommentar': 'merged_comment'}, inplace=True) # Umbenennen für klareren Merge
-
-            # Merge these comments into the main rocks_df
-            rocks_df = rocks_df.merge(rock_comments, left_on='id', right_on='rock_id', how='left', suffixes=('', '_merged'))
-            
-            # Use the new comment if available, otherwise keep original or empty string
-            if 'merged_comment' in rocks_df.columns:
-                rocks_df['kommentar'] = rocks_df['merged_comment'].fillna(rocks_df['kommentar']).astype(str)
-                rocks_df.drop(columns=['merged_comment', 'rock_id_merged'], errors='ignore', inplace=True)
-            else:
-                rocks_df['kommentar'] = rocks_df['kommentar'].fillna("").astype(str)
-        else:
-            rocks_df['kommentar'] = rocks_df['kommentar'].fillna("").astype(str)
-    else:
-        rocks_df['kommentar'] = rocks_df['kommentar'].fillna("").astype(str)
-    
     add_debug_message(f"DEBUG APP: rocks_df columns after all calculations: {rocks_df.columns.tolist()}")
 
 
@@ -414,60 +332,43 @@ def app():
         attr='&copy; <a href="https://carto.com/attributions">CartoDB</a>'
     )
 
-    # 8. Dreiecke als Polygone einfügen (Größe nach Höhe)
-    drawn_triangles_count = 0
-    for index, row in filtered_rocks_for_map.iterrows(): 
-        if not all(col in row.index and pd.notna(row[col]) for col in ['latitude', 'longitude', 'hoehe', 'anzahl_routen', 'name', 'gebiet']):
-            add_debug_message(f"Skipping row {index} due to missing critical columns or NaN: {row.to_dict()}")
-            continue 
-        
-        hoehe_val = pd.to_numeric(row["hoehe"], errors='coerce')
-        if pd.isna(hoehe_val) or hoehe_val < 0: 
-            add_debug_message(f"Skipping row {index} due to invalid height: {row['hoehe']}")
-            continue
-
-        größe = 0.0012 + (hoehe_val * 0.00011)
-        if größe <= 0: 
-            add_debug_message(f"Skipping row {index} due to invalid calculated size: {größe}")
-            continue
+    # 8. Dreiecke als eine GeoJSON-Ebene einfügen (Größe nach Höhe, für alle Felsen auf einmal berechnet)
+    required = ['latitude', 'longitude', 'hoehe', 'anzahl_routen', 'name', 'gebiet']
+    if all(c in filtered_rocks_for_map.columns for c in required):
+        complete = filtered_rocks_for_map[required].notna().all(axis=1)
+    else:
+        complete = pd.Series(False, index=filtered_rocks_for_map.index)
+    hoehe_val = pd.to_numeric(filtered_rocks_for_map.get("hoehe", pd.Series(index=filtered_rocks_for_map.index, dtype=float)), errors='coerce')
+    valid_height = complete & hoehe_val.ge(0)
+    add_debug_message(f"Skipping {int((~complete).sum())} rows due to missing critical columns or NaN")
+    add_debug_message(f"Skipping {int((complete & ~valid_height).sum())} rows due to invalid height")
+
+    drawable = filtered_rocks_for_map[valid_height]
+    hoehe_val = hoehe_val[valid_height]
+    größe = 0.0012 + (hoehe_val * 0.00011)
+
+    has_star = drawable['rock_has_star'].astype(bool) if 'rock_has_star' in drawable.columns else pd.Series(False, index=drawable.index)
+    has_done = drawable['has_done_route'].astype(bool) if 'has_done_route' in drawable.columns else pd.Series(False, index=drawable.index)
+    fill_color = np.select([has_done, has_star], ["black", "purple"], default="red")
+
+    tooltip_text = (
+        "<b>" + drawable['name'].astype(str) + "</b><br>"
+        + "Height: " + hoehe_val.astype(int).astype(str) + " m<br>"
+        + "Routes: " + drawable['anzahl_routen'].astype(int).astype(str) + "<br>"
+        + "Area: " + drawable['gebiet'].astype(str)
+    )
+    if 'rock_has_star' in drawable.columns:
+        tooltip_text += "<br>Star: " + np.where(has_star, "⭐", "No")
+    if 'has_done_route' in drawable.columns:
+        tooltip_text += "<br>Climbed: " + np.where(has_done, "✅", "❌")
+    if 'kommentar' in drawable.columns: # Hier wieder 'kommentar'
+        kommentar = drawable['kommentar'].fillna("").astype(str)
+        tooltip_text += np.where(kommentar != "", "<br>Comment: " + kommentar, "")
+
+    triangles = triangle_feature_collection(drawable, größe, fill_color, tooltip_text)
+    triangle_layer(triangles).add_to(m)
+    drawn_triangles_count = len(triangles["features"])
 
-        fill_color = "red" 
-        
-        if row.get('rock_has_star', False):
-            fill_color = "purple"
-        
-        if row.get('has_done_route', False):
-            fill_color = "black"
-
-        coords = make_triangle(row["latitude"], row["longitude"], größe)
-        if coords: 
-            tooltip_text = f"""
-            <b>{row['name']}</b><br>
-            Height: {int(hoehe_val)} m<br>
-            Routes: {int(row['anzahl_routen'])}<br>
-            Area: {row['gebiet']}
-            """
-            if 'rock_has_star' in row:
-                tooltip_text += f"<br>Star: {'⭐' if row['rock_has_star'] else 'No'}"
-            if 'has_done_route' in row:
-                tooltip_text += f"<br>Climbed: {'✅' if row['has_done_route'] else '❌'}"
-            
-            if 'kommentar' in row and row['kommentar']: # Hier wieder 'kommentar'
-                tooltip_text += f"<br>Comment: {row['kommentar']}"
-
-
-            folium.Polygon(
-                locations=coords,
-                color=None,
-                fill=True,
-                fill_color=fill_color,
-                fill_opacity=0.89,
-                tooltip=folium.Tooltip(tooltip_text, sticky=True)
-            ).add_to(m)
-            drawn_triangles_count += 1
-        else:
-            add_debug_message(f"Skipping row {index} - could not create triangle coordinates: lat={row['latitude']}, lon={row['longitude']}")
-            
     add_debug_message(f"Number of triangles drawn on the map: {drawn_triangles_count}")
 
     st_data = st_folium(m, width=1400, height=600)
@@ -0,0 +1,102 @@
+# app_modules/ascent_writer.py
+
+"""Schreibpfad für neue Begehungen (Formular, Tagesliste, Logbuch-Import)."""
+
+from postgrest import APIError
+from supabase import Client
+
+from app_modules.invalidation import AscentsAdded, AscentsChanged, publish
+
+STIL_OPTIONEN = ["Vorstieg", "Nachstieg", "Solo", "Spritze"]
+
+# Insert ohne bestätigte Rückgabe (Verbindungsfehler, keine oder zu wenige Zeilen): Zeilen sind womöglich gespeichert
+UNCONFIRMED_ERROR = "Speichern nicht bestätigt (Verbindungsfehler oder keine Daten zurückgegeben, evtl. Policy fehlt). Bitte prüfen, bevor erneut gespeichert wird."
+# Nach einem Verbindungsfehler nicht mehr gesendet
+NOT_SENT_ERROR = "Nicht gespeichert – Verbindungsfehler bei einer vorherigen Zeile."
+
+
+def ascent_row(user_id: str, datum, route_id, rock_id, partnerin: str, stil: str, kommentar: str, bewertung) -> dict:
+    """Eine Zeile für die Tabelle ascents, so wie sie eingefügt wird."""
+    return {
+        "datum": str(datum),
+        "route_id": int(route_id),
+        "gipfel_id": int(rock_id),
+        "partnerin": partnerin,
+        "stil": stil,
+        "kommentar": kommentar,
+        "bewertung": int(bewertung) if bewertung is not None else None,
+        "user_id": user_id
+    }
+
+
+def insert_ascents(supabase: Client, rows: list) -> list:
+    """
+    Speichert mehrere Begehungen mit einem einzigen Insert.
+    Lehnt der Server den gemeinsamen Insert ab (APIError, PostgREST speichert dann keine Zeile),
+    wird jede Zeile einzeln versucht, damit der Fehler der richtigen Zeile zugeordnet wird.
+    Bei allen anderen Fehlern (Timeout, Verbindungsabbruch) und wenn der Insert keine oder
+    zu wenige Zeilen zurückliefert (z.B. INSERT erlaubt, SELECT per Policy nicht), wird nichts
+    wiederholt – die Zeilen sind dann womöglich gespeichert und würden sonst doppelt eingetragen.
+    Gibt pro Zeile ein Dict mit 'ok', 'data' (gespeicherte Zeile) und 'error' zurück.
+    """
+    if not rows:
+        return []
+
+    try:
+        response = supabase.table("ascents").insert(rows).execute()
+    except APIError as e:
+        if len(rows) == 1:
+            return [{"ok": False, "data": None, "error": str(e)}]
+        results = _insert_each(supabase, rows)
+        _write_through(results)
+        return results
+    except Exception:
+        return _unconfirmed(rows)
+
+    if not response.data or len(response.data) != len(rows):
+        return _unconfirmed(rows)
+
+    results = [{"ok": True, "data": saved, "error": None} for saved in response.data]
+    _write_through(results)
+    return results
+
+
+def _insert_each(supabase: Client, rows: list) -> list:
+    """Einzelne Inserts nach einem abgelehnten Block; nach dem ersten Verbindungsfehler wird abgebrochen."""
+    results = []
+    for i, row in enumerate(rows):
+        try:
+            response = supabase.table("ascents").insert(row).execute()
+        except APIError as e:
+            results.append({"ok": False, "data": None, "error": str(e)})
+            continue
+        except Exception:
+            results += _unconfirmed([row])
+            results += [{"ok": False, "data": None, "error": NOT_SENT_ERROR} for _ in rows[i + 1:]]
+            break
+        if response.data:
+            results.append({"ok": True, "data": response.data[0], "error": None})
+        else:
+            results += _unconfirmed([row])
+    return results
+
+
+def _unconfirmed(rows: list) -> list:
+    """Ergebnis unbekannt: Daten der betroffenen Benutzer komplett neu laden und die Zeilen als unbestätigt melden."""
+    for user_id in {row.get("user_id") for row in rows}:
+        publish(AscentsChanged(user_id=user_id))
+    return [{"ok": False, "data": None, "error": UNCONFIRMED_ERROR} for _ in rows]
+
+
+def _write_through(results: list):
+    """
+    Gespeicherte Zeilen (wie von Supabase zurückgegeben, also mit id) pro Benutzer als
+    AscentsAdded veröffentlichen; Ascent-Store und Kommentar-Index übernehmen sie direkt,
+    abhängige st.cache_data-Caches werden geleert (siehe app_modules.invalidation).
+    """
+    by_user = {}
+    for result in results:
+        if result["ok"] and result["data"]:
+            by_user.setdefault(result["data"].get("user_id"), []).append(result["data"])
+    for user_id, saved in by_user.items():
+        publish(AscentsAdded(user_id=user_id, rows=tuple(saved)))
@@ -0,0 +1,149 @@
+# app_modules/ascents_store.py
+
+import itertools
+import threading
+import time
+from dataclasses import dataclass
+
+import pandas as pd
+from supabase import Client
+
+from app_modules.db import fetch_all_rows, get_user_client
+from app_modules.invalidation import AscentsAdded, subscribe
+
+ASCENT_COLUMNS = ["id", "user_id", "datum", "gipfel_id", "route_id", "partnerin", "stil", "kommentar", "bewertung"]
+
+# Innerhalb dieses Abstands wird nicht erneut bei Supabase nachgefragt
+SYNC_INTERVAL_SECONDS = 30
+
+
+@dataclass
+class _UserAscents:
+    frame: pd.DataFrame
+    max_id: int
+    synced_at: float
+    version: int
+    lock: threading.Lock
+
+
+_lock = threading.Lock()
+_stores: dict[str, _UserAscents] = {}
+# Versionen steigen prozessweit, damit nach invalidate_user_ascents keine alte Version wiederkehrt
+_versions = itertools.count(1)
+
+
+def _empty_frame() -> pd.DataFrame:
+    return pd.DataFrame(columns=ASCENT_COLUMNS)
+
+
+def _fetch_newer(client: Client, user_id: str, after_id: int) -> pd.DataFrame:
+    filters = [("eq", "user_id", user_id)]
+    if after_id:
+        filters.append(("gt", "id", after_id))
+    rows = fetch_all_rows("ascents", ", ".join(ASCENT_COLUMNS), filters=filters, client=client)
+    return _rows_frame(rows)
+
+
+def _rows_frame(rows: list) -> pd.DataFrame:
+    frame = pd.DataFrame(rows, columns=ASCENT_COLUMNS)
+    frame["id"] = frame["id"].astype(int)
+    return frame
+
+
+def _merge(frame: pd.DataFrame, newer: pd.DataFrame) -> pd.DataFrame:
+    """Hängt neuere Zeilen an (gleiche id: die neuere gewinnt), Ergebnis ist ein neuer Frame."""
+    if frame.empty:
+        merged = newer
+    else:
+        # Leere Spalten der neuen Zeilen weglassen, damit die Datentypen des bestehenden Frames bleiben
+        merged = pd.concat([frame, newer.dropna(axis=1, how="all")], ignore_index=True).reindex(columns=ASCENT_COLUMNS)
+    return merged.drop_duplicates(subset="id", keep="last").sort_values("id", ignore_index=True)
+
+
+def _get_store(user_id: str) -> _UserAscents:
+    with _lock:
+        store = _stores.get(user_id)
+        if store is None:
+            store = _UserAscents(frame=_empty_frame(), max_id=0, synced_at=0.0, version=0, lock=threading.Lock())
+            _stores[user_id] = store
+        return store
+
+
+def _sync(store: _UserAscents, user_id: str, client: Client | None, force: bool):
+    with store.lock:
+        if not force and time.time() - store.synced_at < SYNC_INTERVAL_SECONDS:
+            return
+
+        newer = _fetch_newer(client or get_user_client(), user_id, store.max_id)
+        if not newer.empty:
+            # Neuer Frame statt Änderung des alten – Leser halten evtl. noch eine Referenz
+            store.frame = _merge(store.frame, newer)
+            store.max_id = max(store.max_id, int(newer["id"].max()))
+            store.version = next(_versions)
+        store.synced_at = time.time()
+
+
+def sync_user_ascents(user_id: str, client: Client | None = None, force: bool = False) -> int:
+    """
+    Holt nur die Begehungen mit einer id größer als die bisher höchste bekannte
+    und hängt sie an den gespeicherten Frame an. Gibt die aktuelle Version zurück.
+    """
+    store = _get_store(user_id)
+    _sync(store, user_id, client, force)
+    return store.version
+
+
+def get_user_ascents(user_id: str, client: Client | None = None) -> pd.DataFrame:
+    """
+    Alle Begehungen eines Benutzers (nach id sortiert, Spalten wie ASCENT_COLUMNS).
+    Beim ersten Aufruf wird die komplette Historie geladen, danach nur noch neuere Zeilen.
+    Der Frame wird geteilt – bitte nicht verändern, sondern .copy() / .assign() verwenden.
+    """
+    if not user_id:
+        return _empty_frame()
+    store = _get_store(user_id)
+    _sync(store, user_id, client, force=False)
+    return store.frame
+
+
+def apply_inserted_ascents(user_id: str, rows: list) -> int:
+    """
+    Write-through nach einem Insert: übernimmt die von Supabase zurückgegebenen Zeilen
+    sofort in den gespeicherten Frame und erhöht die Version, ohne neu zu laden.
+    max_id bleibt unverändert, damit Zeilen anderer Sitzungen mit kleinerer id beim
+    nächsten Abgleich nicht übersprungen werden (die eigenen werden dabei nur dedupliziert).
+    Gibt die neue Version zurück.
+    """
+    if not user_id or not rows:
+        return ascents_version(user_id)
+    store = _get_store(user_id)
+    with store.lock:
+        store.frame = _merge(store.frame, _rows_frame(rows))
+        store.version = next(_versions)
+        return store.version
+
+
+def ascents_version(user_id: str) -> int:
+    """Zählt hoch, sobald sich die Begehungen des Benutzers geändert haben (z.B. als Cache-Schlüssel)."""
+    with _lock:
+        store = _stores.get(user_id)
+    return store.version if store else 0
+
+
+def invalidate_user_ascents(user_id: str | None = None):
+    """Verwirft den gespeicherten Stand (eines oder aller Benutzer), der nächste Zugriff lädt komplett neu."""
+    with _lock:
+        if user_id is None:
+            _stores.clear()
+        else:
+            _stores.pop(user_id, None)
+
+
+def _on_ascents_event(event):
+    if isinstance(event, AscentsAdded):
+        apply_inserted_ascents(event.user_id, list(event.rows))
+    else:
+        invalidate_user_ascents(event.user_id)
+
+
+subscribe("ascents", _on_ascents_event)
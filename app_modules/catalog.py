@@ -0,0 +1,205 @@
+# app_modules/catalog.py
+
+import threading
+import time
+from dataclasses import dataclass, replace
+
+import pandas as pd
+from supabase import Client
+
+from app_modules.db import fetch_all_rows, get_client
+from app_modules.invalidation import RocksChanged, RoutesChanged, publish, subscribe
+from app_modules.spatial_index import RockIndex, build_rock_index
+
+# Wie lange der Katalog im Prozess gehalten wird, bevor er neu geladen wird
+CATALOG_TTL_SECONDS = 6 * 60 * 60
+
+ROUTE_COLUMNS = "id, rock_id, name, grade, number, stern"
+
+
+@dataclass(frozen=True)
+class Catalog:
+    """
+    Stammdaten (Sektoren, Felsen, Routen), die sich alle Seiten teilen.
+    Die DataFrames werden nicht kopiert – bitte nicht verändern, sondern
+    bei Bedarf mit .copy() / .assign() ein neues DataFrame erzeugen.
+
+    rock_names ist ein Dict Fels-id -> Name für schnelle Einzel-Lookups,
+    sector_names und route_names entsprechend für Sektoren und Routen.
+    sector_rocks (Sektor-id -> Fels-ids) und rock_routes (Fels-id -> Routen-ids)
+    bilden die Hierarchie Gebiet -> Fels -> Route als Tupel in Katalog-Reihenfolge
+    (Felsen ohne Routen fehlen in rock_routes, also .get(id, ()) verwenden).
+    rock_summary enthält eine Zeile pro Fels (Index = Fels-id) mit
+    anzahl_routen, rock_has_star, grade_min, grade_max, grades (sortierte Liste
+    der vorkommenden Grade) und gebiet.
+    rock_index ist der räumliche Index über die Felskoordinaten (Umkreis,
+    nächste Felsen, Rechteck; siehe app_modules.spatial_index).
+    """
+    sectors: pd.DataFrame
+    rocks: pd.DataFrame
+    routes: pd.DataFrame
+    rock_summary: pd.DataFrame
+    rock_names: dict
+    sector_names: dict
+    route_names: dict
+    sector_rocks: dict
+    rock_routes: dict
+    rock_index: RockIndex
+    loaded_at: float
+
+
+_lock = threading.Lock()
+_catalog: Catalog | None = None
+
+
+def _fetch_all(client: Client, table: str, columns: str) -> pd.DataFrame:
+    return pd.DataFrame(fetch_all_rows(table, columns, client=client))
+
+
+def _prepare_routes(routes: pd.DataFrame) -> pd.DataFrame:
+    routes['id'] = routes['id'].astype(int)
+    routes['rock_id'] = routes['rock_id'].astype(int)
+    routes['grade'] = pd.to_numeric(routes['grade'], errors='coerce')
+    routes['stern'] = routes['stern'].fillna(False).astype(bool)
+    return routes
+
+
+def _children(frame: pd.DataFrame, parent_column: str) -> dict:
+    """Eltern-id -> Tupel der ids in der Reihenfolge des Frames."""
+    return {int(parent): tuple(ids) for parent, ids in frame.groupby(parent_column, sort=False)["id"].agg(list).items()}
+
+
+def _names(frame: pd.DataFrame) -> dict:
+    return dict(zip(frame['id'].tolist(), frame['name'].tolist()))
+
+
+def build_rock_summary(rocks: pd.DataFrame, routes: pd.DataFrame) -> pd.DataFrame:
+    """
+    Fasst die Routen pro Fels zusammen (eine Zeile pro Fels, auch ohne Routen).
+    Seiten können die Tabelle mit rocks.join(summary, on="id") anhängen,
+    statt selbst über alle Routen zu gruppieren.
+    """
+    per_rock = routes.groupby("rock_id").agg(
+        anzahl_routen=("id", "size"),
+        rock_has_star=("stern", "any"),
+        grade_min=("grade", "min"),
+        grade_max=("grade", "max"),
+    )
+    graded = routes.dropna(subset=["grade"]).drop_duplicates(subset=["rock_id", "grade"]).sort_values("grade")
+    per_rock["grades"] = graded.groupby("rock_id")["grade"].agg(list)
+
+    summary = per_rock.reindex(rocks["id"].to_numpy())
+    summary.index.name = "rock_id"
+    summary["anzahl_routen"] = summary["anzahl_routen"].fillna(0).astype(int)
+    summary["rock_has_star"] = summary["rock_has_star"].fillna(False).astype(bool)
+    summary["grades"] = [g if isinstance(g, list) else [] for g in summary["grades"]]
+    summary["gebiet"] = rocks["gebiet"].to_numpy()
+    return summary
+
+
+def _load_catalog(client: Client) -> Catalog:
+    sectors = _fetch_all(client, "sector", "id, name")
+    sectors['id'] = sectors['id'].astype(int)
+
+    rocks = _fetch_all(client, "rocks", "id, name, sector_id, latitude, longitude, hoehe")
+    rocks['id'] = rocks['id'].astype(int)
+    rocks['sector_id'] = rocks['sector_id'].astype(int)
+    rocks['latitude'] = pd.to_numeric(rocks['latitude'], errors='coerce')
+    rocks['longitude'] = pd.to_numeric(rocks['longitude'], errors='coerce')
+    rocks['hoehe'] = pd.to_numeric(rocks['hoehe'], errors='coerce')
+    # Gebietsname direkt mitliefern, damit nicht jede Seite selbst mergen muss
+    rocks['gebiet'] = rocks['sector_id'].map(sectors.set_index('id')['name'])
+
+    routes = _prepare_routes(_fetch_all(client, "routes", ROUTE_COLUMNS))
+
+    return Catalog(
+        sectors=sectors,
+        rocks=rocks,
+        routes=routes,
+        rock_summary=build_rock_summary(rocks, routes),
+        rock_names=_names(rocks),
+        sector_names=_names(sectors),
+        route_names=_names(routes),
+        sector_rocks=_children(rocks, "sector_id"),
+        rock_routes=_children(routes, "rock_id"),
+        rock_index=build_rock_index(rocks),
+        loaded_at=time.time(),
+    )
+
+
+def get_catalog(client: Client | None = None) -> Catalog:
+    """
+    Gibt den prozessweit geteilten Katalog zurück.
+    Lädt ihn beim ersten Aufruf bzw. nach Ablauf von CATALOG_TTL_SECONDS neu
+    (ohne übergebenen Client über den geteilten Client aus app_modules.db).
+    """
+    global _catalog
+    catalog = _catalog
+    if catalog is not None and time.time() - catalog.loaded_at < CATALOG_TTL_SECONDS:
+        return catalog
+
+    with _lock:
+        # Ein anderer Thread könnte inzwischen geladen haben
+        if _catalog is None or time.time() - _catalog.loaded_at >= CATALOG_TTL_SECONDS:
+            _catalog = _load_catalog(client or get_client())
+        return _catalog
+
+
+def invalidate_catalog():
+    """Verwirft den Katalog, der nächste Zugriff lädt ihn neu."""
+    global _catalog
+    with _lock:
+        _catalog = None
+
+
+def reload_catalog():
+    """
+    Nach Änderungen an Felsen/Routen in der Datenbank: Katalog und alle davon
+    abhängigen Caches (Karten, Statistik, Diagramme) verwerfen.
+    """
+    publish(RocksChanged())
+    publish(RoutesChanged())
+
+
+def update_routes(rock_ids, client: Client | None = None) -> Catalog:
+    """
+    Lädt die Routen der angegebenen Felsen neu und aktualisiert nur deren
+    Zeilen in routes und rock_summary. Der bisherige Katalog bleibt unverändert,
+    stattdessen wird ein neuer Katalog eingesetzt.
+    """
+    global _catalog
+    rock_ids = sorted({int(rock_id) for rock_id in rock_ids})
+    catalog = get_catalog(client)
+    if not rock_ids:
+        return catalog
+
+    fresh = pd.DataFrame(fetch_all_rows("routes", ROUTE_COLUMNS, filters=[("in_", "rock_id", rock_ids)], client=client or get_client()))
+    fresh = _prepare_routes(fresh) if not fresh.empty else catalog.routes.iloc[:0]
+
+    with _lock:
+        current = _catalog or catalog
+        routes = pd.concat([current.routes[~current.routes["rock_id"].isin(rock_ids)], fresh], ignore_index=True)
+        routes = routes.sort_values("id", ignore_index=True)
+
+        affected_rocks = current.rocks[current.rocks["id"].isin(rock_ids)]
+        unchanged = current.rock_summary.drop(index=affected_rocks["id"].to_numpy())
+        summary = pd.concat([unchanged, build_rock_summary(affected_rocks, fresh)]).reindex(current.rocks["id"].to_numpy())
+        summary.index.name = "rock_id"
+
+        rock_routes = {rock_id: ids for rock_id, ids in current.rock_routes.items() if rock_id not in rock_ids}
+        rock_routes.update(_children(fresh, "rock_id"))
+
+        _catalog = replace(current, routes=routes, rock_summary=summary,
+                           route_names=_names(routes), rock_routes=rock_routes)
+        return _catalog
+
+
+def _on_routes_changed(event):
+    if event.rock_ids:
+        update_routes(event.rock_ids)
+    else:
+        invalidate_catalog()
+
+
+subscribe("routes", _on_routes_changed)
+subscribe("rocks", lambda event: invalidate_catalog(), name=f"{__name__}.invalidate_catalog")
@@ -0,0 +1,159 @@
+# app_modules/db.py
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+from dotenv import load_dotenv
+from supabase import Client, ClientOptions, create_client
+
+# .env laden – robust für Seiten im "app_modules/"-Ordner
+dotenv_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), ".env")
+load_dotenv(dotenv_path)
+
+SUPABASE_URL = os.environ.get("SUPABASE_URL")
+SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
+
+# "supabase" (Standard) oder "local" für das SQLite-Backend aus app_modules.local_backend
+BACKEND = os.environ.get("FELSENAPP_BACKEND", "supabase").strip().lower()
+LOCAL_DB_PATH = os.environ.get("FELSENAPP_LOCAL_DB", os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "felsenapp.sqlite"))
+
+# Ein HTTP-Verbindungspool für alle Clients im Prozess (Keep-Alive statt neuem TCP/TLS-Handshake pro Seite)
+HTTP_POOL_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60)
+HTTP_TIMEOUT = httpx.Timeout(120, connect=10)
+
+# PostgREST liefert maximal 1000 Zeilen pro Anfrage
+PAGE_SIZE = 1000
+# Wie viele Seiten gleichzeitig geladen werden
+FETCH_WORKERS = 6
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_client_lock = threading.Lock()
+_http_client: httpx.Client | None = None
+_client: Client | None = None
+_stats = {"clients_created": 0, "last_init_seconds": None, "total_init_seconds": 0.0}
+
+
+def has_credentials() -> bool:
+    """Prüft, ob SUPABASE_URL und SUPABASE_KEY gesetzt sind (das lokale Backend braucht keine)."""
+    return BACKEND == "local" or bool(SUPABASE_URL and SUPABASE_KEY)
+
+
+def _get_http_client() -> httpx.Client:
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.Client(limits=HTTP_POOL_LIMITS, timeout=HTTP_TIMEOUT, follow_redirects=True)
+    return _http_client
+
+
+def new_supabase_client() -> Client:
+    """Erstellt einen echten Supabase-Client (auch wenn das lokale Backend aktiv ist)."""
+    if not (SUPABASE_URL and SUPABASE_KEY):
+        raise RuntimeError("SUPABASE_URL oder SUPABASE_KEY wurden nicht gefunden.")
+
+    with _lock:
+        http_client = _get_http_client()
+    return create_client(SUPABASE_URL, SUPABASE_KEY, options=ClientOptions(httpx_client=http_client))
+
+
+def new_client() -> Client:
+    """
+    Erstellt einen neuen Client, der den gemeinsamen Verbindungspool nutzt.
+    Für die Sitzung eines Benutzers gedacht, da sich die Auth-Sitzung im Client festsetzt
+    (siehe get_user_client). Abfragen auf den Katalog sollten get_client() verwenden.
+    Mit FELSENAPP_BACKEND=local wird stattdessen ein SQLite-Client erstellt.
+    """
+    started = time.perf_counter()
+    if BACKEND == "local":
+        from app_modules.local_backend import LocalClient
+        client = LocalClient(LOCAL_DB_PATH)
+    else:
+        client = new_supabase_client()
+    elapsed = time.perf_counter() - started
+
+    with _lock:
+        _stats["clients_created"] += 1
+        _stats["last_init_seconds"] = elapsed
+        _stats["total_init_seconds"] += elapsed
+    logger.info("Client (%s) erstellt in %.1f ms", BACKEND, elapsed * 1000)
+    return client
+
+
+def get_client() -> Client:
+    """
+    Gibt den prozessweit geteilten Supabase-Client für Daten-Abfragen zurück.
+    Der Client wird erst beim ersten Aufruf erstellt.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = new_client()
+    return _client
+
+
+def get_user_client() -> Client:
+    """
+    Client für Abfragen mit Benutzerdaten (Begehungen, Rangliste): der in der
+    Streamlit-Sitzung angemeldete Client (st.session_state.auth_client), damit die
+    Anfragen mit dem Token des Benutzers als 'authenticated' laufen und RLS greift.
+    Ohne angemeldete Sitzung (Skripte, nicht eingeloggt) der geteilte Client.
+    Der geteilte Client (get_client) bleibt für die öffentlichen Katalogtabellen.
+    """
+    try:
+        import streamlit as st
+        session = st.session_state
+        client = session.get("auth_client") if session.get("user_id") else None
+    except Exception:
+        client = None
+    return client or get_client()
+
+
+def client_stats() -> dict:
+    """Anzahl erstellter Clients und die dafür benötigte Zeit (in Sekunden)."""
+    with _lock:
+        return dict(_stats)
+
+
+def fetch_all_rows(table: str, columns: str, filters=(), order_by: str = "id", client: Client | None = None) -> list:
+    """
+    Lädt alle Zeilen einer Tabelle, unabhängig von der 1000-Zeilen-Grenze.
+
+    Die erste Seite liefert gleichzeitig die exakte Gesamtzahl (count="exact"),
+    die restlichen Seiten werden parallel geladen und in Reihenfolge zusammengesetzt.
+    filters ist eine Liste von (Operator, Spalte, Wert), z.B. [("eq", "user_id", user_id)].
+    """
+    client = client or get_client()
+
+    def query(count=None):
+        q = client.table(table).select(columns, count=count)
+        for op, column, value in filters:
+            q = getattr(q, op)(column, value)
+        return q.order(order_by)
+
+    first = query(count="exact").range(0, PAGE_SIZE - 1).execute()
+    rows = list(first.data)
+    if len(first.data) < PAGE_SIZE:
+        return rows
+
+    if first.count is None:
+        # Ohne Gesamtzahl bleibt nur das seitenweise Weiterlesen
+        start = PAGE_SIZE
+        while True:
+            chunk = query().range(start, start + PAGE_SIZE - 1).execute().data
+            rows.extend(chunk)
+            if len(chunk) < PAGE_SIZE:
+                return rows
+            start += PAGE_SIZE
+
+    starts = range(PAGE_SIZE, first.count, PAGE_SIZE)
+    with ThreadPoolExecutor(max_workers=min(FETCH_WORKERS, len(starts)) or 1) as executor:
+        # map() liefert die Ergebnisse in der Reihenfolge der Seiten
+        for chunk in executor.map(lambda start: query().range(start, start + PAGE_SIZE - 1).execute().data, starts):
+            rows.extend(chunk)
+    return rows
@@ -1,95 +1,181 @@
-import os
 import pandas as pd
 import streamlit as st
-from dotenv import load_dotenv
-from supabase import create_client, Client
 
-# .env laden – robust für Seiten im "app_modules/"-Ordner
-# Stellt sicher, dass die .env-Datei im Hauptverzeichnis des Projekts gefunden wird
-dotenv_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), ".env")
-load_dotenv(dotenv_path)
+from app_modules.ascent_writer import STIL_OPTIONEN, ascent_row, insert_ascents
+from app_modules.catalog import get_catalog
+from app_modules.db import get_user_client
+from app_modules.logbook_import import show_logbook_import
 
-# Supabase-Verbindung initialisieren
-SUPABASE_URL = os.environ.get("SUPABASE_URL")
-SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+SCHWIERIGKEIT_OPTIONEN = {
+    "1: leicht": 1,
+    "2: ok": 2,
+    "3: schwer": 3
+}
 
-# --- Haupt-App-Logik für das Eintragen von Begehungen ---
-# Diese Funktion wird nun von app.py aufgerufen, wenn der Benutzer eingeloggt ist
-def main_app_eintragen():
-    """Enthält die Hauptlogik der Anwendung zum Hinzufügen von Begehungen."""
-    st.title(" Begehung hinzufügen")
-
-    # Sicherstellen, dass user_id im Session State vorhanden ist
-    # Dies sollte von app.py gesetzt werden, nachdem sich ein Benutzer angemeldet hat.
-    if st.session_state.user_id is None:
-        st.error("Fehler: Kein Benutzer eingeloggt. Bitte melden Sie sich über die Hauptseite an.")
-        return # Die App-Logik nicht ausführen, wenn kein User eingeloggt ist
+MODUS_EINZELN = "Einzelne Begehung"
+MODUS_TAGESLISTE = "Mehrere Begehungen (Tagesliste)"
+MODUS_IMPORT = "Tourenbuch importieren (CSV)"
 
-    # 1. Sektoren laden
-    sectors = supabase.table("sector").select("id, name").execute().data
-    sectors_df = pd.DataFrame(sectors)
-
-    selected_sector = st.selectbox("1️⃣ Gebiet auswählen", sectors_df["name"])
-    selected_sector_id = sectors_df.loc[sectors_df["name"] == selected_sector, "id"].values[0]
-
-    # 2. Rocks aus gewähltem Gebiet
-    rocks = supabase.table("rocks").select("id, name, sector_id").eq("sector_id", selected_sector_id).execute().data
-    rocks_df = pd.DataFrame(rocks)
+# Vorgemerkte Begehungen der Tagesliste im Session State
+PENDING_KEY = "pending_ascents"
 
-    selected_rock = st.selectbox("2️⃣ Fels auswählen", rocks_df["name"])
-    selected_rock_id = rocks_df.loc[rocks_df["name"] == selected_rock, "id"].values[0]
-
-    # 3. Routen aus gewähltem Rock
-    routes = supabase.table("routes").select("id, name, rock_id").eq("rock_id", selected_rock_id).execute().data
-    routes_df = pd.DataFrame(routes)
-
-    selected_route = st.selectbox("3️⃣ Route auswählen", routes_df["name"])
-    selected_route_id = routes_df.loc[routes_df["name"] == selected_route, "id"].values[0]
-
-    # 4. Formular zur Begehung
-    st.subheader("4️⃣ Begehung eintragen")
 
+def _begehung_einzeln(supabase, selected_rock_id, selected_route_id):
     with st.form("neue_begehung"):
         datum = st.date_input("Datum")
         partnerin = st.text_input("Partner*in")
-        stil = st.selectbox("Stil", ["Vorstieg", "Nachstieg", "Solo", "Spritze"])
+        stil = st.selectbox("Stil", STIL_OPTIONEN)
         kommentar = st.text_area("Kommentar")
-        
-        schwierigkeit_optionen = {
-            "1: leicht": 1,
-            "2: ok": 2,
-            "3: schwer": 3
-        }
-        schwierigkeit_label = st.radio("Schwierigkeit", list(schwierigkeit_optionen.keys()))
-        bewertung = schwierigkeit_optionen[schwierigkeit_label]
+
+        schwierigkeit_label = st.radio("Schwierigkeit", list(SCHWIERIGKEIT_OPTIONEN.keys()))
+        bewertung = SCHWIERIGKEIT_OPTIONEN[schwierigkeit_label]
 
         submitted = st.form_submit_button("Begehung speichern")
 
     # 5. Speichern
     if submitted:
         # Überprüfen, ob ein Benutzer eingeloggt ist, bevor gespeichert wird
-        if st.session_state.user_id:
+        if selected_route_id is None:
+            st.warning("Für diesen Fels sind keine Routen vorhanden – bitte einen anderen Fels wählen.")
+        elif st.session_state.user_id:
             try:
-                response = supabase.table("ascents").insert({
-                    "datum": str(datum),
-                    "route_id": int(selected_route_id),
-                    "gipfel_id": int(selected_rock_id),
-                    "partnerin": partnerin,
-                    "stil": stil,
-                    "kommentar": kommentar,
-                    "bewertung": int(bewertung),
-                    "user_id": st.session_state.user_id
-                }).execute()
-
-                if response.data:
+                row = ascent_row(st.session_state.user_id, datum, selected_route_id, selected_rock_id,
+                                 partnerin, stil, kommentar, bewertung)
+                result = insert_ascents(supabase, [row])[0]
+
+                if result["ok"]:
                     st.success("✅ Begehung erfolgreich gespeichert!")
                 else:
-                    st.error("❌ Fehler beim Speichern – evtl. Policy fehlt oder Daten sind ungültig.")
+                    st.error(f"❌ {result['error']}")
 
             except Exception as e:
                 st.error(f"❌ Ausnahme beim Speichern: {e}")
         else:
             st.warning("Bitte melden Sie sich an, um eine Begehung zu speichern.")
 
+
+def _begehung_tagesliste(supabase, catalog, selected_rock_id, selected_route_id):
+    """
+    Mehrere Begehungen eines Tages sammeln und zusammen speichern.
+    Hinzufügen läuft über ein Formular (ein Rerun pro Route), gespeichert wird mit einem Insert.
+    """
+    pending = st.session_state.setdefault(PENDING_KEY, [])
+
+    datum = st.date_input("Datum (für alle Begehungen der Liste)", key="tagesliste_datum")
+
+    with st.form("tagesliste_hinzufuegen", clear_on_submit=True):
+        partnerin = st.text_input("Partner*in")
+        stil = st.selectbox("Stil", STIL_OPTIONEN)
+        kommentar = st.text_area("Kommentar")
+        schwierigkeit_label = st.radio("Schwierigkeit", list(SCHWIERIGKEIT_OPTIONEN.keys()), horizontal=True)
+        added = st.form_submit_button("➕ Zur Liste hinzufügen")
+
+    if added:
+        if selected_route_id is None:
+            st.warning("Für diesen Fels sind keine Routen vorhanden – bitte einen anderen Fels wählen.")
+        else:
+            pending.append({
+                "route_id": int(selected_route_id),
+                "gipfel_id": int(selected_rock_id),
+                "partnerin": partnerin,
+                "stil": stil,
+                "kommentar": kommentar,
+                "bewertung": SCHWIERIGKEIT_OPTIONEN[schwierigkeit_label],
+                "fehler": None,
+            })
+
+    if not pending:
+        st.info("Noch keine Begehungen in der Liste.")
+        return
+
+    staging = pd.DataFrame({
+        "Fels": [catalog.rock_names.get(p["gipfel_id"]) for p in pending],
+        "Route": [catalog.route_names.get(p["route_id"]) for p in pending],
+        "Stil": [p["stil"] for p in pending],
+        "Partner*in": [p["partnerin"] for p in pending],
+        "Bewertung": [p["bewertung"] for p in pending],
+        "Kommentar": [p["kommentar"] for p in pending],
+        "Fehler": [p["fehler"] or "" for p in pending],
+    })
+    st.write(f"**{len(pending)} Begehung(en) vorgemerkt für den {datum.strftime('%d.%m.%Y')}**")
+    selection = st.dataframe(staging, hide_index=True, on_select="rerun", selection_mode="multi-row", key="tagesliste_tabelle")
+
+    col_save, col_remove, col_clear = st.columns(3)
+    if col_remove.button("Ausgewählte entfernen", disabled=not selection.selection.rows):
+        selected = set(selection.selection.rows)
+        st.session_state[PENDING_KEY] = [p for i, p in enumerate(pending) if i not in selected]
+        st.rerun()
+    if col_clear.button("Liste leeren"):
+        st.session_state[PENDING_KEY] = []
+        st.rerun()
+
+    if col_save.button(f"💾 Alle {len(pending)} speichern", type="primary"):
+        if not st.session_state.user_id:
+            st.warning("Bitte melden Sie sich an, um Begehungen zu speichern.")
+            return
+        rows = [
+            ascent_row(st.session_state.user_id, datum, p["route_id"], p["gipfel_id"],
+                       p["partnerin"], p["stil"], p["kommentar"], p["bewertung"])
+            for p in pending
+        ]
+        results = insert_ascents(supabase, rows)
+
+        # Gespeicherte Zeilen verschwinden aus der Liste, fehlerhafte bleiben mit Fehlertext stehen
+        remaining = []
+        for p, result in zip(pending, results):
+            if not result["ok"]:
+                remaining.append({**p, "fehler": result["error"]})
+        st.session_state[PENDING_KEY] = remaining
+
+        saved = len(results) - len(remaining)
+        if saved:
+            st.success(f"✅ {saved} Begehung(en) erfolgreich gespeichert!")
+        for p in remaining:
+            st.error(f"❌ {catalog.rock_names.get(p['gipfel_id'])} – {catalog.route_names.get(p['route_id'])}: {p['fehler']}")
+
+
+# --- Haupt-App-Logik für das Eintragen von Begehungen ---
+# Diese Funktion wird nun von app.py aufgerufen, wenn der Benutzer eingeloggt ist
+def main_app_eintragen():
+    """Enthält die Hauptlogik der Anwendung zum Hinzufügen von Begehungen."""
+    st.title(" Begehung hinzufügen")
+
+    # Sicherstellen, dass user_id im Session State vorhanden ist
+    # Dies sollte von app.py gesetzt werden, nachdem sich ein Benutzer angemeldet hat.
+    if st.session_state.user_id is None:
+        st.error("Fehler: Kein Benutzer eingeloggt. Bitte melden Sie sich über die Hauptseite an.")
+        return # Die App-Logik nicht ausführen, wenn kein User eingeloggt ist
+
+    supabase = get_user_client()
+
+    modus = st.radio("Modus", [MODUS_EINZELN, MODUS_TAGESLISTE, MODUS_IMPORT], horizontal=True, key="eintragen_modus")
+
+    # Sektoren, Felsen und Routen kommen aus dem gemeinsamen Katalog,
+    # die Auswahl läuft über dessen Hierarchie-Index (ids, Namen per Dict) ohne Abfragen
+    catalog = get_catalog(supabase)
+
+    if modus == MODUS_IMPORT:
+        show_logbook_import(supabase, catalog)
+        return
+
+    # 1. Sektoren
+    selected_sector_id = st.selectbox("1️⃣ Gebiet auswählen", list(catalog.sector_names),
+                                      format_func=catalog.sector_names.get)
+
+    # 2. Rocks aus gewähltem Gebiet
+    selected_rock_id = st.selectbox("2️⃣ Fels auswählen", catalog.sector_rocks.get(selected_sector_id, ()),
+                                    format_func=catalog.rock_names.get)
+
+    # 3. Routen aus gewähltem Rock
+    selected_route_id = st.selectbox("3️⃣ Route auswählen", catalog.rock_routes.get(selected_rock_id, ()),
+                                     format_func=catalog.route_names.get)
+
+    # 4. Formular zur Begehung
+    if modus == MODUS_EINZELN:
+        st.subheader("4️⃣ Begehung eintragen")
+        _begehung_einzeln(supabase, selected_rock_id, selected_route_id)
+    else:
+        st.subheader("4️⃣ Begehungen des Tages sammeln")
+        _begehung_tagesliste(supabase, catalog, selected_rock_id, selected_route_id)
+
 # Hinweis: Der if __name__ == "__main__": Block wird entfernt, da diese Datei als Modul importiert wird.
@@ -0,0 +1,110 @@
+# app_modules/figure_cache.py
+
+"""
+Zwischenspeicher für fertig serialisierte Plotly-Diagramme.
+
+Schlüssel ist (Benutzer, Datenstand, Diagrammname, Parameter). Gespeichert wird
+das Figure-JSON; bei einem Treffer wird die Figur ohne erneute Berechnung und
+ohne Plotly-Validierung daraus wiederhergestellt. Die ältesten unbenutzten
+Einträge fallen heraus, sobald FIGURE_CACHE_MAX_BYTES überschritten ist.
+
+    fig = cached_figure(user_id, snapshot.version, "donut", lambda: figures.done_donut(percent_done))
+"""
+
+import json
+import threading
+from collections import OrderedDict
+
+import plotly.graph_objects as go
+
+from app_modules.invalidation import subscribe
+
+# Obergrenze für alle gespeicherten Figure-JSONs zusammen
+FIGURE_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+
+class FigureCache:
+    """LRU-Speicher für Figure-JSON mit Obergrenze in Bytes (threadsicher)."""
+
+    def __init__(self, max_bytes: int = FIGURE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> str | None:
+        with self._lock:
+            spec = self._entries.get(key)
+            if spec is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return spec
+
+    def put(self, key: tuple, spec: str):
+        # Einzelne Diagramme über der Obergrenze werden nicht gespeichert
+        if len(spec) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._entries[key] = spec
+            self.size += len(spec)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def drop_user(self, user_id: str):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == user_id]:
+                self.size -= len(self._entries.pop(key))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_cache = FigureCache()
+
+
+def cached_figure(user_id: str, version: int, name: str, build, *params) -> go.Figure:
+    """
+    Liefert die von build() erzeugte Figur aus dem Zwischenspeicher oder baut und speichert sie.
+    params (hashbar) kommen zum Schlüssel hinzu, z.B. das gewählte Jahr; alles
+    andere, wovon build abhängt, muss durch (user_id, version) bestimmt sein.
+    """
+    key = (user_id, version, name) + params
+    spec = _cache.get(key)
+    if spec is not None:
+        # Das JSON stammt aus einer bereits validierten Figur
+        return go.Figure(json.loads(spec), _validate=False)
+    fig = build()
+    _cache.put(key, fig.to_json())
+    return fig
+
+
+def clear_figure_cache(user_id: str | None = None):
+    """Verwirft die gespeicherten Diagramme (eines oder aller Benutzer)."""
+    if user_id is None:
+        _cache.clear()
+    else:
+        _cache.drop_user(user_id)
+
+
+def figure_cache_stats() -> dict:
+    return {"entries": len(_cache), "bytes": _cache.size, "max_bytes": _cache.max_bytes, "hits": _cache.hits, "misses": _cache.misses}
+
+
+# Neue Begehungen bekommen über die Version ohnehin neue Schlüssel; die alten Einträge werden hier sofort frei.
+# Katalogänderungen ändern die Version nicht, betreffen aber Namen und Gebiete in allen Diagrammen.
+subscribe("ascents", lambda event: clear_figure_cache(event.user_id), name=f"{__name__}.drop_user")
+subscribe("rocks", lambda event: clear_figure_cache(), name=f"{__name__}.clear")
+subscribe("routes", lambda event: clear_figure_cache(), name=f"{__name__}.clear")
@@ -2,10 +2,15 @@ import streamlit as st
 import pandas as pd
 import folium
 from streamlit_folium import st_folium
-from supabase import create_client, Client
-import os
-from dotenv import load_dotenv
-import math
+from supabase import Client
+import numpy as np
+
+from app_modules.ascents_store import get_user_ascents
+from app_modules.catalog import get_catalog
+from app_modules.db import get_client, has_credentials
+from app_modules.invalidation import data_version
+from app_modules.map_filter import BrowserFilter, filter_state_layer
+from app_modules.map_geometry import cluster_layer, grid_clusters, triangle_feature_collection, triangle_layer
 
 # --- ✅ FINALES PLOT-FARBSCHEMA (PASSEND ZU app.py, WCAG-OPTIMIERT) ---
 
@@ -20,6 +25,22 @@ PLOT_TEXT_COLOR = "#111111"          # Maximaler Kontrast auf Hellgrau
 PLOT_MUTED_TEXT = "#4D4D4D"          # Gedämpfter Text (optional)
 PLOT_OUTLINE_COLOR = "#111111"       # Klare schwarze Outlines
 
+# Kartenmodi der Gipfelkarte
+MAP_MODE_BROWSER = "Im Browser filtern"
+MAP_MODE_SERVER = "Karte neu zeichnen"
+MAP_MODE_VIEWPORT = "Nur sichtbaren Ausschnitt laden"
+
+# Feste Startansicht der Gipfelkarte
+MAP_CENTER = [50.92, 14.15]
+MAP_ZOOM = 12
+MAP_BOUNDS = [[50.85, 14.00], [50.99, 14.30]]
+
+# Ausschnitt-Modus: ab DETAIL_ZOOM einzelne Felsen (höchstens MAX_DETAIL_ROCKS),
+# sonst Cluster aus Gitterzellen von etwa CLUSTER_CELL_PX Bildschirmpixeln
+DETAIL_ZOOM = 14
+MAX_DETAIL_ROCKS = 400
+CLUSTER_CELL_PX = 80
+
 
 
 
@@ -77,83 +98,209 @@ st.markdown(f"""
     """, unsafe_allow_html=True)
 
 
-def make_triangle(lat, lon, size=0.001):
-    if pd.isna(lat) or pd.isna(lon) or pd.isna(size) or size <= 0:
-        return None
-    try:
-        return [
-            [lat + size, lon],
-            [lat - size / 2, lon - size * math.sqrt(3)/2],
-            [lat - size / 2, lon + size * math.sqrt(3)/2],
-        ]
-    except TypeError:
-        return None
-
-
 def fetch_data(_supabase_client: Client, user_id: str):
     try:
-        sectors = pd.DataFrame(_supabase_client.table("sector").select("id, name").execute().data)
-        sectors['id'] = sectors['id'].astype(int)
-
-        rocks = pd.DataFrame(_supabase_client.table("rocks").select("id, name, sector_id, latitude, longitude, hoehe").range(0, 5000).execute().data)
-        rocks['id'] = rocks['id'].astype(int)
-        rocks['sector_id'] = rocks['sector_id'].astype(int)
-        rocks = rocks.merge(sectors, left_on="sector_id", right_on="id", suffixes=("_rock", "_sector"))
-        rocks.rename(columns={"name_sector": "gebiet", "name_rock": "name", "id_rock": "id"}, inplace=True)
-        rocks.drop(columns=["id_sector"], errors='ignore', inplace=True)
-
-        def fetch_all_routes_column_internal():
-            full_data = []
-            step = 1000
-            for start in range(0, 25000, step):
-                end = start + step - 1
-                chunk = _supabase_client.table("routes").select("rock_id, grade, name, number").range(start, end).execute().data
-                if not chunk:
-                    break
-                full_data.extend(chunk)
-            return pd.DataFrame(full_data)
-
-        routes_full_data = fetch_all_routes_column_internal()
-        routes_full_data['rock_id'] = routes_full_data['rock_id'].astype(int)
-        routes_full_data['grade'] = pd.to_numeric(routes_full_data['grade'], errors='coerce')
-
-        routes_for_stars = pd.DataFrame(_supabase_client.table("routes").select("id, rock_id, stern").range(0, 5000).execute().data)
-        routes_for_stars['id'] = routes_for_stars['id'].astype(int)
-        routes_for_stars['rock_id'] = routes_for_stars['rock_id'].astype(int)
-        routes_for_stars['stern'] = routes_for_stars.get('stern', False).astype(bool)
-
-        if user_id:
-            ascents = pd.DataFrame(_supabase_client.table("ascents").select("id, gipfel_id, route_id, bewertung, kommentar").eq("user_id", user_id).execute().data)
-        else:
-            ascents = pd.DataFrame()
-
-        ascents.rename(columns={"id": "ascent_id"}, inplace=True)
+        # Stammdaten kommen aus dem gemeinsamen Katalog (einmal pro Prozess geladen)
+        catalog = get_catalog(_supabase_client)
+        # Routenanzahl, Stern und Grade pro Fels sind im Katalog schon zusammengefasst
+        rocks = catalog.rocks.join(catalog.rock_summary[["anzahl_routen", "rock_has_star", "grades"]], on="id")
+        routes_full_data = catalog.routes[["rock_id", "grade", "name", "number"]]
+
+        # Begehungen aus dem Ascent-Store (nur neue Zeilen werden nachgeladen)
+        ascents = get_user_ascents(user_id, _supabase_client)[["id", "gipfel_id", "route_id", "bewertung", "kommentar"]]
+        ascents = ascents.rename(columns={"id": "ascent_id"})
         ascents['gipfel_id'] = pd.to_numeric(ascents['gipfel_id'], errors='coerce').fillna(0).astype(int)
         ascents['route_id'] = pd.to_numeric(ascents['route_id'], errors='coerce').fillna(0).astype(int)
         ascents['bewertung'] = pd.to_numeric(ascents['bewertung'], errors='coerce').fillna(0).astype(int)
 
-        return rocks, routes_for_stars, ascents, routes_full_data
+        return rocks, ascents, routes_full_data
     except Exception as e:
         st.error(f"Fehler beim Laden der Daten: {e}")
-        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+
+
+def base_map() -> folium.Map:
+    """Leere Karte mit der festen Startansicht."""
+    m = folium.Map(location=MAP_CENTER, zoom_start=MAP_ZOOM, tiles='CartoDB Positron')
+    m.fit_bounds(MAP_BOUNDS)
+    return m
+
+
+def rock_feature_collection(rocks: pd.DataFrame, properties=()) -> dict:
+    """GeoJSON-FeatureCollection mit einem Dreieck pro Fels (Größe nach Routenanzahl, Farbe nach Begehung)."""
+    # Alle Dreiecke auf einmal berechnen
+    anzahl = rocks["anzahl_routen"]
+    größe = np.select([anzahl <= 5, anzahl <= 10], [0.0015, 0.0022], default=0.003)
+    fill_color = np.where(rocks["has_done_route"], PLOT_HIGHLIGHT_COLOR, PLOT_TEXT_COLOR)  # Cyan = begangen, Schwarz = unbegangen
+    tooltip_content = (
+        "<b>" + rocks["name"].astype(str) + "</b><br>"
+        + "Routen: " + anzahl.astype(int).astype(str) + "<br>"
+        + "Gebiet: " + rocks["gebiet"].astype(str) + "<br>"
+        + "Star: " + np.where(rocks["rock_has_star"], "⭐", "—") + "<br>"
+        + "Begehung: " + np.where(rocks["has_done_route"], "✅", "❌")
+    )
+    return triangle_feature_collection(rocks, größe, fill_color, tooltip_content, properties=properties)
+
+
+def rock_triangles(rocks: pd.DataFrame, properties=()):
+    """Eine GeoJSON-Ebene mit allen Felsdreiecken."""
+    return triangle_layer(rock_feature_collection(rocks, properties=properties))
+
+
+def build_rock_map(rocks: pd.DataFrame, properties=()):
+    """Karte mit fester Ansicht und allen übergebenen Felsen als eine Dreiecks-Ebene."""
+    m = base_map()
+    layer = rock_triangles(rocks, properties=properties)
+    layer.add_to(m)
+    return m, layer
+
+
+@st.cache_resource(max_entries=50)
+def browser_features(user_id: str, version: tuple, _rocks: pd.DataFrame) -> dict:
+    """
+    Dreiecke aller Felsen mit den Filter-Properties für den Browser-Modus, einmal pro
+    Benutzer und Datenstand (siehe map_version) berechnet. Das Dict wird geteilt
+    und nicht kopiert – bitte nicht verändern.
+    """
+    map_rocks = _rocks.dropna(subset=["latitude", "longitude"])
+    map_rocks = map_rocks.assign(
+        gebiet=map_rocks["gebiet"].fillna(""),
+        star=map_rocks["rock_has_star"],
+        done=map_rocks["has_done_route"],
+    )
+    return rock_feature_collection(map_rocks, properties=["gebiet", "grades", "star", "done"])
+
+
+def browser_map(user_id: str, version: tuple, rocks: pd.DataFrame) -> folium.Map:
+    """
+    Karte für den Browser-Modus aus den gecachten Dreiecken. Die Karte selbst wird bei
+    jedem Lauf neu zusammengesetzt (st_folium verändert beim Rendern die Element-ids),
+    das ergibt bei gleichem Datenstand dasselbe Leaflet-Skript – der Browser behält
+    die Karte und bekommt nur den neuen FilterState.
+    """
+    m = base_map()
+    layer = triangle_layer(browser_features(user_id, version, rocks))
+    layer.add_to(m)
+    BrowserFilter(layer).add_to(m)
+    return m
+
+
+def map_version(user_id: str) -> tuple:
+    """Datenstand der Karte: Ladezeitpunkt des Katalogs, Fels-/Routen-Ereignisse und Begehungen des Benutzers."""
+    return (
+        get_catalog().loaded_at,
+        data_version("rocks"),
+        data_version("routes"),
+        data_version(f"ascents:{user_id}"),
+    )
+
+
+def map_viewport(map_state) -> tuple[tuple[float, float, float, float], int]:
+    """
+    (süd, west, nord, ost) und Zoomstufe aus dem letzten Rückgabewert von st_folium;
+    vor der ersten Rückmeldung der Karte die feste Startansicht.
+    """
+    default = ((MAP_BOUNDS[0][0], MAP_BOUNDS[0][1], MAP_BOUNDS[1][0], MAP_BOUNDS[1][1]), MAP_ZOOM)
+    if not isinstance(map_state, dict):
+        return default
+    bounds = map_state.get("bounds") or {}
+    south_west, north_east = bounds.get("_southWest") or {}, bounds.get("_northEast") or {}
+    try:
+        bbox = (float(south_west["lat"]), float(south_west["lng"]), float(north_east["lat"]), float(north_east["lng"]))
+        zoom = int(map_state.get("zoom") or MAP_ZOOM)
+    except (KeyError, TypeError, ValueError):
+        return default
+    return bbox, zoom
+
+
+def cluster_cell_degrees(zoom: int, lat: float) -> tuple[float, float]:
+    """Gitterzelle (Breite, Länge in Grad), die bei dieser Zoomstufe etwa CLUSTER_CELL_PX Pixel groß ist."""
+    # Web-Mercator: die Welt ist 256 * 2^zoom Pixel breit
+    cell_lon = 360 / 2 ** zoom * CLUSTER_CELL_PX / 256
+    return cell_lon * np.cos(np.radians(lat)), cell_lon
+
+
+def _mix_color(start: str, end: str, share) -> np.ndarray:
+    """Hex-Farben linear zwischen start (share 0) und end (share 1)."""
+    rgb = lambda color: np.array([int(color[i:i + 2], 16) for i in (1, 3, 5)], dtype=float)
+    mixed = np.rint(rgb(start) + np.asarray(share, dtype=float)[:, None] * (rgb(end) - rgb(start))).astype(int)
+    return np.array([f"#{r:02x}{g:02x}{b:02x}" for r, g, b in mixed], dtype=object)
+
+
+def rock_clusters(rocks: pd.DataFrame, zoom: int, lat: float) -> folium.FeatureGroup:
+    """Gitter-Cluster der Felsen: Größe nach Anzahl, Farbe von Schwarz (nichts) bis Cyan (alles begangen)."""
+    cell_lat, cell_lon = cluster_cell_degrees(zoom, lat)
+    clusters = grid_clusters(rocks["latitude"], rocks["longitude"], rocks["has_done_route"], cell_lat, cell_lon)
+    anteil = clusters["begangen"] / clusters["anzahl"]
+    tooltip_content = (
+        "<b>" + clusters["anzahl"].astype(str) + " Felsen</b><br>"
+        + "Begangen: " + clusters["begangen"].astype(str)
+        + " (" + (anteil * 100).round().astype(int).astype(str) + " %)"
+    )
+    radius = 10 + 3 * np.sqrt(clusters["anzahl"])
+    return cluster_layer(clusters, _mix_color(PLOT_TEXT_COLOR, PLOT_HIGHLIGHT_COLOR, anteil), tooltip_content, radius)
+
+
+def viewport_layer(rocks: pd.DataFrame, map_state) -> tuple[folium.FeatureGroup, str]:
+    """
+    Inhalt für den aktuellen Kartenausschnitt: nah dran die Felsen im Ausschnitt
+    als Dreiecke, weiter weg Cluster. Liefert die Ebene und eine Beschreibung.
+    """
+    (south, west, north, east), zoom = map_viewport(map_state)
+    # Etwas Rand um den Ausschnitt, damit beim Verschieben keine Lücken aufblitzen
+    pad_lat, pad_lon = (north - south) / 4, (east - west) / 4
+    visible_ids = get_catalog().rock_index.in_bbox(south - pad_lat, west - pad_lon, north + pad_lat, east + pad_lon)
+    visible = rocks[rocks["id"].isin(visible_ids)]
+
+    group = folium.FeatureGroup(name="Ausschnitt", control=False)
+    if zoom >= DETAIL_ZOOM and len(visible) <= MAX_DETAIL_ROCKS:
+        rock_triangles(visible).add_to(group)
+        return group, f"{len(visible)} Felsen im Ausschnitt"
+    group.add_child(rock_clusters(visible, zoom, (south + north) / 2))
+    return group, f"{len(visible)} Felsen im Ausschnitt, zusammengefasst (ab Zoomstufe {DETAIL_ZOOM} einzeln)"
 
 
 def show_filter_map_page(supabase_client: Client):
     st.markdown('<div class="headline-fonts">Gipfelkarte: Felsen finden</div>', unsafe_allow_html=True)
 
-    rocks, routes_for_stars, ascents, routes_full_data = fetch_data(supabase_client, st.session_state.get("user_id"))
+    user_id = st.session_state.get("user_id")
+    rocks, ascents, routes_full_data = fetch_data(supabase_client, user_id)
     if rocks.empty:
         st.warning("Keine Felsen zum Anzeigen verfügbar. Überprüfen Sie Ihre Datenquelle.")
         return
 
 
+    # --- Begangen-Flag pro Benutzer (Routenanzahl und Stern kommen aus dem Katalog) ---
+    done_rock_ids = ascents["gipfel_id"].unique() if not ascents.empty else []
+    rocks = rocks.assign(has_done_route=rocks["id"].isin(done_rock_ids))
+
+    # Filter und Karte laufen als Fragment: Filteränderungen laden keine Daten neu
+    show_filter_map(rocks, routes_full_data, len(done_rock_ids), user_id, map_version(user_id))
+
+
+@st.fragment
+def show_filter_map(rocks: pd.DataFrame, routes_full_data: pd.DataFrame, num_done_rocks: int,
+                    user_id: str | None = None, version: tuple = ()):
+    """Sidebar-Filter, Karte und Felsenliste (als Fragment einzeln neu ausführbar)."""
+    all_rocks = rocks
+
     # --- Sidebar Widgets ---
     st.sidebar.title("Filter")
     st.sidebar.write(f"🪨 Geladene Felsen: {len(rocks)}")
 
+    map_mode = st.sidebar.radio(
+        "Kartenmodus",
+        (MAP_MODE_BROWSER, MAP_MODE_SERVER, MAP_MODE_VIEWPORT),
+        key="filter_map_mode",
+        help="Im Browser filtern: Die Karte wird einmal geladen, Filter blenden Felsen nur ein/aus. "
+             "Nur sichtbaren Ausschnitt laden: Es werden nur die Felsen im Kartenausschnitt übertragen, "
+             "weit herausgezoomt als Cluster."
+    )
+
     gebiete = sorted(rocks["gebiet"].dropna().unique())
     selected_gebiet = st.sidebar.selectbox("Gebiet auswählen", ["Alle"] + gebiete)
 
+    grade_range = None
     grade_filter_enabled = st.sidebar.checkbox("Nach Schwierigkeitsgrad filtern")
     if grade_filter_enabled:
         grade_range = st.sidebar.slider("Schwierigkeitsgradbereich (1-12)", 1, 12, (1, 12))
@@ -164,17 +311,7 @@ def show_filter_map_page(supabase_client: Client):
     if selected_gebiet != "Alle":
         rocks = rocks[rocks["gebiet"] == selected_gebiet]
 
-    route_counts = routes_full_data.groupby("rock_id").size().reset_index(name="anzahl_routen")
-    rocks = rocks.merge(route_counts, left_on="id", right_on="rock_id", how="left")
-    rocks["anzahl_routen"] = rocks["anzahl_routen"].fillna(0).astype(int)
-
-    star_rocks = routes_for_stars.groupby("rock_id")["stern"].any().reset_index().rename(columns={"stern": "rock_has_star"})
-    rocks = rocks.merge(star_rocks, left_on="id", right_on="rock_id", how="left")
-    rocks["rock_has_star"] = rocks["rock_has_star"].fillna(False).astype(bool)
-
-    done_rock_ids = ascents["gipfel_id"].unique() if not ascents.empty else []
-    st.sidebar.write(f"✅ Begangene Felsen (distinct gipfel_id): {len(done_rock_ids)}")
-    rocks["has_done_route"] = rocks["id"].isin(done_rock_ids)
+    st.sidebar.write(f"✅ Begangene Felsen (distinct gipfel_id): {num_done_rocks}")
 
     filter_status = st.sidebar.radio(
         "Anzeige der Felsen",
@@ -195,47 +332,27 @@ def show_filter_map_page(supabase_client: Client):
     filtered = rocks.dropna(subset=["latitude", "longitude"])
     st.sidebar.write(f"🗺️ Sichtbare Felsen nach Filter: {len(filtered)}")
 
-    fixed_lat_center = 50.92
-    fixed_lon_center = 14.15
-    fixed_zoom_start = 12
-    fixed_bounds = [[50.85, 14.00], [50.99, 14.30]]
-
-    m = folium.Map(location=[fixed_lat_center, fixed_lon_center], zoom_start=fixed_zoom_start, tiles='CartoDB Positron')
-    m.fit_bounds(fixed_bounds)
-
-    for _, row in filtered.iterrows():
-        anzahl = row.get("anzahl_routen", 0)
-        if anzahl <= 5:
-            größe = 0.0015
-        elif anzahl <= 10:
-            größe = 0.0022
-        else:
-            größe = 0.003
-
-        if row.get("has_done_route", False):
-            fill_color = PLOT_HIGHLIGHT_COLOR  # Cyan für begangene Felsen
-        else:
-            fill_color = PLOT_TEXT_COLOR       # Schwarz für unbegangene Felsen
-
-        coords = make_triangle(row["latitude"], row["longitude"], größe)
-        if coords:
-            tooltip_content = f"""
-            <b>{row['name']}</b><br>
-            Routen: {int(anzahl)}<br>
-            Gebiet: {row['gebiet']}<br>
-            Star: {'⭐' if row.get('rock_has_star') else '—'}<br>
-            Begehung: {'✅' if row.get('has_done_route') else '❌'}
-            """
-            folium.Polygon(
-                locations=coords,
-                color=None,
-                fill=True,
-                fill_color=fill_color,
-                fill_opacity=0.89,
-                tooltip=folium.Tooltip(tooltip_content, sticky=True)
-            ).add_to(m)
-
-    st_folium(m, width=1400, height=600, key="folium_map")
+    if map_mode == MAP_MODE_BROWSER:
+        # Immer alle Felsen zeichnen – die Dreiecke kommen pro Datenstand aus dem Cache,
+        # an den Browser geht bei Filteränderungen nur der neue Filterzustand
+        m = browser_map(user_id, version, all_rocks)
+        state = filter_state_layer(
+            gebiet=None if selected_gebiet == "Alle" else selected_gebiet,
+            grade=grade_range,
+            done={"Begangene": True, "Unbegangene": False}.get(filter_status),
+            star=filter_has_star,
+        )
+        st_folium(m, width=1400, height=600, key="folium_map_browser", feature_group_to_add=state)
+    elif map_mode == MAP_MODE_VIEWPORT:
+        # Die Grundkarte bleibt gleich; Verschieben/Zoomen führt das Fragment mit dem neuen
+        # Ausschnitt erneut aus und tauscht nur die Ebene aus
+        layer, beschreibung = viewport_layer(filtered, st.session_state.get("folium_map_viewport"))
+        st.caption(beschreibung)
+        st_folium(base_map(), width=1400, height=600, key="folium_map_viewport",
+                  feature_group_to_add=layer, returned_objects=["bounds", "zoom"])
+    else:
+        m, _ = build_rock_map(filtered)
+        st_folium(m, width=1400, height=600, key="folium_map")
 
     st.markdown("---")
     if st.button("Gefilterte Felsen anzeigen & herunterladen"):
@@ -263,11 +380,7 @@ def show_filter_map_page(supabase_client: Client):
 
 
 if __name__ == "__main__":
-    load_dotenv()
-    url = os.getenv("SUPABASE_URL")
-    key = os.getenv("SUPABASE_KEY")
-    if url and key:
-        supabase_client_direct = create_client(url, key)
-        show_filter_map_page(supabase_client_direct)
+    if has_credentials():
+        show_filter_map_page(get_client())
     else:
         st.error("SUPABASE_URL oder SUPABASE_KEY nicht gesetzt. Kann nicht direkt ausgeführt werden.")
@@ -0,0 +1,71 @@
+# app_modules/home.py
+
+"""
+Daten der privaten Startseite.
+
+Zitat und "Zuletzt bestiegene Gipfel" werden gemeinsam geladen: beide Abfragen
+laufen parallel, die Gipfelnamen kommen für beide aus dem Katalog
+(keine zusätzlichen Abfragen auf rocks).
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from supabase import Client
+
+from app_modules.ascents_store import ascents_version
+from app_modules.catalog import get_catalog
+from app_modules.db import get_user_client
+from app_modules.quotes import random_quote
+from app_modules.utils import fetch_last_climbed_rocks
+
+
+@dataclass(frozen=True)
+class HomeData:
+    """Ergebnis des Loaders; bei einem Fehler ist der Wert None und der Fehler steht daneben."""
+    quote: dict | None
+    last_climbs: list | None
+    quote_error: Exception | None = None
+    last_climbs_error: Exception | None = None
+
+
+def load_home_data(user_id: str, client: Client | None = None, num_rocks: int = 10) -> HomeData:
+    """
+    Lädt Zitat (Kommentar-Index + eine Zeile) und die letzten N Gipfel gleichzeitig.
+    Die Threads machen keine Streamlit-Ausgaben; Fehler werden zurückgegeben und
+    von den Widgets im Haupt-Thread angezeigt.
+    """
+    client = client or get_user_client()
+    # Katalog vorab laden, damit nicht beide Threads auf dessen ersten Aufbau warten.
+    # Nur ein Vorwärmen: Fehler melden die Threads selbst (quote_error/last_climbs_error)
+    try:
+        get_catalog(client)
+    except Exception:
+        pass
+
+    # Kontext des Skriptlaufs weitergeben, damit st.cache_data im Thread greift
+    ctx = get_script_run_ctx()
+
+    def attach_ctx():
+        if ctx is not None:
+            add_script_run_ctx(threading.current_thread(), ctx)
+
+    with ThreadPoolExecutor(max_workers=2, initializer=attach_ctx) as executor:
+        quote_future = executor.submit(random_quote, user_id, client)
+        last_climbs_future = executor.submit(fetch_last_climbed_rocks, client, user_id, num_rocks, ascents_version(user_id))
+
+    quote, quote_error = None, None
+    try:
+        quote = quote_future.result()
+    except Exception as e:
+        quote_error = e
+
+    last_climbs, last_climbs_error = None, None
+    try:
+        last_climbs = last_climbs_future.result()
+    except Exception as e:
+        last_climbs_error = e
+
+    return HomeData(quote=quote, last_climbs=last_climbs, quote_error=quote_error, last_climbs_error=last_climbs_error)
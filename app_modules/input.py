@@ -1,17 +1,10 @@
-import os
 import pandas as pd
 import streamlit as st
-from dotenv import load_dotenv
-from supabase import create_client
 
-# .env laden – robust für Seiten im "pages/"-Ordner
-dotenv_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), ".env")
-load_dotenv(dotenv_path)
+from app_modules.db import get_client, get_user_client
 
-# Supabase-Verbindung
-SUPABASE_URL = os.environ.get("SUPABASE_URL")
-SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+# Supabase-Verbindung (geteilter Client, wird nur beim ersten Aufruf erstellt)
+supabase = get_client()
 
 st.title(" Begehung hinzufügen")
 
@@ -58,7 +51,7 @@ with st.form("neue_begehung"):
 # 5. Speichern
 if submitted:
     try:
-        response = supabase.table("ascents").insert({
+        response = get_user_client().table("ascents").insert({
             "datum": str(datum),
             "route_id": int(selected_route_id),
             "gipfel_id": int(selected_rock_id),
@@ -0,0 +1,129 @@
+# app_modules/invalidation.py
+
+"""
+Kleiner Publish/Subscribe-Bus für Cache-Invalidierung innerhalb des Prozesses.
+
+Wer Daten ändert, veröffentlicht ein Ereignis (z.B. AscentsAdded nach einem
+Insert). Caches melden sich mit Abhängigkeitsschlüsseln an und werden nur bei
+passenden Ereignissen verworfen oder aktualisiert:
+
+    @depends_on("ascents")
+    @st.cache_data
+    def fetch_ascents(): ...
+
+    subscribe("routes", lambda event: ...)
+
+Schlüssel: "ascents" (Begehungen irgendeines Benutzers), "ascents:<user_id>",
+"routes", "rocks".
+
+depends_on leert den Cache einer Funktion für alle Aufrufer. Caches pro Benutzer
+bekommen stattdessen data_version("ascents:<user_id>") als Parameter, dann ändert
+ein Ereignis nur den Schlüssel dieses Benutzers:
+
+    @st.cache_data(max_entries=100)
+    def fetch_done_ids(user_id, version): ...
+
+    fetch_done_ids(user_id, data_version(f"ascents:{user_id}"))
+"""
+
+import logging
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+# Schlüssel -> {Name: Handler}
+_subscribers = defaultdict(dict)
+# Schlüssel -> Anzahl der bisher veröffentlichten Ereignisse
+_versions = defaultdict(int)
+
+
+@dataclass(frozen=True)
+class AscentsAdded:
+    """Neue Begehungen eines Benutzers; rows wie von Supabase nach dem Insert zurückgegeben (mit id)."""
+    user_id: str
+    rows: tuple
+
+    @property
+    def keys(self) -> tuple:
+        return ("ascents", f"ascents:{self.user_id}")
+
+
+@dataclass(frozen=True)
+class AscentsChanged:
+    """Begehungen eines Benutzers geändert oder gelöscht – dessen Daten komplett neu laden."""
+    user_id: str
+
+    @property
+    def keys(self) -> tuple:
+        return ("ascents", f"ascents:{self.user_id}")
+
+
+@dataclass(frozen=True)
+class RoutesChanged:
+    """Routen der angegebenen Felsen geändert (leer = alle Routen)."""
+    rock_ids: tuple = ()
+
+    @property
+    def keys(self) -> tuple:
+        return ("routes",)
+
+
+@dataclass(frozen=True)
+class RocksChanged:
+    """Felsen oder Sektoren geändert."""
+    rock_ids: tuple = ()
+
+    @property
+    def keys(self) -> tuple:
+        return ("rocks",)
+
+
+def subscribe(key: str, handler, name: str | None = None):
+    """
+    Meldet handler(event) für einen Abhängigkeitsschlüssel an.
+    Mit name ersetzt eine erneute Anmeldung die alte (Skripte, die Streamlit bei jedem Rerun neu ausführt).
+    """
+    name = name or f"{getattr(handler, '__module__', '')}.{getattr(handler, '__qualname__', id(handler))}"
+    with _lock:
+        _subscribers[key][name] = handler
+    return handler
+
+
+def depends_on(*keys):
+    """
+    Decorator für st.cache_data-Funktionen: leert deren ganzen Cache (alle Parameter)
+    bei jedem Ereignis mit einem der Schlüssel. Muss außen stehen (über @st.cache_data).
+    Für Daten einzelner Benutzer data_version als Parameter verwenden.
+    """
+    def decorator(cached_function):
+        name = f"{cached_function.__module__}.{cached_function.__qualname__}.clear"
+        for key in keys:
+            subscribe(key, lambda event: cached_function.clear(), name=name)
+        return cached_function
+    return decorator
+
+
+def data_version(key: str) -> int:
+    """Zählt bei jedem Ereignis mit diesem Schlüssel hoch (als Cache-Parameter, z.B. "ascents:<user_id>")."""
+    with _lock:
+        return _versions.get(key, 0)
+
+
+def publish(event):
+    """
+    Ruft alle für die Schlüssel des Ereignisses angemeldeten Handler auf (jeden höchstens einmal).
+    Fehler einzelner Handler werden geloggt und halten die übrigen nicht auf.
+    """
+    with _lock:
+        handlers = {}
+        for key in event.keys:
+            _versions[key] += 1
+            handlers.update(_subscribers.get(key, {}))
+    for handler in handlers.values():
+        try:
+            handler(event)
+        except Exception:
+            logger.exception("Cache-Invalidierung für %s fehlgeschlagen", event)
@@ -0,0 +1,124 @@
+# app_modules/leaderboard.py
+
+"""
+Vereins-Rangliste: verschiedene Gipfel pro Mitglied, Fortschritt pro Gebiet
+und Gipfel im laufenden Jahr.
+
+Gelesen werden nur die per Trigger fortgeschriebenen Zähler aus
+app_modules.leaderboard_sql – eine Zeile pro Mitglied (und Gebiet/Jahr),
+unabhängig davon, wie viele Begehungen der Verein insgesamt hat.
+"""
+
+from datetime import datetime
+
+import pandas as pd
+import streamlit as st
+from supabase import Client
+
+from app_modules.catalog import get_catalog
+from app_modules.db import fetch_all_rows, get_user_client
+from app_modules.invalidation import depends_on
+
+# Begehungen anderer Mitglieder (andere Prozesse) erscheinen spätestens nach dieser Zeit
+LEADERBOARD_TTL_SECONDS = 60
+
+
+@depends_on("ascents")
+@st.cache_data(ttl=LEADERBOARD_TTL_SECONDS, show_spinner=False)
+def fetch_member_totals(_client: Client) -> pd.DataFrame:
+    """user_id, gipfel (verschiedene Gipfel), begehungen – eine Zeile pro Mitglied."""
+    rows = fetch_all_rows("leaderboard_users", "user_id, gipfel, begehungen", order_by="user_id", client=_client)
+    return pd.DataFrame(rows, columns=["user_id", "gipfel", "begehungen"])
+
+
+@depends_on("ascents")
+@st.cache_data(ttl=LEADERBOARD_TTL_SECONDS, show_spinner=False)
+def fetch_year_counts(_client: Client, jahr: int) -> pd.DataFrame:
+    """user_id, gipfel – verschiedene Gipfel im Jahr, eine Zeile pro Mitglied mit Begehungen in dem Jahr."""
+    rows = fetch_all_rows("leaderboard_years", "user_id, gipfel", filters=[("eq", "jahr", jahr)], order_by="user_id", client=_client)
+    return pd.DataFrame(rows, columns=["user_id", "gipfel"])
+
+
+@depends_on("ascents", "rocks")
+@st.cache_data(ttl=LEADERBOARD_TTL_SECONDS, show_spinner=False)
+def fetch_sector_counts(_client: Client, sector_id: int) -> pd.DataFrame:
+    """user_id, gipfel – verschiedene Gipfel im Gebiet, eine Zeile pro Mitglied mit Begehungen dort."""
+    rows = fetch_all_rows("leaderboard_sectors", "user_id, gipfel", filters=[("eq", "sector_id", sector_id)], order_by="user_id", client=_client)
+    return pd.DataFrame(rows, columns=["user_id", "gipfel"])
+
+
+def member_label(user_id: str, current_user_id: str | None) -> str:
+    """Andere Mitglieder nur mit gekürzter id (Namen/E-Mails der anderen sind nicht lesbar)."""
+    return "Du" if user_id == current_user_id else f"Mitglied {str(user_id)[:8]}"
+
+
+def ranking(counts: pd.DataFrame, current_user_id: str | None, total: int | None = None) -> pd.DataFrame:
+    """
+    Rangliste nach Gipfeln (absteigend, gleiche Anzahl = gleicher Rang).
+    Mit total kommt der Anteil in Prozent dazu.
+    """
+    counts = counts.sort_values(["gipfel", "user_id"], ascending=[False, True], ignore_index=True)
+    table = pd.DataFrame({
+        "Rang": counts["gipfel"].rank(method="min", ascending=False).astype(int),
+        "Mitglied": [member_label(user_id, current_user_id) for user_id in counts["user_id"]],
+        "Gipfel": counts["gipfel"].astype(int),
+    })
+    if "begehungen" in counts.columns:
+        table["Begehungen"] = counts["begehungen"].astype(int)
+    if total:
+        table["Geschafft (%)"] = (counts["gipfel"] / total * 100).round(1)
+    return table
+
+
+def show_leaderboard_page(supabase_client: Client | None = None):
+    st.markdown('<div class="headline-fonts">Vereins-Rangliste</div>', unsafe_allow_html=True)
+
+    # Die Zähler sind nur für angemeldete Benutzer lesbar (RLS), also über den Client der Sitzung
+    client = supabase_client or get_user_client()
+    user_id = st.session_state.get("user_id")
+    current_year = datetime.now().year
+
+    try:
+        catalog = get_catalog(client)
+        totals = fetch_member_totals(client)
+    except Exception as e:
+        st.error(f"Fehler beim Laden der Rangliste: {e}")
+        return
+
+    if totals.empty:
+        st.info("Noch keine Begehungen im Verein eingetragen.")
+        return
+
+    tab_gesamt, tab_jahr, tab_gebiet = st.tabs(["Gipfel gesamt", f"Gipfel {current_year}", "Pro Gebiet"])
+
+    with tab_gesamt:
+        st.dataframe(ranking(totals, user_id, total=len(catalog.rocks)), hide_index=True, use_container_width=True)
+
+    with tab_jahr:
+        try:
+            year_counts = fetch_year_counts(client, current_year)
+        except Exception as e:
+            st.error(f"Fehler beim Laden der Jahreswertung: {e}")
+        else:
+            if year_counts.empty:
+                st.info(f"Im Jahr {current_year} wurden noch keine Gipfel bestiegen.")
+            else:
+                st.dataframe(ranking(year_counts, user_id), hide_index=True, use_container_width=True)
+
+    with tab_gebiet:
+        sector_ids = sorted(catalog.sector_rocks, key=lambda sector_id: str(catalog.sector_names.get(sector_id, "")))
+        if not sector_ids:
+            st.info("Keine Gebiete vorhanden.")
+            return
+        sector_id = st.selectbox("Gebiet auswählen", sector_ids, format_func=catalog.sector_names.get, key="leaderboard_sector")
+        try:
+            sector_counts = fetch_sector_counts(client, int(sector_id))
+        except Exception as e:
+            st.error(f"Fehler beim Laden der Gebietswertung: {e}")
+            return
+        total = len(catalog.sector_rocks[sector_id])
+        st.markdown(f"**{catalog.sector_names.get(sector_id)}**: {total} Gipfel")
+        if sector_counts.empty:
+            st.info("In diesem Gebiet hat noch kein Mitglied einen Gipfel bestiegen.")
+        else:
+            st.dataframe(ranking(sector_counts, user_id, total=total), hide_index=True, use_container_width=True)
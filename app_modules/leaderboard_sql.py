@@ -0,0 +1,216 @@
+# app_modules/leaderboard_sql.py
+
+"""
+Zähler für die Vereins-Rangliste, fortgeschrieben per Trigger auf ascents.
+
+Statt bei jeder Anzeige die Begehungen aller Mitglieder zu lesen, hält die
+Datenbank pro Mitglied kleine Zählertabellen aktuell:
+  - leaderboard_users    (user_id)           -> verschiedene Gipfel, Begehungen
+  - leaderboard_sectors  (user_id, sector_id) -> verschiedene Gipfel im Gebiet
+  - leaderboard_years    (user_id, jahr)      -> verschiedene Gipfel im Jahr
+Für das "verschieden" merken sich leaderboard_peaks und leaderboard_peak_years,
+wie oft ein Mitglied einen Gipfel (im Jahr) begangen hat; nur die erste bzw.
+letzte Begehung eines Gipfels ändert die Zähler.
+
+Die Anweisungen sind wie in app_modules.statistik_sql in einem SQL geschrieben,
+das Postgres und SQLite verstehen. Daraus entstehen
+  - die Postgres-Migration (Tabellen, Trigger-Funktion, leaderboard_rebuild()),
+  - Tabellen und Trigger im lokalen SQLite-Backend (create_leaderboard).
+
+Migration erzeugen:
+    python -m app_modules.leaderboard_sql migration sql/leaderboard.sql
+"""
+
+import os
+import sqlite3
+import sys
+
+# Tabelle -> (Spalten mit Typ, Primärschlüssel); Typen gelten für Postgres und SQLite
+TABLES = {
+    "leaderboard_peaks": ((("user_id", "TEXT"), ("gipfel_id", "BIGINT"), ("begehungen", "INTEGER")), ("user_id", "gipfel_id")),
+    "leaderboard_peak_years": ((("user_id", "TEXT"), ("jahr", "INTEGER"), ("gipfel_id", "BIGINT"), ("begehungen", "INTEGER")), ("user_id", "jahr", "gipfel_id")),
+    "leaderboard_users": ((("user_id", "TEXT"), ("gipfel", "INTEGER"), ("begehungen", "INTEGER")), ("user_id",)),
+    "leaderboard_sectors": ((("user_id", "TEXT"), ("sector_id", "BIGINT"), ("gipfel", "INTEGER")), ("user_id", "sector_id")),
+    "leaderboard_years": ((("user_id", "TEXT"), ("jahr", "INTEGER"), ("gipfel", "INTEGER")), ("user_id", "jahr")),
+}
+
+# Jahr einer Begehung, wie in den Statistik-Abfragen über substr auf dem Datum als Text
+_YEAR = "CAST(substr(CAST({row}.datum AS TEXT), 1, 4) AS INTEGER)"
+
+# Ist die Zeile {row} die einzige Begehung dieses Gipfels (im Jahr)? Ergibt 1 oder 0.
+_ONLY_PEAK = "(SELECT COUNT(*) FROM leaderboard_peaks WHERE user_id = {row}.user_id AND gipfel_id = {row}.gipfel_id AND begehungen = 1)"
+_ONLY_PEAK_YEAR = ("(SELECT COUNT(*) FROM leaderboard_peak_years WHERE user_id = {row}.user_id AND jahr = " + _YEAR
+                   + " AND gipfel_id = {row}.gipfel_id AND begehungen = 1)")
+
+# Neue Begehung {row} zählen (nach dem Insert)
+ADD_STATEMENTS = (
+    """INSERT INTO leaderboard_peaks (user_id, gipfel_id, begehungen)
+       SELECT {row}.user_id, {row}.gipfel_id, 1 WHERE {row}.user_id IS NOT NULL AND {row}.gipfel_id IS NOT NULL
+       ON CONFLICT (user_id, gipfel_id) DO UPDATE SET begehungen = leaderboard_peaks.begehungen + 1""",
+    """INSERT INTO leaderboard_peak_years (user_id, jahr, gipfel_id, begehungen)
+       SELECT {row}.user_id, """ + _YEAR + """, {row}.gipfel_id, 1
+       WHERE {row}.user_id IS NOT NULL AND {row}.gipfel_id IS NOT NULL AND {row}.datum IS NOT NULL
+       ON CONFLICT (user_id, jahr, gipfel_id) DO UPDATE SET begehungen = leaderboard_peak_years.begehungen + 1""",
+    """INSERT INTO leaderboard_users (user_id, gipfel, begehungen)
+       SELECT {row}.user_id, """ + _ONLY_PEAK + """, 1 WHERE {row}.user_id IS NOT NULL
+       ON CONFLICT (user_id) DO UPDATE SET gipfel = leaderboard_users.gipfel + excluded.gipfel,
+                                           begehungen = leaderboard_users.begehungen + 1""",
+    """INSERT INTO leaderboard_sectors (user_id, sector_id, gipfel)
+       SELECT {row}.user_id, r.sector_id, 1 FROM rocks r
+       WHERE r.id = {row}.gipfel_id AND r.sector_id IS NOT NULL AND """ + _ONLY_PEAK + """ = 1
+       ON CONFLICT (user_id, sector_id) DO UPDATE SET gipfel = leaderboard_sectors.gipfel + 1""",
+    """INSERT INTO leaderboard_years (user_id, jahr, gipfel)
+       SELECT {row}.user_id, """ + _YEAR + """, 1 WHERE """ + _ONLY_PEAK_YEAR + """ = 1
+       ON CONFLICT (user_id, jahr) DO UPDATE SET gipfel = leaderboard_years.gipfel + 1""",
+)
+
+# Gelöschte Begehung {row} abziehen (nach dem Delete); die Zähler zuerst, solange die Mengen noch den alten Stand haben
+REMOVE_STATEMENTS = (
+    """UPDATE leaderboard_users SET gipfel = gipfel - """ + _ONLY_PEAK + """, begehungen = begehungen - 1
+       WHERE user_id = {row}.user_id""",
+    """UPDATE leaderboard_sectors SET gipfel = gipfel - 1
+       WHERE user_id = {row}.user_id AND sector_id = (SELECT sector_id FROM rocks WHERE id = {row}.gipfel_id)
+         AND """ + _ONLY_PEAK + """ = 1""",
+    """UPDATE leaderboard_years SET gipfel = gipfel - 1
+       WHERE user_id = {row}.user_id AND jahr = """ + _YEAR + """ AND """ + _ONLY_PEAK_YEAR + """ = 1""",
+    """UPDATE leaderboard_peaks SET begehungen = begehungen - 1
+       WHERE user_id = {row}.user_id AND gipfel_id = {row}.gipfel_id""",
+    """DELETE FROM leaderboard_peaks WHERE user_id = {row}.user_id AND gipfel_id = {row}.gipfel_id AND begehungen <= 0""",
+    """UPDATE leaderboard_peak_years SET begehungen = begehungen - 1
+       WHERE user_id = {row}.user_id AND jahr = """ + _YEAR + """ AND gipfel_id = {row}.gipfel_id""",
+    """DELETE FROM leaderboard_peak_years
+       WHERE user_id = {row}.user_id AND jahr = """ + _YEAR + """ AND gipfel_id = {row}.gipfel_id AND begehungen <= 0""",
+    # Leere Zähler entfernen, damit der Stand genau dem Neuaufbau entspricht
+    """DELETE FROM leaderboard_users WHERE user_id = {row}.user_id AND begehungen <= 0""",
+    """DELETE FROM leaderboard_sectors WHERE user_id = {row}.user_id AND gipfel <= 0""",
+    """DELETE FROM leaderboard_years WHERE user_id = {row}.user_id AND gipfel <= 0""",
+)
+
+# Alle Zähler aus den Begehungen neu aufbauen (Erstbefüllung und Reparatur)
+REBUILD_STATEMENTS = tuple(f"DELETE FROM {table}" for table in TABLES) + (
+    """INSERT INTO leaderboard_peaks (user_id, gipfel_id, begehungen)
+       SELECT user_id, gipfel_id, COUNT(*) FROM ascents
+       WHERE user_id IS NOT NULL AND gipfel_id IS NOT NULL
+       GROUP BY user_id, gipfel_id""",
+    """INSERT INTO leaderboard_peak_years (user_id, jahr, gipfel_id, begehungen)
+       SELECT user_id, """ + _YEAR.format(row="ascents") + """, gipfel_id, COUNT(*) FROM ascents
+       WHERE user_id IS NOT NULL AND gipfel_id IS NOT NULL AND datum IS NOT NULL
+       GROUP BY 1, 2, 3""",
+    """INSERT INTO leaderboard_users (user_id, gipfel, begehungen)
+       SELECT user_id, COUNT(DISTINCT gipfel_id), COUNT(*) FROM ascents
+       WHERE user_id IS NOT NULL
+       GROUP BY user_id""",
+    """INSERT INTO leaderboard_sectors (user_id, sector_id, gipfel)
+       SELECT p.user_id, r.sector_id, COUNT(*) FROM leaderboard_peaks p JOIN rocks r ON r.id = p.gipfel_id
+       WHERE r.sector_id IS NOT NULL
+       GROUP BY 1, 2""",
+    """INSERT INTO leaderboard_years (user_id, jahr, gipfel)
+       SELECT user_id, jahr, COUNT(*) FROM leaderboard_peak_years
+       GROUP BY 1, 2""",
+)
+
+
+def _statements(statements, row: str) -> list:
+    # Die Zähler speichern user_id als Text; ascents.user_id ist in Supabase eine uuid
+    return [statement.replace("{row}.user_id", "CAST({row}.user_id AS TEXT)").format(row=row) for statement in statements]
+
+
+def _create_tables() -> list:
+    sql = []
+    for table, (columns, primary_key) in TABLES.items():
+        column_sql = ", ".join(f"{name} {sql_type} NOT NULL" for name, sql_type in columns)
+        sql.append(f"CREATE TABLE IF NOT EXISTS {table} ({column_sql}, PRIMARY KEY ({', '.join(primary_key)}))")
+    return sql
+
+
+def _indented(statements, indent: str) -> str:
+    return "\n".join(indent + statement.replace("\n", "\n" + indent) + ";" for statement in statements)
+
+
+def postgres_migration() -> str:
+    """
+    Tabellen, Trigger-Funktion und Trigger für Postgres/Supabase, danach Erstbefüllung.
+    Die Funktionen laufen mit den Rechten des Eigentümers (die Zähler sind für
+    Mitglieder nur lesbar); leaderboard_rebuild() baut alle Zähler neu auf.
+    """
+    header = "-- Erzeugt mit: python -m app_modules.leaderboard_sql migration\n-- Nicht von Hand bearbeiten, Quelle ist app_modules/leaderboard_sql.py\n\n"
+    tables = "\n".join(statement + ";" for statement in _create_tables())
+    policies = "\n".join(
+        f"ALTER TABLE public.{table} ENABLE ROW LEVEL SECURITY;\n"
+        f"DROP POLICY IF EXISTS {table}_read ON public.{table};\n"
+        f"CREATE POLICY {table}_read ON public.{table} FOR SELECT TO authenticated USING (true);"
+        for table in TABLES
+    )
+    trigger = (
+        "CREATE OR REPLACE FUNCTION public.leaderboard_on_ascent()\n"
+        "RETURNS trigger\n"
+        "LANGUAGE plpgsql SECURITY DEFINER SET search_path = public\n"
+        "AS $$\n"
+        "BEGIN\n"
+        "    IF TG_OP IN ('DELETE', 'UPDATE') THEN\n"
+        f"{_indented(_statements(REMOVE_STATEMENTS, 'OLD'), ' ' * 8)}\n"
+        "    END IF;\n"
+        "    IF TG_OP IN ('INSERT', 'UPDATE') THEN\n"
+        f"{_indented(_statements(ADD_STATEMENTS, 'NEW'), ' ' * 8)}\n"
+        "    END IF;\n"
+        "    RETURN NULL;\n"
+        "END\n"
+        "$$;\n\n"
+        "DROP TRIGGER IF EXISTS leaderboard_on_ascent ON public.ascents;\n"
+        "CREATE TRIGGER leaderboard_on_ascent\n"
+        "AFTER INSERT OR UPDATE OR DELETE ON public.ascents\n"
+        "FOR EACH ROW EXECUTE FUNCTION public.leaderboard_on_ascent();\n"
+    )
+    rebuild = (
+        "CREATE OR REPLACE FUNCTION public.leaderboard_rebuild()\n"
+        "RETURNS void\n"
+        "LANGUAGE plpgsql SECURITY DEFINER SET search_path = public\n"
+        "AS $$\n"
+        "BEGIN\n"
+        f"{_indented(REBUILD_STATEMENTS, ' ' * 4)}\n"
+        "END\n"
+        "$$;\n"
+        "REVOKE EXECUTE ON FUNCTION public.leaderboard_rebuild() FROM PUBLIC, anon, authenticated;\n\n"
+        "SELECT public.leaderboard_rebuild();\n"
+    )
+    return "\n\n".join((header + tables, policies, trigger, rebuild))
+
+
+def create_leaderboard(conn: sqlite3.Connection):
+    """Legt Zählertabellen und Trigger in SQLite an und befüllt sie beim ersten Mal aus den Begehungen."""
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'leaderboard_users'").fetchone()
+    with conn:
+        for statement in _create_tables():
+            conn.execute(statement)
+        # SQLite kennt keine Trigger-Funktionen: je ein Trigger pro Operation
+        triggers = {
+            "INSERT": _statements(ADD_STATEMENTS, "NEW"),
+            "DELETE": _statements(REMOVE_STATEMENTS, "OLD"),
+            "UPDATE": _statements(REMOVE_STATEMENTS, "OLD") + _statements(ADD_STATEMENTS, "NEW"),
+        }
+        for operation, statements in triggers.items():
+            # Immer neu anlegen, damit geänderte Anweisungen auch in bestehenden Dateien greifen
+            conn.execute(f"DROP TRIGGER IF EXISTS leaderboard_ascent_{operation.lower()}")
+            conn.execute(
+                f"CREATE TRIGGER leaderboard_ascent_{operation.lower()} AFTER {operation} ON ascents\n"
+                f"BEGIN\n{_indented(statements, '    ')}\nEND"
+            )
+    if not exists:
+        rebuild_leaderboard(conn)
+
+
+def rebuild_leaderboard(conn: sqlite3.Connection):
+    with conn:
+        for statement in REBUILD_STATEMENTS:
+            conn.execute(statement)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "migration":
+        path = sys.argv[2] if len(sys.argv) > 2 else os.path.join("sql", "leaderboard.sql")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(postgres_migration())
+        print(f"Migration geschrieben: {path}")
+    else:
+        print("Aufruf: python -m app_modules.leaderboard_sql migration [pfad.sql]")
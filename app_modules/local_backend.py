@@ -0,0 +1,328 @@
+# app_modules/local_backend.py
+
+"""
+Lokales Daten-Backend auf Basis einer SQLite-Datei.
+
+Bildet die Teile der Supabase-API nach, die die App benutzt
+(table(...).select(...).eq/.in_/.order/.limit/.range(...).execute(), insert, rpc, auth),
+damit alle Seiten offline und reproduzierbar profiliert werden können.
+
+Aktivieren über die Umgebung:
+    FELSENAPP_BACKEND=local
+    FELSENAPP_LOCAL_DB=data/felsenapp.sqlite   (optional)
+    FELSENAPP_LOCAL_USER_ID=<uuid>              (optional, Benutzer nach dem Login)
+    FELSENAPP_LOCAL_ROLE=service_role           (optional, Rolle ohne Login, Standard anon)
+
+Wie bei Supabase mit RLS sehen Clients ohne Login (Rolle anon) die Tabellen aus
+RLS_TABLES nicht: Abfragen liefern keine Zeilen, Inserts werden abgelehnt.
+service_role entspricht dem Service-Key und umgeht das (z.B. für Import-Skripte).
+
+Snapshot aus Supabase erstellen:
+    python -m app_modules.local_backend snapshot data/felsenapp.sqlite
+"""
+
+import os
+import sqlite3
+import sys
+import threading
+import uuid
+from types import SimpleNamespace
+
+from postgrest import APIError, APIResponse
+
+# Tabellen des Snapshots: Spalten mit SQLite-Typ, die erste Spalte ist der Primärschlüssel
+SCHEMA = {
+    "sector": {"id": "INTEGER", "name": "TEXT"},
+    "rocks": {"id": "INTEGER", "name": "TEXT", "sector_id": "INTEGER", "latitude": "REAL", "longitude": "REAL", "hoehe": "REAL"},
+    "routes": {"id": "INTEGER", "rock_id": "INTEGER", "name": "TEXT", "grade": "NUMERIC", "number": "NUMERIC", "stern": "BOOLEAN"},
+    "ascents": {"id": "INTEGER", "user_id": "TEXT", "datum": "TEXT", "gipfel_id": "INTEGER", "route_id": "INTEGER",
+                "partnerin": "TEXT", "stil": "TEXT", "kommentar": "TEXT", "bewertung": "INTEGER"},
+    "region": {"region_id": "INTEGER", "region_name": "TEXT"},
+    "peaks": {"peak_id": "INTEGER", "gipfel": "TEXT", "region_id": "INTEGER", "hoehe": "REAL"},
+}
+
+
+# Rolle eines Clients ohne Login
+LOCAL_ROLE = os.environ.get("FELSENAPP_LOCAL_ROLE", "anon").strip().lower()
+# Tabellen mit Policies nur für angemeldete Benutzer (die Ranglisten-Tabellen kommen aus leaderboard_sql.TABLES)
+RLS_TABLES = ("ascents",)
+
+
+def _rls_tables() -> set:
+    from app_modules.leaderboard_sql import TABLES
+
+    return set(RLS_TABLES) | set(TABLES)
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def create_schema(conn: sqlite3.Connection):
+    """Legt alle Tabellen aus SCHEMA an (falls noch nicht vorhanden), dazu die Ranglisten-Zähler samt Triggern."""
+    from app_modules.leaderboard_sql import create_leaderboard
+
+    for table, columns in SCHEMA.items():
+        primary_key = next(iter(columns))
+        column_sql = ", ".join(
+            f"{_quote(name)} {sql_type}" + (" PRIMARY KEY" if name == primary_key else "")
+            for name, sql_type in columns.items()
+        )
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {_quote(table)} ({column_sql})")
+    conn.commit()
+    create_leaderboard(conn)
+
+
+class LocalQuery:
+    """Nachbau des PostgREST-Query-Builders für eine Tabelle."""
+
+    def __init__(self, client: "LocalClient", table: str):
+        self._client = client
+        self._table = table
+        self._columns = ["*"]
+        self._count = None
+        self._where = []
+        self._params = []
+        self._order = []
+        self._limit = None
+        self._offset = None
+        self._insert_rows = None
+
+    def _column(self, name: str) -> str:
+        name = name.strip()
+        if name not in self._client.columns(self._table):
+            raise APIError({"message": f"column {self._table}.{name} does not exist", "code": "42703"})
+        return _quote(name)
+
+    def _filter(self, column: str, operator: str, value):
+        self._where.append(f"{self._column(column)} {operator} ?")
+        self._params.append(value)
+        return self
+
+    # --- Auswahl ---
+    def select(self, *columns, count=None, head=None):
+        self._columns = [c.strip() for part in columns for c in part.split(",") if c.strip()] or ["*"]
+        self._count = count
+        return self
+
+    def insert(self, rows, **kwargs):
+        self._insert_rows = [rows] if isinstance(rows, dict) else list(rows)
+        return self
+
+    # --- Filter ---
+    def eq(self, column, value):
+        return self._filter(column, "=", value)
+
+    def neq(self, column, value):
+        return self._filter(column, "<>", value)
+
+    def gt(self, column, value):
+        return self._filter(column, ">", value)
+
+    def gte(self, column, value):
+        return self._filter(column, ">=", value)
+
+    def lt(self, column, value):
+        return self._filter(column, "<", value)
+
+    def lte(self, column, value):
+        return self._filter(column, "<=", value)
+
+    def like(self, column, pattern):
+        return self._filter(column, "LIKE", pattern.replace("*", "%"))
+
+    def ilike(self, column, pattern):
+        # LIKE ist in SQLite für ASCII ohnehin unabhängig von Groß-/Kleinschreibung
+        return self._filter(column, "LIKE", pattern.replace("*", "%"))
+
+    def in_(self, column, values):
+        values = list(values)
+        if not values:
+            self._where.append("0 = 1")
+            return self
+        self._where.append(f"{self._column(column)} IN ({', '.join('?' * len(values))})")
+        self._params.extend(values)
+        return self
+
+    def is_(self, column, value):
+        if value in (None, "null"):
+            self._where.append(f"{self._column(column)} IS NULL")
+        else:
+            self._where.append(f"{self._column(column)} IS {'TRUE' if value in (True, 'true') else 'FALSE'}")
+        return self
+
+    # --- Sortierung / Seiten ---
+    def order(self, column, desc=False, nullsfirst=None, **kwargs):
+        direction = "DESC" if desc else "ASC"
+        nulls = "" if nullsfirst is None else (" NULLS FIRST" if nullsfirst else " NULLS LAST")
+        self._order.append(f"{self._column(column)} {direction}{nulls}")
+        return self
+
+    def limit(self, size, **kwargs):
+        self._limit = int(size)
+        return self
+
+    def range(self, start, end, **kwargs):
+        self._offset = int(start)
+        self._limit = int(end) - int(start) + 1
+        return self
+
+    # --- Ausführen ---
+    def _where_sql(self) -> str:
+        return f" WHERE {' AND '.join(self._where)}" if self._where else ""
+
+    def execute(self) -> APIResponse:
+        if self._insert_rows is not None:
+            return APIResponse(data=self._client.insert(self._table, self._insert_rows), count=None)
+        if self._client.hidden(self._table):
+            return APIResponse(data=[], count=0 if self._count == "exact" else None)
+
+        columns = "*" if self._columns == ["*"] else ", ".join(self._column(c) for c in self._columns)
+        sql = f"SELECT {columns} FROM {_quote(self._table)}{self._where_sql()}"
+        if self._order:
+            sql += f" ORDER BY {', '.join(self._order)}"
+        if self._limit is not None:
+            sql += f" LIMIT {self._limit}"
+            if self._offset:
+                sql += f" OFFSET {self._offset}"
+
+        data = self._client.query(sql, self._params)
+        count = None
+        if self._count == "exact":
+            count = self._client.query(f"SELECT COUNT(*) AS n FROM {_quote(self._table)}{self._where_sql()}", self._params)[0]["n"]
+        return APIResponse(data=data, count=count)
+
+
+class LocalRpc:
+    """Aufruf einer SQL-Funktion (siehe app_modules.statistik_sql) mit benannten Parametern."""
+
+    def __init__(self, client: "LocalClient", sql: str, params: dict):
+        self._client = client
+        self._sql = sql
+        self._params = params
+
+    def execute(self) -> APIResponse:
+        return APIResponse(data=self._client.query(self._sql, self._params), count=None)
+
+
+class _LocalAuth:
+    """Minimaler Auth-Ersatz: jede Anmeldung gelingt, der Client läuft danach als 'authenticated'."""
+
+    def __init__(self, client: "LocalClient"):
+        self._client = client
+
+    def _user(self, credentials: dict):
+        email = credentials.get("email") or "lokal@felsenapp"
+        user_id = os.environ.get("FELSENAPP_LOCAL_USER_ID") or str(uuid.uuid5(uuid.NAMESPACE_URL, email))
+        self._client.role = "authenticated"
+        return SimpleNamespace(user=SimpleNamespace(id=user_id, email=email), session=None)
+
+    def sign_in_with_password(self, credentials: dict):
+        return self._user(credentials)
+
+    def sign_up(self, credentials: dict):
+        return self._user(credentials)
+
+    def sign_out(self, *args, **kwargs):
+        self._client.role = LOCAL_ROLE
+        return None
+
+
+class LocalClient:
+    """Ersatz für supabase.Client, der alle Abfragen gegen eine SQLite-Datei ausführt."""
+
+    def __init__(self, path: str):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self._columns = {}
+        create_schema(self._conn)
+        self.role = LOCAL_ROLE
+        self.auth = _LocalAuth(self)
+
+    def hidden(self, table: str) -> bool:
+        """Wie RLS ohne Policy für anon: Tabelle für diesen Client nicht sichtbar."""
+        return self.role == "anon" and table in _rls_tables()
+
+    def table(self, table_name: str) -> LocalQuery:
+        if not self.columns(table_name):
+            raise APIError({"message": f'relation "{table_name}" does not exist', "code": "42P01"})
+        return LocalQuery(self, table_name)
+
+    def columns(self, table: str) -> list:
+        if table not in self._columns:
+            with self._lock:
+                rows = self._conn.execute(f"PRAGMA table_info({_quote(table)})").fetchall()
+            self._columns[table] = [row["name"] for row in rows]
+        return self._columns[table]
+
+    def query(self, sql: str, params=()) -> list:
+        params = params if isinstance(params, dict) else list(params)
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params).fetchall()]
+
+    def rpc(self, fn: str, params: dict | None = None) -> LocalRpc:
+        # Dieselben SQL-Abfragen, aus denen auch die Postgres-Funktionen erzeugt werden
+        from app_modules.statistik_sql import FUNCTIONS, PARAM_DEFAULTS
+
+        if fn not in FUNCTIONS:
+            raise APIError({"message": f"Could not find the function public.{fn}", "code": "PGRST202"})
+        query = FUNCTIONS[fn]
+        values = {name: PARAM_DEFAULTS.get(name) for name, _ in query.params}
+        values.update(params or {})
+        # Die Funktionen laufen mit den Rechten des Aufrufers: ohne Login keine Zeilen aus RLS-Tabellen
+        if any(self.hidden(table) for table in _rls_tables() if table in query.sql):
+            return LocalRpc(self, "SELECT 1 WHERE 0", {})
+        return LocalRpc(self, query.sql, values)
+
+    def insert(self, table: str, rows: list) -> list:
+        if self.hidden(table):
+            raise APIError({"message": f'new row violates row-level security policy for table "{table}"', "code": "42501"})
+        known_columns = self.columns(table)
+        for row in rows:
+            for name in row:
+                if name not in known_columns:
+                    raise APIError({"message": f"column {table}.{name} does not exist", "code": "42703"})
+
+        inserted = []
+        with self._lock:
+            # Wie bei PostgREST: entweder alle Zeilen oder keine
+            with self._conn:
+                for row in rows:
+                    names = list(row)
+                    cursor = self._conn.execute(
+                        f"INSERT INTO {_quote(table)} ({', '.join(_quote(n) for n in names)}) VALUES ({', '.join('?' * len(names))})",
+                        [row[n] for n in names],
+                    )
+                    inserted.append(dict(self._conn.execute(f"SELECT * FROM {_quote(table)} WHERE rowid = ?", (cursor.lastrowid,)).fetchone()))
+        return inserted
+
+
+def create_snapshot(path: str, client=None):
+    """Kopiert alle Tabellen aus SCHEMA von Supabase in eine SQLite-Datei."""
+    from app_modules.db import fetch_all_rows, new_supabase_client
+    from app_modules.leaderboard_sql import rebuild_leaderboard
+
+    client = client or new_supabase_client()
+    local = LocalClient(path)
+    for table, columns in SCHEMA.items():
+        primary_key = next(iter(columns))
+        rows = fetch_all_rows(table, ", ".join(columns), order_by=primary_key, client=client)
+        with local._lock, local._conn:
+            local._conn.execute(f"DELETE FROM {_quote(table)}")
+            local._conn.executemany(
+                f"INSERT INTO {_quote(table)} ({', '.join(_quote(c) for c in columns)}) VALUES ({', '.join('?' * len(columns))})",
+                [[row.get(c) for c in columns] for row in rows],
+            )
+        print(f"{table}: {len(rows)} Zeilen")
+    # Die Trigger haben beim Kopieren mitgezählt; neu aufbauen, damit die Zähler genau dem Snapshot entsprechen
+    rebuild_leaderboard(local._conn)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "snapshot":
+        create_snapshot(sys.argv[2] if len(sys.argv) > 2 else os.path.join("data", "felsenapp.sqlite"))
+    else:
+        print("Aufruf: python -m app_modules.local_backend snapshot [pfad.sqlite]")
@@ -0,0 +1,429 @@
+# app_modules/logbook_import.py
+
+"""
+Import alter Begehungen (Tourenbuch) aus einer CSV-Datei.
+
+Die Datei wird zeilenweise gelesen (nie komplett in den Speicher), jede Zeile
+gegen den Katalog aufgelöst (Gebiet/Fels/Route, bei Tippfehlern über eine
+unscharfe Suche), geprüft und in Blöcken von IMPORT_CHUNK_SIZE Zeilen mit je
+einem Insert gespeichert. Nach jedem Block wird die zuletzt verarbeitete Zeile
+als Fortsetzungspunkt gemerkt – ein abgebrochener Import macht dort weiter.
+
+Erwartete Spalten (Kopfzeile, Reihenfolge egal, Trennzeichen ; , oder Tab):
+    datum, fels, route, stil        (Pflicht)
+    gebiet, partnerin, kommentar, bewertung   (optional)
+
+Import von der Kommandozeile:
+    python -m app_modules.logbook_import tourenbuch.csv <user_id> [--pruefen]
+"""
+
+import csv
+import difflib
+import hashlib
+import io
+import json
+import os
+import re
+import sys
+import unicodedata
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, datetime
+
+import pandas as pd
+import streamlit as st
+from supabase import Client
+
+from app_modules.ascent_writer import STIL_OPTIONEN, UNCONFIRMED_ERROR, ascent_row, insert_ascents
+from app_modules.catalog import Catalog, get_catalog
+from app_modules.db import get_client
+
+IMPORT_CHUNK_SIZE = 500
+# Mindest-Ähnlichkeit (difflib) für die unscharfe Namenssuche
+FUZZY_CUTOFF = 0.85
+# Nur so viele Fehlermeldungen werden gesammelt, gezählt werden alle
+MAX_REPORTED_ERRORS = 1000
+
+DATE_FORMATS = ("%Y-%m-%d", "%d.%m.%Y", "%d.%m.%y", "%d/%m/%Y")
+EARLIEST_DATE = date(1900, 1, 1)
+
+# Spaltennamen der Datei -> Feld
+COLUMN_ALIASES = {
+    "datum": "datum", "date": "datum", "tag": "datum",
+    "gebiet": "gebiet", "sektor": "gebiet", "sector": "gebiet",
+    "fels": "fels", "gipfel": "fels", "rock": "fels",
+    "route": "route", "weg": "route",
+    "stil": "stil", "style": "stil",
+    "partnerin": "partnerin", "partner": "partnerin", "partner*in": "partnerin",
+    "kommentar": "kommentar", "comment": "kommentar", "notiz": "kommentar",
+    "bewertung": "bewertung", "schwierigkeit": "bewertung", "rating": "bewertung",
+}
+REQUIRED_COLUMNS = ("datum", "fels", "route", "stil")
+
+STIL_ALIASES = {"vs": "Vorstieg", "ns": "Nachstieg", "rp": "Vorstieg", "toprope": "Nachstieg"}
+
+CHECKPOINT_KEY = "logbook_import_checkpoints"
+
+
+class LogbookImportError(Exception):
+    """Import abgebrochen (ungültige Datei oder Speichern nicht möglich); bisher gespeicherte Blöcke bleiben."""
+
+
+def normalize_name(name) -> str:
+    """Vergleichsform eines Namens: Unicode-normalisiert, klein, ohne doppelte Leerzeichen."""
+    name = unicodedata.normalize("NFKC", str(name or "")).casefold()
+    return re.sub(r"\s+", " ", name).strip(" \"'")
+
+
+def _fuzzy(name: str, candidates) -> str | None:
+    matches = difflib.get_close_matches(name, candidates, n=1, cutoff=FUZZY_CUTOFF)
+    return matches[0] if matches else None
+
+
+class NameResolver:
+    """Löst Gebiets-, Fels- und Routennamen gegen den Katalog auf (mit Zwischenspeicher pro Import)."""
+
+    def __init__(self, catalog: Catalog):
+        self._catalog = catalog
+        self._sectors = {normalize_name(name): sector_id for sector_id, name in catalog.sector_names.items()}
+        # Felsnamen sind nicht eindeutig, daher Name -> Liste von ids (insgesamt und je Sektor)
+        self._rocks = defaultdict(list)
+        self._sector_rocks = defaultdict(lambda: defaultdict(list))
+        for sector_id, rock_ids in catalog.sector_rocks.items():
+            for rock_id in rock_ids:
+                name = normalize_name(catalog.rock_names.get(rock_id))
+                self._rocks[name].append(rock_id)
+                self._sector_rocks[sector_id][name].append(rock_id)
+        self._route_names = {}
+        self._cache = {}
+
+    def sector(self, name: str):
+        key = normalize_name(name)
+        if key in self._sectors:
+            return self._sectors[key], None
+        match = _fuzzy(key, self._sectors)
+        if match is None:
+            return None, f"Gebiet '{name}' nicht gefunden"
+        return self._sectors[match], None
+
+    def rock(self, name: str, sector_id=None):
+        cache_key = ("rock", normalize_name(name), sector_id)
+        if cache_key not in self._cache:
+            by_name = self._sector_rocks[sector_id] if sector_id is not None else self._rocks
+            key = cache_key[1]
+            if key not in by_name:
+                key = _fuzzy(key, by_name)
+            if key is None:
+                result = (None, f"Fels '{name}' nicht gefunden")
+            elif len(by_name[key]) > 1:
+                result = (None, f"Fels '{name}' ist mehrdeutig – bitte Gebiet angeben")
+            else:
+                result = (by_name[key][0], None)
+            self._cache[cache_key] = result
+        return self._cache[cache_key]
+
+    def _routes_of(self, rock_id: int) -> dict:
+        """Normalisierter Routenname -> Routen-ids eines Felsens (einmal pro Fels aufgebaut)."""
+        if rock_id not in self._route_names:
+            routes = defaultdict(list)
+            for route_id in self._catalog.rock_routes.get(rock_id, ()):
+                routes[normalize_name(self._catalog.route_names.get(route_id))].append(route_id)
+            self._route_names[rock_id] = routes
+        return self._route_names[rock_id]
+
+    def route(self, name: str, rock_id: int):
+        cache_key = ("route", normalize_name(name), rock_id)
+        if cache_key not in self._cache:
+            routes = self._routes_of(rock_id)
+            key = cache_key[1]
+            if key not in routes:
+                key = _fuzzy(key, routes)
+            if key is None:
+                result = (None, f"Route '{name}' am Fels '{self._catalog.rock_names.get(rock_id)}' nicht gefunden")
+            else:
+                # Gleichnamige Routen an einem Fels: die erste im Katalog
+                result = (routes[key][0], None)
+            self._cache[cache_key] = result
+        return self._cache[cache_key]
+
+
+def parse_date(value) -> date | None:
+    value = str(value or "").strip()
+    for fmt in DATE_FORMATS:
+        try:
+            parsed = datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+        if EARLIEST_DATE <= parsed <= date.today():
+            return parsed
+        return None
+    return None
+
+
+def parse_stil(value) -> str | None:
+    key = normalize_name(value)
+    for stil in STIL_OPTIONEN:
+        if key == stil.casefold():
+            return stil
+    return STIL_ALIASES.get(key)
+
+
+def parse_bewertung(value):
+    """Leer -> None, sonst 1..3 (auch "2: ok"); ungültig -> ValueError."""
+    value = str(value or "").strip()
+    if not value:
+        return None
+    match = re.match(r"\d+", value)
+    if not match or not 1 <= int(match.group()) <= 3:
+        raise ValueError(f"Bewertung '{value}' ungültig (1–3)")
+    return int(match.group())
+
+
+def validate_row(record: dict, resolver: NameResolver, user_id: str):
+    """Eine gelesene Zeile -> (Zeile für ascents, None) oder (None, Fehlermeldung)."""
+    datum = parse_date(record.get("datum"))
+    if datum is None:
+        return None, f"Datum '{record.get('datum')}' ungültig"
+    stil = parse_stil(record.get("stil"))
+    if stil is None:
+        return None, f"Stil '{record.get('stil')}' unbekannt (erlaubt: {', '.join(STIL_OPTIONEN)})"
+    try:
+        bewertung = parse_bewertung(record.get("bewertung"))
+    except ValueError as e:
+        return None, str(e)
+
+    sector_id = None
+    if str(record.get("gebiet") or "").strip():
+        sector_id, error = resolver.sector(record["gebiet"])
+        if error:
+            return None, error
+    rock_id, error = resolver.rock(record.get("fels"), sector_id)
+    if error:
+        return None, error
+    route_id, error = resolver.route(record.get("route"), rock_id)
+    if error:
+        return None, error
+
+    return ascent_row(user_id, datum, route_id, rock_id,
+                      str(record.get("partnerin") or "").strip(), stil,
+                      str(record.get("kommentar") or "").strip(), bewertung), None
+
+
+def _read_header(stream):
+    """Liest die Kopfzeile, erkennt das Trennzeichen und ordnet die Spalten den Feldern zu."""
+    header_line = stream.readline()
+    if not header_line.strip():
+        raise LogbookImportError("Die Datei ist leer.")
+    delimiter = max(";,\t", key=header_line.count)
+    header = next(csv.reader([header_line], delimiter=delimiter))
+    fields = [COLUMN_ALIASES.get(normalize_name(column)) for column in header]
+    missing = [column for column in REQUIRED_COLUMNS if column not in fields]
+    if missing:
+        raise LogbookImportError(f"Pflichtspalten fehlen: {', '.join(missing)}")
+    return delimiter, fields
+
+
+def read_logbook(stream, resolver: NameResolver, user_id: str, skip_until: int = 0):
+    """
+    Liest die CSV zeilenweise und liefert (Zeilennummer, Zeile oder None, Fehler oder None).
+    Zeilen bis einschließlich skip_until (Zeilennummer der Datei) werden übersprungen, ohne sie aufzulösen.
+    """
+    delimiter, fields = _read_header(stream)
+    reader = csv.reader(stream, delimiter=delimiter)
+    for values in reader:
+        # +1 für die bereits gelesene Kopfzeile
+        line_no = reader.line_num + 1
+        if line_no <= skip_until or not any(value.strip() for value in values):
+            continue
+        record = {name: value for name, value in zip(fields, values) if name}
+        row, error = validate_row(record, resolver, user_id)
+        yield line_no, row, error
+
+
+@dataclass
+class ImportReport:
+    """Zwischenstand bzw. Ergebnis eines Imports; last_line ist der Fortsetzungspunkt."""
+    rows_read: int = 0
+    imported: int = 0
+    invalid: int = 0
+    failed: int = 0
+    last_line: int = 0
+    errors: list = field(default_factory=list)
+
+    def add_error(self, line_no: int, message: str):
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line_no, message))
+
+
+def import_logbook(client: Client, stream, user_id: str, catalog: Catalog | None = None, resume_after: int = 0,
+                   chunk_size: int = IMPORT_CHUNK_SIZE, dry_run: bool = False, on_progress=None) -> ImportReport:
+    """
+    Importiert eine CSV (Textstream) für user_id. Gültige Zeilen werden in Blöcken gespeichert,
+    ungültige gezählt und mit Zeilennummer gemeldet. on_progress(report) wird nach jedem Block aufgerufen.
+    Scheitert ein ganzer Block oder ist die Datei nicht lesbar, wird mit LogbookImportError
+    abgebrochen; report.last_line (am Fehlerobjekt als .report) zeigt dann auf die letzte
+    bestätigte Zeile.
+    dry_run prüft nur und speichert nichts.
+    """
+    resolver = NameResolver(catalog or get_catalog(client))
+    report = ImportReport(last_line=resume_after)
+    chunk = []
+
+    def flush(last_line: int):
+        if chunk and not dry_run:
+            results = insert_ascents(client, [row for _, row in chunk])
+            confirmed = [line_no for (line_no, _), result in zip(chunk, results)
+                         if result["ok"] or result["error"] == UNCONFIRMED_ERROR]
+            # Ganzer Block abgelehnt: abbrechen, damit ab diesem Block fortgesetzt werden kann.
+            # Unbestätigte Blöcke (womöglich gespeichert) zählen als Fehler und werden nicht wiederholt.
+            if len(chunk) > 1 and not confirmed:
+                error = LogbookImportError(f"Block ab Zeile {chunk[0][0]} konnte nicht gespeichert werden: {results[0]['error']}")
+                error.report = report
+                raise error
+            for (line_no, _), result in zip(chunk, results):
+                if result["ok"]:
+                    report.imported += 1
+                else:
+                    report.failed += 1
+                    report.add_error(line_no, result["error"])
+            # Fortsetzungspunkt nur bis zur letzten bestätigten Zeile – abgelehnte Zeilen
+            # danach werden bei einer Fortsetzung erneut versucht
+            report.last_line = max(confirmed, default=report.last_line)
+        elif dry_run:
+            report.imported += len(chunk)
+            report.last_line = last_line
+        chunk.clear()
+        if on_progress:
+            on_progress(report)
+
+    line_no = resume_after
+    try:
+        for line_no, row, error in read_logbook(stream, resolver, user_id, skip_until=resume_after):
+            report.rows_read += 1
+            if error:
+                report.invalid += 1
+                report.add_error(line_no, error)
+                continue
+            chunk.append((line_no, row))
+            if len(chunk) >= chunk_size:
+                flush(line_no)
+    except UnicodeDecodeError as e:
+        # Die Kodierung wird nur am Dateianfang erkannt – bis hierhin gelesene Zeilen noch speichern
+        flush(line_no)
+        error = LogbookImportError(f"Nach Zeile {line_no} enthält die Datei Zeichen, die nicht als {e.encoding} "
+                                   "lesbar sind. Bitte als UTF-8 speichern und erneut hochladen.")
+        error.report = report
+        raise error from e
+    flush(line_no)
+    return report
+
+
+def file_fingerprint(binary) -> str:
+    """SHA-256 der Datei (blockweise gelesen), Schlüssel für den Fortsetzungspunkt."""
+    digest = hashlib.sha256()
+    binary.seek(0)
+    for block in iter(lambda: binary.read(1 << 20), b""):
+        digest.update(block)
+    binary.seek(0)
+    return digest.hexdigest()
+
+
+def detect_encoding(binary) -> str:
+    """UTF-8 (mit/ohne BOM) oder – typisch für Excel-Exporte – Windows-1252."""
+    sample = binary.read(1 << 16)
+    binary.seek(0)
+    try:
+        sample.decode("utf-8")
+    except UnicodeDecodeError as e:
+        # Am Ende der Probe kann ein Zeichen abgeschnitten sein
+        if e.start < len(sample) - 3:
+            return "cp1252"
+    return "utf-8-sig"
+
+
+def open_text(binary) -> io.TextIOWrapper:
+    return io.TextIOWrapper(binary, encoding=detect_encoding(binary), newline="")
+
+
+def show_logbook_import(supabase: Client, catalog: Catalog):
+    """Upload und Import einer Tourenbuch-CSV in Streamlit."""
+    st.markdown(
+        "CSV mit Kopfzeile: **datum, fels, route, stil** (Pflicht) sowie optional "
+        "**gebiet, partnerin, kommentar, bewertung** (1–3). Trennzeichen `;`, `,` oder Tab."
+    )
+    uploaded = st.file_uploader("Tourenbuch (CSV)", type=["csv", "txt"], key="logbook_upload")
+    if uploaded is None:
+        return
+
+    checkpoints = st.session_state.setdefault(CHECKPOINT_KEY, {})
+    fingerprint = file_fingerprint(uploaded)
+    resume_after = checkpoints.get(fingerprint, 0)
+    if resume_after:
+        st.info(f"Diese Datei wurde bereits bis Zeile {resume_after} importiert – der Import wird dort fortgesetzt.")
+        if st.checkbox("Von vorne beginnen (bereits importierte Zeilen werden doppelt gespeichert)"):
+            resume_after = 0
+
+    dry_run = st.checkbox("Nur prüfen, nichts speichern", value=False)
+    if not st.button("Prüfen" if dry_run else "Import starten", type="primary"):
+        return
+
+    progress = st.progress(0.0, text="Import läuft …")
+
+    def on_progress(report: ImportReport):
+        done = uploaded.tell() / uploaded.size if uploaded.size else 1.0
+        progress.progress(min(done, 1.0), text=f"Zeile {report.last_line}: {report.imported} übernommen, "
+                                               f"{report.invalid + report.failed} Fehler")
+        if not dry_run:
+            checkpoints[fingerprint] = report.last_line
+
+    stream = open_text(uploaded)
+    try:
+        report = import_logbook(supabase, stream, st.session_state.user_id, catalog=catalog,
+                                resume_after=resume_after, dry_run=dry_run, on_progress=on_progress)
+    except LogbookImportError as e:
+        st.error(f"❌ {e}")
+        report = getattr(e, "report", None)
+        if report is None:
+            return
+    finally:
+        stream.detach()
+
+    progress.progress(1.0, text="Fertig")
+    verb = "gültig" if dry_run else "gespeichert"
+    st.success(f"✅ {report.imported} von {report.rows_read} Begehung(en) {verb}.")
+    if report.invalid or report.failed:
+        st.warning(f"{report.invalid} ungültige Zeile(n), {report.failed} beim Speichern abgelehnt.")
+        st.dataframe(pd.DataFrame(report.errors, columns=["Zeile", "Fehler"]), hide_index=True)
+
+
+def _import_file(path: str, user_id: str, dry_run: bool):
+    checkpoint_path = path + ".import.json"
+    with open(path, "rb") as binary:
+        fingerprint = file_fingerprint(binary)
+        resume_after = 0
+        if os.path.exists(checkpoint_path):
+            with open(checkpoint_path, encoding="utf-8") as f:
+                checkpoint = json.load(f)
+            if checkpoint.get("sha256") == fingerprint and checkpoint.get("user_id") == user_id:
+                resume_after = checkpoint.get("last_line", 0)
+                print(f"Fortsetzung nach Zeile {resume_after}")
+
+        def on_progress(report: ImportReport):
+            print(f"Zeile {report.last_line}: {report.imported} übernommen, {report.invalid + report.failed} Fehler")
+            if not dry_run:
+                with open(checkpoint_path, "w", encoding="utf-8") as f:
+                    json.dump({"sha256": fingerprint, "user_id": user_id, "last_line": report.last_line}, f)
+
+        report = import_logbook(get_client(), open_text(binary), user_id, resume_after=resume_after,
+                                dry_run=dry_run, on_progress=on_progress)
+    for line_no, message in report.errors:
+        print(f"  Zeile {line_no}: {message}")
+    print(f"Fertig: {report.imported} von {report.rows_read} übernommen, {report.invalid} ungültig, {report.failed} abgelehnt")
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    if len(args) == 2:
+        _import_file(args[0], args[1], dry_run="--pruefen" in sys.argv)
+    else:
+        print("Aufruf: python -m app_modules.logbook_import tourenbuch.csv <user_id> [--pruefen]")
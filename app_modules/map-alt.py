@@ -2,27 +2,15 @@ import streamlit as st
 import pandas as pd
 import folium
 from streamlit_folium import st_folium
-from supabase import create_client, Client
-import os
-from dotenv import load_dotenv
 import math
 
-# Lade Umgebungsvariablen
-load_dotenv()
+from app_modules.db import fetch_all_rows, has_credentials
+from app_modules.invalidation import depends_on
 
-url = os.getenv("SUPABASE_URL")
-key = os.getenv("SUPABASE_KEY")
-
-if not url or not key:
+if not has_credentials():
     st.error("Fehler: SUPABASE_URL oder SUPABASE_KEY wurden nicht gefunden. Stellen Sie sicher, dass Ihre .env-Datei korrekt ist.")
     st.stop()
 
-try:
-    supabase: Client = create_client(url, key)
-except Exception as e:
-    st.error(f"Fehler beim Erstellen des Supabase-Clients: {e}")
-    st.stop()
-
 def make_triangle(lat, lon, size=0.001):
     if pd.isna(lat) or pd.isna(lon) or pd.isna(size) or size <= 0:
         return None
@@ -35,13 +23,14 @@ def make_triangle(lat, lon, size=0.001):
     except TypeError:
         return None
 
+@depends_on("rocks", "routes", "ascents")
 @st.cache_data
 def fetch_data():
     try:
-        sectors = pd.DataFrame(supabase.table("sector").select("id, name").execute().data)
+        sectors = pd.DataFrame(fetch_all_rows("sector", "id, name"))
         sectors['id'] = sectors['id'].astype(int)
 
-        rocks = pd.DataFrame(supabase.table("rocks").select("id, name, sector_id, latitude, longitude").range(0, 5000).execute().data)
+        rocks = pd.DataFrame(fetch_all_rows("rocks", "id, name, sector_id, latitude, longitude"))
         rocks['id'] = rocks['id'].astype(int)
         rocks['sector_id'] = rocks['sector_id'].astype(int)
 
@@ -50,27 +39,16 @@ def fetch_data():
         rocks.drop(columns=["id_sector"], errors='ignore', inplace=True)
 
         # Alle rock_ids aus routes laden (mehr als 1000)
-        def fetch_all_routes_column():
-            full_data = []
-            step = 1000
-            for start in range(0, 25000, step):
-                end = start + step - 1
-                chunk = supabase.table("routes").select("rock_id, grade").range(start, end).execute().data
-                if not chunk:
-                    break
-                full_data.extend(chunk)
-            return pd.DataFrame(full_data)
-
-        routes_for_count = fetch_all_routes_column()
+        routes_for_count = pd.DataFrame(fetch_all_rows("routes", "id, rock_id, grade"))
         routes_for_count['rock_id'] = routes_for_count['rock_id'].astype(int)
         routes_for_count['grade'] = pd.to_numeric(routes_for_count['grade'], errors='coerce')
 
-        routes = pd.DataFrame(supabase.table("routes").select("id, rock_id, stern").range(0, 5000).execute().data)
+        routes = pd.DataFrame(fetch_all_rows("routes", "id, rock_id, stern"))
         routes['id'] = routes['id'].astype(int)
         routes['rock_id'] = routes['rock_id'].astype(int)
         routes['stern'] = routes.get('stern', False).astype(bool)
 
-        ascents = pd.DataFrame(supabase.table("ascents").select("id, gipfel_id, route_id, bewertung, kommentar").execute().data)
+        ascents = pd.DataFrame(fetch_all_rows("ascents", "id, gipfel_id, route_id, bewertung, kommentar"))
         ascents.rename(columns={"id": "ascent_id"}, inplace=True)
         ascents['gipfel_id'] = ascents['gipfel_id'].astype(int)
         ascents['route_id'] = pd.to_numeric(ascents['route_id'], errors='coerce').fillna(0).astype(int)
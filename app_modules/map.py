@@ -1,17 +1,9 @@
 import streamlit as st
 import pandas as pd
-from supabase import create_client, Client
-import os
-from dotenv import load_dotenv
 
-# .env laden – robust für Seiten im "app_modules/"-Ordner
-dotenv_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), ".env")
-load_dotenv(dotenv_path)
-
-# Supabase-Verbindung initialisieren
-SUPABASE_URL = os.environ.get("SUPABASE_URL")
-SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+from app_modules.catalog import get_catalog
+from app_modules.db import fetch_all_rows, get_user_client
+from app_modules.invalidation import data_version
 
 # --- FARBKONZEPT KONSTANTEN (Dupliziert aus app_modules/auswertung.py zur Konsistenz) ---
 # Idealerweise wären diese in einer zentralen Konfigurationsdatei.
@@ -22,35 +14,30 @@ PLOT_TEXT_COLOR = "#1D1D1D"       # Dunkelgrau
 PLOT_OUTLINE_COLOR = "#1D1D1D"    # Dunkelgrau
 
 # --- Datenabruf für die Karte ---
-@st.cache_data
 def fetch_rock_locations():
     """
-    Holt Felsdaten mit Koordinaten.
+    Holt Felsdaten mit Koordinaten aus dem gemeinsamen Katalog.
     """
     try:
-        # Sicherstellen, dass latitude und longitude existieren
-        rocks_data = supabase.table("rocks").select("id, name, latitude, longitude").range(0, 5000).execute().data
-        rocks_df = pd.DataFrame(rocks_data)
-        # Wichtig: Konvertiere zu float und dropna für die Karte
-        rocks_df['latitude'] = pd.to_numeric(rocks_df['latitude'], errors='coerce')
-        rocks_df['longitude'] = pd.to_numeric(rocks_df['longitude'], errors='coerce')
+        rocks_df = get_catalog().rocks[['id', 'name', 'latitude', 'longitude']]
+        # Koordinaten sind im Katalog bereits numerisch, fehlende für die Karte entfernen
         rocks_df = rocks_df.dropna(subset=['latitude', 'longitude'])
         
         # Streamlit erwartet die Spalten als 'lat' und 'lon' für st.map
-        rocks_df.rename(columns={'latitude': 'lat', 'longitude': 'lon'}, inplace=True)
-        return rocks_df
+        return rocks_df.rename(columns={'latitude': 'lat', 'longitude': 'lon'})
     except Exception as e:
         st.error(f"Fehler beim Laden der Felskoordinaten: {e}")
         return pd.DataFrame() # Leeres DataFrame zurückgeben bei Fehler
 
-@st.cache_data
-def fetch_user_ascents_gipfel_ids(user_id):
+@st.cache_data(max_entries=100)
+def fetch_user_ascents_gipfel_ids(user_id, version=0):
     """
     Holt die gipfel_ids der vom Benutzer begangenen Gipfel.
+    version (data_version des Benutzers) sorgt dafür, dass nur dessen Eintrag nach neuen Begehungen veraltet.
     """
     if user_id:
         try:
-            ascents_data = supabase.table("ascents").select("gipfel_id").eq("user_id", user_id).execute().data
+            ascents_data = fetch_all_rows("ascents", "id, gipfel_id", filters=[("eq", "user_id", user_id)], client=get_user_client())
             if ascents_data:
                 # Extrahiere nur die gipfel_ids und mache sie einzigartig
                 return set([a['gipfel_id'] for a in ascents_data if a['gipfel_id'] is not None])
@@ -76,7 +63,7 @@ def main_app_map(user_id=None): # user_id wird nun als Argument übergeben
 
         num_climbed_rocks = 0
         if user_id:
-            climbed_gipfel_ids = fetch_user_ascents_gipfel_ids(user_id)
+            climbed_gipfel_ids = fetch_user_ascents_gipfel_ids(user_id, data_version(f"ascents:{user_id}"))
             if climbed_gipfel_ids:
                 rocks_df['is_climbed'] = rocks_df['id'].isin(climbed_gipfel_ids)
                 # Aktualisiere Farbe und Größe für begangene Gipfel
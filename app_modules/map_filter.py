@@ -0,0 +1,91 @@
+# app_modules/map_filter.py
+
+"""
+Filter der Gipfelkarte direkt im Browser.
+
+Die Karte wird einmal mit allen Felsen gezeichnet, jedes Dreieck trägt seine
+Filter-Attribute (gebiet, grades, star, done) in den Feature-Properties.
+Bei einer Änderung in der Sidebar schickt der Server nur noch den Filterzustand
+als kleines feature_group_to_add an st_folium – das Leaflet-Skript der Karte
+bleibt gleich, die Karte wird also nicht neu aufgebaut.
+"""
+
+import json
+
+import folium
+from branca.element import MacroElement
+from jinja2 import Template
+
+
+class BrowserFilter(MacroElement):
+    """
+    Hängt an eine GeoJSON-Ebene eine JS-Funktion window.felsenappApplyFilter(state),
+    die Dreiecke je nach Filterzustand aus der Ebene entfernt bzw. wieder hinzufügt.
+    """
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        (function() {
+            var layer = {{ this.layer.get_name() }};
+            var features = [];
+            layer.eachLayer(function(l) { features.push(l); });
+
+            function matches(p, state) {
+                if (state.gebiet !== null && p.gebiet !== state.gebiet) return false;
+                if (state.done !== null && p.done !== state.done) return false;
+                if (state.star && !p.star) return false;
+                if (state.grade !== null) {
+                    var lo = state.grade[0], hi = state.grade[1];
+                    if (!p.grades.some(function(g) { return g >= lo && g <= hi; })) return false;
+                }
+                return true;
+            }
+
+            window.felsenappApplyFilter = function(state) {
+                features.forEach(function(l) {
+                    var visible = matches(l.feature.properties, state);
+                    if (visible && !layer.hasLayer(l)) layer.addLayer(l);
+                    if (!visible && layer.hasLayer(l)) layer.removeLayer(l);
+                });
+            };
+            if (window.felsenappFilterState) window.felsenappApplyFilter(window.felsenappFilterState);
+        })();
+        {% endmacro %}
+    """)
+
+    def __init__(self, layer: folium.GeoJson):
+        super().__init__()
+        self._name = "BrowserFilter"
+        self.layer = layer
+
+
+class FilterState(MacroElement):
+    """Setzt den Filterzustand im Browser und wendet ihn auf die Karte an."""
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        window.felsenappFilterState = {{ this.state_json }};
+        if (window.felsenappApplyFilter) window.felsenappApplyFilter(window.felsenappFilterState);
+        {% endmacro %}
+    """)
+
+    def __init__(self, state: dict):
+        super().__init__()
+        self._name = "FilterState"
+        self.state_json = json.dumps(state)
+
+
+def filter_state_layer(gebiet=None, grade=None, done=None, star=False) -> folium.FeatureGroup:
+    """
+    Leere FeatureGroup mit dem Filterzustand für st_folium(feature_group_to_add=...).
+    gebiet: Name oder None, grade: (von, bis) oder None, done: True/False/None, star: nur Felsen mit Stern.
+    """
+    state = {
+        "gebiet": gebiet,
+        "grade": list(grade) if grade is not None else None,
+        "done": done,
+        "star": bool(star),
+    }
+    feature_group = folium.FeatureGroup(name="Filter", control=False)
+    feature_group.add_child(FilterState(state))
+    return feature_group
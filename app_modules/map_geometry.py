@@ -0,0 +1,146 @@
+# app_modules/map_geometry.py
+
+import folium
+import numpy as np
+import pandas as pd
+
+SQRT3_HALF = np.sqrt(3) / 2
+
+
+def triangle_rings(lat, lon, size):
+    """
+    Berechnet die Dreiecke (Spitze nach oben) für alle Felsen auf einmal.
+    Gibt ein Array der Form (n, 4, 2) mit geschlossenen GeoJSON-Ringen [lon, lat]
+    und eine Maske der gültigen Zeilen zurück (Koordinaten vorhanden, Größe > 0).
+    """
+    lat = np.asarray(pd.to_numeric(pd.Series(lat), errors='coerce'), dtype=float)
+    lon = np.asarray(pd.to_numeric(pd.Series(lon), errors='coerce'), dtype=float)
+    size = np.broadcast_to(np.asarray(pd.to_numeric(pd.Series(size), errors='coerce'), dtype=float), lat.shape)
+
+    rings = np.empty((len(lat), 4, 2))
+    rings[:, 0, 0] = lon
+    rings[:, 0, 1] = lat + size
+    rings[:, 1, 0] = lon - size * SQRT3_HALF
+    rings[:, 1, 1] = lat - size / 2
+    rings[:, 2, 0] = lon + size * SQRT3_HALF
+    rings[:, 2, 1] = lat - size / 2
+    rings[:, 3] = rings[:, 0]
+
+    valid = np.isfinite(lat) & np.isfinite(lon) & np.isfinite(size) & (size > 0)
+    return rings, valid
+
+
+def triangle_feature_collection(rocks: pd.DataFrame, size, fill_color, tooltip, properties=()) -> dict:
+    """
+    Baut eine GeoJSON-FeatureCollection mit einem Dreieck pro Fels.
+    size, fill_color und tooltip sind Spalten/Arrays in der Länge von rocks,
+    properties sind zusätzliche Spalten aus rocks, die in jedes Feature übernommen werden.
+    """
+    rings, valid = triangle_rings(rocks["latitude"], rocks["longitude"], size)
+    ids = rocks["id"].to_numpy()[valid].tolist()
+    coordinates = rings[valid].tolist()
+    fill_colors = np.broadcast_to(np.asarray(fill_color, dtype=object), valid.shape)[valid].tolist()
+    tooltips = np.asarray(tooltip, dtype=object)[valid].tolist()
+    extra = {column: rocks[column].to_numpy()[valid].tolist() for column in properties}
+
+    features = []
+    for i, rock_id in enumerate(ids):
+        feature_properties = {"fill_color": fill_colors[i], "tooltip": tooltips[i]}
+        for column, values in extra.items():
+            feature_properties[column] = values[i]
+        features.append({
+            "type": "Feature",
+            "id": rock_id,
+            "geometry": {"type": "Polygon", "coordinates": [coordinates[i]]},
+            "properties": feature_properties,
+        })
+    return {"type": "FeatureCollection", "features": features}
+
+
+def triangle_layer(feature_collection: dict, fill_opacity=0.89, stroke_color=None, popup_field=None, name=None) -> folium.GeoJson:
+    """
+    Eine einzige GeoJSON-Ebene für alle Dreiecke.
+    Farbe und Tooltip kommen aus den Feature-Properties 'fill_color' und 'tooltip'.
+    """
+    def style_function(feature):
+        style = {"fillColor": feature["properties"]["fill_color"], "fillOpacity": fill_opacity}
+        if stroke_color:
+            style.update({"color": stroke_color, "weight": 3})
+        else:
+            style["stroke"] = False
+        return style
+
+    has_features = bool(feature_collection["features"])
+    return folium.GeoJson(
+        feature_collection,
+        name=name,
+        style_function=style_function,
+        tooltip=folium.GeoJsonTooltip(fields=["tooltip"], labels=False, sticky=True) if has_features else None,
+        popup=folium.GeoJsonPopup(fields=[popup_field], labels=False) if popup_field and has_features else None,
+    )
+
+
+def grid_clusters(lat, lon, done, cell_lat: float, cell_lon: float) -> pd.DataFrame:
+    """
+    Fasst Felsen in einem festen Gitter (Zellgröße in Grad, am Nullpunkt verankert,
+    damit Cluster beim Verschieben stabil bleiben) zusammen.
+    Eine Zeile pro belegter Zelle: latitude/longitude (Mittelpunkt der Felsen), anzahl, begangen.
+    """
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    done = np.asarray(done, dtype=bool)
+    if len(lat) == 0:
+        return pd.DataFrame({"latitude": [], "longitude": [], "anzahl": np.array([], dtype=int), "begangen": np.array([], dtype=int)})
+
+    cells = np.stack([np.floor(lat / cell_lat), np.floor(lon / cell_lon)], axis=1).astype(np.int64)
+    _, cluster, anzahl = np.unique(cells, axis=0, return_inverse=True, return_counts=True)
+    cluster = cluster.ravel()
+    return pd.DataFrame({
+        "latitude": np.bincount(cluster, weights=lat) / anzahl,
+        "longitude": np.bincount(cluster, weights=lon) / anzahl,
+        "anzahl": anzahl,
+        "begangen": np.bincount(cluster, weights=done, minlength=len(anzahl)).astype(int),
+    })
+
+
+def cluster_layer(clusters: pd.DataFrame, fill_color, tooltip, radius, label_color="#FFFFFF") -> folium.FeatureGroup:
+    """
+    Cluster als Kreise (eine GeoJSON-Ebene) mit der Anzahl als Beschriftung.
+    fill_color, tooltip und radius (Pixel) sind Arrays in der Länge von clusters.
+    """
+    fill_colors = np.asarray(fill_color, dtype=object).tolist()
+    tooltips = np.asarray(tooltip, dtype=object).tolist()
+    radii = np.asarray(radius, dtype=float).round(1).tolist()
+    points = clusters[["longitude", "latitude"]].to_numpy().tolist()
+    counts = clusters["anzahl"].astype(int).tolist()
+
+    features = [{
+        "type": "Feature",
+        "geometry": {"type": "Point", "coordinates": points[i]},
+        "properties": {"fill_color": fill_colors[i], "tooltip": tooltips[i], "radius": radii[i]},
+    } for i in range(len(points))]
+
+    group = folium.FeatureGroup(name="Cluster", control=False)
+    if not features:
+        return group
+    folium.GeoJson(
+        {"type": "FeatureCollection", "features": features},
+        marker=folium.CircleMarker(),
+        style_function=lambda feature: {
+            "fillColor": feature["properties"]["fill_color"],
+            "fillOpacity": 0.85,
+            "color": "#111111",
+            "weight": 2,
+            "radius": feature["properties"]["radius"],
+        },
+        tooltip=folium.GeoJsonTooltip(fields=["tooltip"], labels=False, sticky=True),
+    ).add_to(group)
+    for (lon, lat), count in zip(points, counts):
+        folium.Marker(
+            location=[lat, lon],
+            icon=folium.DivIcon(
+                icon_size=(40, 20), icon_anchor=(20, 10),
+                html=f'<div style="text-align:center; font: 700 13px \'Noto Sans\', sans-serif; color:{label_color}; pointer-events:none">{count}</div>',
+            ),
+        ).add_to(group)
+    return group
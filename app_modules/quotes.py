@@ -0,0 +1,145 @@
+# app_modules/quotes.py
+
+import random
+import threading
+import time
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from supabase import Client
+
+from app_modules.catalog import get_catalog
+from app_modules.db import fetch_all_rows, get_user_client
+from app_modules.invalidation import AscentsAdded, subscribe
+
+# Wie oft der Index höchstens auf neue Kommentare geprüft wird
+QUOTE_INDEX_SYNC_SECONDS = 60
+# Versuche, falls ein gezogener Eintrag doch keinen gültigen Kommentar/kein Datum hat
+MAX_DRAWS = 5
+
+
+@dataclass
+class _CommentIndex:
+    ids: np.ndarray
+    max_id: int
+    synced_at: float
+    lock: threading.Lock
+
+
+_lock = threading.Lock()
+_indexes: dict[str, _CommentIndex] = {}
+
+
+def _get_index(user_id: str) -> _CommentIndex:
+    with _lock:
+        index = _indexes.get(user_id)
+        if index is None:
+            index = _CommentIndex(ids=np.empty(0, dtype=np.int64), max_id=0, synced_at=0.0, lock=threading.Lock())
+            _indexes[user_id] = index
+        return index
+
+
+def _sync_index(index: _CommentIndex, user_id: str, client: Client, force: bool = False):
+    """Lädt nur die ids neuer Begehungen mit Kommentar (id > max_id) und hängt sie an."""
+    with index.lock:
+        if not force and time.time() - index.synced_at < QUOTE_INDEX_SYNC_SECONDS:
+            return
+        filters = [("eq", "user_id", user_id), ("neq", "kommentar", "")]
+        if index.max_id:
+            filters.append(("gt", "id", index.max_id))
+        rows = fetch_all_rows("ascents", "id", filters=filters, client=client)
+        if rows:
+            new_ids = np.fromiter((row["id"] for row in rows), dtype=np.int64, count=len(rows))
+            # union1d, da per add_comment_ids bereits übernommene ids erneut kommen können
+            index.ids = np.union1d(index.ids, new_ids)
+            index.max_id = max(index.max_id, int(new_ids.max()))
+        index.synced_at = time.time()
+
+
+def _discard(index: _CommentIndex, ascent_id: int):
+    with index.lock:
+        index.ids = index.ids[index.ids != ascent_id]
+
+
+def add_comment_ids(user_id: str, rows: list):
+    """
+    Write-through nach einem Insert: neue Begehungen mit Kommentar sofort in den Index
+    übernehmen (max_id bleibt, siehe ascents_store.apply_inserted_ascents).
+    Ohne bestehenden Index passiert nichts, er wird beim ersten Zugriff ohnehin komplett geladen.
+    """
+    with _lock:
+        index = _indexes.get(user_id)
+    if index is None:
+        return
+    new_ids = [int(row["id"]) for row in rows if str(row.get("kommentar") or "").strip()]
+    if new_ids:
+        with index.lock:
+            index.ids = np.union1d(index.ids, np.asarray(new_ids, dtype=np.int64))
+
+
+def comment_ids(user_id: str, client: Client | None = None) -> np.ndarray:
+    """ids aller Begehungen des Benutzers mit Kommentar (kompakter, inkrementell gepflegter Index)."""
+    index = _get_index(user_id)
+    _sync_index(index, user_id, client or get_user_client())
+    return index.ids
+
+
+def resolve_quote(ascent_id: int, client: Client | None = None) -> dict | None:
+    """Lädt genau eine Begehung und ergänzt den Gipfelnamen aus dem Katalog."""
+    rows = (client or get_user_client()).table("ascents").select("id, gipfel_id, datum, kommentar").eq("id", int(ascent_id)).execute().data
+    if not rows:
+        return None
+    row = rows[0]
+    kommentar = str(row.get("kommentar") or "").strip()
+    datum = pd.to_datetime(row.get("datum"), errors="coerce")
+    if not kommentar or kommentar == "None" or pd.isna(datum):
+        return None
+
+    gipfel_id = row.get("gipfel_id")
+    rock_name = get_catalog(client).rock_names.get(int(gipfel_id)) if gipfel_id is not None else None
+    return {"rock_name": rock_name, "datum": datum, "kommentar": kommentar, "gipfel_id": gipfel_id}
+
+
+def random_quote(user_id: str, client: Client | None = None) -> dict | None:
+    """
+    Ein zufälliges Zitat (gleichverteilt über alle Begehungen mit Kommentar).
+    Kostet unabhängig von der Länge der Historie eine Abfrage für genau eine Zeile.
+    Gibt None zurück, wenn der Benutzer keine Kommentare hat.
+    """
+    if not user_id:
+        return None
+    client = client or get_user_client()
+    index = _get_index(user_id)
+    _sync_index(index, user_id, client)
+
+    for _ in range(MAX_DRAWS):
+        ids = index.ids
+        if len(ids) == 0:
+            return None
+        ascent_id = int(ids[random.randrange(len(ids))])
+        quote = resolve_quote(ascent_id, client)
+        if quote is not None:
+            return quote
+        # Leerer/ungültiger Kommentar oder gelöschte Begehung: nicht erneut ziehen
+        _discard(index, ascent_id)
+    return None
+
+
+def invalidate_quotes(user_id: str | None = None):
+    """Verwirft den Kommentar-Index (eines oder aller Benutzer)."""
+    with _lock:
+        if user_id is None:
+            _indexes.clear()
+        else:
+            _indexes.pop(user_id, None)
+
+
+def _on_ascents_event(event):
+    if isinstance(event, AscentsAdded):
+        add_comment_ids(event.user_id, list(event.rows))
+    else:
+        invalidate_quotes(event.user_id)
+
+
+subscribe("ascents", _on_ascents_event)
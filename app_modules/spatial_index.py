@@ -0,0 +1,160 @@
+# app_modules/spatial_index.py
+
+"""
+Räumlicher Index über die Felskoordinaten.
+
+Die Felsen werden in ein regelmäßiges Gitter (Zellen von etwa CELL_KM km)
+einsortiert und nach Zellnummer (Zeile * Spaltenanzahl + Spalte) sortiert
+gespeichert. Eine Gitterzeile eines Suchrechtecks ist damit ein einziger
+zusammenhängender Abschnitt, den eine Binärsuche findet; nur diese Kandidaten
+werden genau geprüft (Haversine-Abstand bzw. Rechteckgrenzen).
+
+    index = get_catalog().rock_index
+    index.within_radius(50.92, 14.15, 2.0)          # Fels-id -> Abstand in km
+    index.nearest(50.92, 14.15, k=5, exclude=done)  # die 5 nächsten unbegangenen
+    index.in_bbox(50.90, 14.10, 50.95, 14.20)       # Fels-ids im Rechteck
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = np.pi * EARTH_RADIUS_KM / 180
+CELL_KM = 1.0
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Großkreisabstand in km (vektorisiert)."""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+@dataclass(frozen=True)
+class RockIndex:
+    """
+    Gitterindex über alle Felsen mit Koordinaten. Arrays sind nach Zellnummer
+    sortiert (ids[i] liegt bei lat[i], lon[i] in Zelle keys[i]).
+    """
+    ids: np.ndarray
+    lat: np.ndarray
+    lon: np.ndarray
+    keys: np.ndarray
+    lat_min: float
+    lon_min: float
+    cell_lat: float
+    cell_lon: float
+    rows: int
+    cols: int
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def lat_max(self) -> float:
+        return self.lat_min + self.rows * self.cell_lat
+
+    @property
+    def lon_max(self) -> float:
+        return self.lon_min + self.cols * self.cell_lon
+
+    def _candidates(self, south: float, west: float, north: float, east: float) -> np.ndarray:
+        """Positionen aller Felsen in den Zellen, die das Rechteck berühren."""
+        if len(self.ids) == 0 or north < south or east < west:
+            return np.empty(0, dtype=int)
+        row0 = max(int(np.floor((south - self.lat_min) / self.cell_lat)), 0)
+        row1 = min(int(np.floor((north - self.lat_min) / self.cell_lat)), self.rows - 1)
+        col0 = max(int(np.floor((west - self.lon_min) / self.cell_lon)), 0)
+        col1 = min(int(np.floor((east - self.lon_min) / self.cell_lon)), self.cols - 1)
+        if row0 > row1 or col0 > col1:
+            return np.empty(0, dtype=int)
+        # Pro Gitterzeile ein zusammenhängender Abschnitt der sortierten Zellnummern
+        row_starts = np.arange(row0, row1 + 1) * self.cols
+        starts = np.searchsorted(self.keys, row_starts + col0, side="left")
+        stops = np.searchsorted(self.keys, row_starts + col1, side="right")
+        if len(starts) == 1:
+            return np.arange(starts[0], stops[0])
+        return np.concatenate([np.arange(start, stop) for start, stop in zip(starts, stops)])
+
+    def in_bbox(self, south: float, west: float, north: float, east: float) -> np.ndarray:
+        """Fels-ids innerhalb des Rechtecks (Grenzen eingeschlossen)."""
+        pos = self._candidates(south, west, north, east)
+        lat, lon = self.lat[pos], self.lon[pos]
+        inside = (lat >= south) & (lat <= north) & (lon >= west) & (lon <= east)
+        return self.ids[pos[inside]]
+
+    def _within(self, lat: float, lon: float, radius_km: float, exclude=None):
+        """Positionen und Abstände aller Felsen im Umkreis (ohne exclude), unsortiert."""
+        dlat = radius_km / KM_PER_DEGREE
+        # Längengrade werden zum Pol hin kürzer: am polnächsten Rand des Umkreises rechnen
+        cos_lat = np.cos(np.radians(min(abs(lat) + dlat, 89.9)))
+        dlon = radius_km / (KM_PER_DEGREE * cos_lat)
+        pos = self._candidates(lat - dlat, lon - dlon, lat + dlat, lon + dlon)
+        if exclude is not None and len(pos):
+            pos = pos[~np.isin(self.ids[pos], exclude)]
+        distance = haversine_km(lat, lon, self.lat[pos], self.lon[pos])
+        within = distance <= radius_km
+        return pos[within], distance[within]
+
+    def _result(self, pos: np.ndarray, distance: np.ndarray) -> pd.Series:
+        order = np.argsort(distance, kind="stable")
+        return pd.Series(distance[order], index=pd.Index(self.ids[pos[order]], name="rock_id"), name="distanz_km")
+
+    def within_radius(self, lat: float, lon: float, radius_km: float) -> pd.Series:
+        """Felsen im Umkreis: Series Fels-id -> Abstand in km, aufsteigend."""
+        return self._result(*self._within(lat, lon, radius_km))
+
+    def nearest(self, lat: float, lon: float, k: int = 5, exclude=None) -> pd.Series:
+        """
+        Die k nächsten Felsen (ohne die ids in exclude, z.B. die schon begangenen):
+        Series Fels-id -> Abstand in km, aufsteigend. Der Suchradius verdoppelt
+        sich, bis genug Felsen gefunden sind oder das ganze Gitter abgedeckt ist.
+        """
+        if exclude is not None:
+            exclude = np.asarray(list(exclude) if isinstance(exclude, (set, frozenset)) else exclude)
+        if k <= 0 or len(self.ids) == 0:
+            return self._result(np.empty(0, dtype=int), np.empty(0))
+
+        # Abstand, ab dem sicher alle Felsen im Umkreis liegen
+        corners = haversine_km(lat, lon,
+                               np.array([self.lat_min, self.lat_min, self.lat_max, self.lat_max]),
+                               np.array([self.lon_min, self.lon_max, self.lon_min, self.lon_max]))
+        cell_km = self.cell_lat * KM_PER_DEGREE
+        max_radius = float(corners.max()) + cell_km
+        radius = cell_km
+        while True:
+            pos, distance = self._within(lat, lon, radius, exclude)
+            if len(pos) >= k or radius >= max_radius:
+                break
+            radius = min(radius * 2, max_radius)
+        if len(pos) > k:
+            keep = np.argpartition(distance, k - 1)[:k]
+            pos, distance = pos[keep], distance[keep]
+        return self._result(pos, distance)
+
+
+def build_rock_index(rocks: pd.DataFrame, cell_km: float = CELL_KM) -> RockIndex:
+    """Baut den Index aus rocks (id, latitude, longitude); Felsen ohne Koordinaten fehlen darin."""
+    lat = pd.to_numeric(rocks["latitude"], errors="coerce").to_numpy(dtype=float)
+    lon = pd.to_numeric(rocks["longitude"], errors="coerce").to_numpy(dtype=float)
+    valid = np.isfinite(lat) & np.isfinite(lon)
+    ids, lat, lon = rocks["id"].to_numpy()[valid].astype(int), lat[valid], lon[valid]
+
+    if len(ids) == 0:
+        empty = np.empty(0)
+        return RockIndex(ids=empty.astype(int), lat=empty, lon=empty, keys=empty.astype(np.int64),
+                         lat_min=0.0, lon_min=0.0, cell_lat=1.0, cell_lon=1.0, rows=0, cols=0)
+
+    lat_min, lon_min = float(lat.min()), float(lon.min())
+    cell_lat = cell_km / KM_PER_DEGREE
+    cell_lon = cell_km / (KM_PER_DEGREE * np.cos(np.radians(float(np.abs(lat).max()))))
+    row = np.floor((lat - lat_min) / cell_lat).astype(np.int64)
+    col = np.floor((lon - lon_min) / cell_lon).astype(np.int64)
+    rows, cols = int(row.max()) + 1, int(col.max()) + 1
+    keys = row * cols + col
+
+    order = np.argsort(keys, kind="stable")
+    return RockIndex(ids=ids[order], lat=lat[order], lon=lon[order], keys=keys[order],
+                     lat_min=lat_min, lon_min=lon_min, cell_lat=cell_lat, cell_lon=cell_lon, rows=rows, cols=cols)
@@ -0,0 +1,191 @@
+# app_modules/statistik_engine.py
+
+"""
+Kennzahlen der Statistikseite als ein Snapshot.
+
+Die Aggregationen laufen in der Datenbank (SQL-Funktionen aus
+app_modules.statistik_sql, parallel per RPC); übertragen werden nur die kleinen
+Ergebnisse, nie die komplette Historie. Daraus entsteht ein unveränderlicher
+StatistikSnapshot, der pro Benutzer und Datenstand zwischengespeichert wird:
+eigene neue Begehungen (data_version) wirken sofort, Änderungen aus anderen
+Prozessen nach spätestens STATISTIK_TTL_SECONDS.
+"""
+
+import hashlib
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from supabase import Client
+
+from app_modules.db import get_user_client
+from app_modules.invalidation import data_version, depends_on
+from app_modules.statistik_sql import fetch_statistik
+
+# Diese Stile stehen im Monatsverlauf vorne, alle weiteren folgen alphabetisch
+MONTHLY_STYLES = ("Vorstieg", "Nachstieg")
+STATISTIK_TTL_SECONDS = 60
+# Aggregationen aus app_modules.statistik_sql, aus denen der Snapshot besteht
+SNAPSHOT_QUERIES = ("overview", "peaks_per_year", "partner_counts", "style_counts", "top_peak",
+                    "sector_progress", "monthly_styles", "recent_ascents", "oldest_comment")
+
+
+@dataclass(frozen=True)
+class StatistikSnapshot:
+    """
+    Alle Kennzahlen eines Benutzers zu einem Datenstand. Die enthaltenen
+    Series/DataFrames bitte nicht verändern. version ist ein Fingerabdruck der
+    Ergebnisse (gleiche Daten = gleiche version, z.B. für den Figure-Cache).
+
+    peaks_per_year: Jahr -> Anzahl verschiedener Gipfel
+    partner_counts / style_counts: Name -> Anzahl, absteigend (bei Gleichstand alphabetisch)
+    sector_progress: gebiet, gesamt, begangen – aufsteigend nach begangen
+    monthly_styles: Monat (Monatsende) x Stil -> Anzahl, alle Stile, lückenlos vom ersten bis zum letzten Monat
+    recent_ascents: die letzten 10 Begehungen mit gipfel_name und schwierigkeit
+    oldest_comment: dict mit datum, kommentar, gipfel_name oder None
+    """
+    version: int
+    ascents: int
+    total_rocks: int
+    done_rocks: int
+    percent_done: float
+    peaks_per_year: pd.Series
+    partner_counts: pd.Series
+    style_counts: pd.Series
+    top_partner: str | None
+    top_peak_id: int | None
+    top_peak_name: str | None
+    sector_progress: pd.DataFrame
+    monthly_styles: pd.DataFrame
+    recent_ascents: pd.DataFrame
+    oldest_comment: dict | None
+    average_per_year: float
+    remaining_peaks: int
+    years_to_goal: float | None
+    years_to_goal_doubled: float | None
+
+    @property
+    def years(self) -> list:
+        """Jahre mit Begehungen, absteigend."""
+        return sorted(self.peaks_per_year.index.astype(int).tolist(), reverse=True)
+
+    def monthly_counts(self, year: int | None = None) -> pd.DataFrame:
+        """
+        Begehungen pro Monat und Stil (optional nur ein Jahr) als Ausschnitt der
+        vorberechneten Matrix: vom ersten bis zum letzten Monat mit Begehungen,
+        nur Stile mit Begehungen im Zeitraum.
+        """
+        counts = self.monthly_styles
+        if year is not None:
+            # Index ist sortiert: Jahresausschnitt per Binärsuche
+            start, stop = counts.index.searchsorted([pd.Timestamp(year, 1, 1), pd.Timestamp(year + 1, 1, 1)])
+            counts = counts.iloc[start:stop]
+        active = np.flatnonzero(counts.to_numpy().sum(axis=1) > 0)
+        if len(active) == 0:
+            return counts.iloc[:0, :0]
+        counts = counts.iloc[active[0]:active[-1] + 1]
+        return counts.loc[:, counts.sum() > 0]
+
+
+def _counts(frame: pd.DataFrame, name: str) -> pd.Series:
+    """Name -> Anzahl in der Reihenfolge der Abfrage (ORDER BY anzahl DESC, name)."""
+    return pd.Series(frame['anzahl'].astype(int).to_numpy(), index=pd.Index(frame[name].to_numpy(), name=name), name='count')
+
+
+def _monthly_matrix(monthly: pd.DataFrame) -> pd.DataFrame:
+    """Zeilen (monat 'YYYY-MM', stil, anzahl) -> Monat (Monatsende) x Stil, lückenlos vom ersten bis zum letzten Monat."""
+    if monthly.empty:
+        return pd.DataFrame(index=pd.DatetimeIndex([]), dtype=int)
+    months = pd.PeriodIndex(monthly['monat'], freq='M')
+    matrix = monthly.assign(monat=months).pivot_table(index='monat', columns='stil', values='anzahl', aggfunc='sum', fill_value=0)
+    all_months = pd.period_range(months.min(), months.max(), freq='M')
+    styles = [stil for stil in MONTHLY_STYLES if stil in matrix.columns]
+    styles += sorted(set(matrix.columns) - set(styles))
+    matrix = matrix.reindex(index=all_months, columns=styles, fill_value=0).astype(int)
+    matrix.index = all_months.to_timestamp(how='end').normalize()
+    return matrix
+
+
+def _fingerprint(frames: dict) -> int:
+    """Stabiler Hash über alle Ergebnisse."""
+    digest = hashlib.blake2b(digest_size=8)
+    for name in sorted(frames):
+        digest.update(name.encode())
+        digest.update(pd.util.hash_pandas_object(frames[name].astype(str), index=False).to_numpy().tobytes())
+    return int.from_bytes(digest.digest(), "big") >> 1
+
+
+def build_snapshot(frames: dict) -> StatistikSnapshot:
+    """Setzt den Snapshot aus den Ergebnissen der SNAPSHOT_QUERIES ({name: DataFrame}) zusammen."""
+    overview = frames['overview'].iloc[0] if not frames['overview'].empty else {}
+    ascents = int(overview.get('ascents') or 0)
+    total_rocks = int(overview.get('total_rocks') or 0)
+    done_rocks = int(overview.get('done_rocks') or 0)
+    percent_done = round((done_rocks / total_rocks) * 100, 1) if total_rocks > 0 else 0
+
+    peaks = frames['peaks_per_year']
+    peaks_per_year = pd.Series(peaks['gipfel'].astype(int).to_numpy(), index=pd.Index(peaks['jahr'].astype(int).to_numpy(), name='jahr'), name='gipfel_id')
+
+    partner_counts = _counts(frames['partner_counts'], 'partnerin')
+    style_counts = _counts(frames['style_counts'], 'stil')
+
+    top_peak = frames['top_peak']
+    top_peak_id = int(top_peak['gipfel_id'].iloc[0]) if not top_peak.empty else None
+    top_peak_name = top_peak['name'].iloc[0] if not top_peak.empty else None
+
+    sector_progress = frames['sector_progress'].astype({'gesamt': int, 'begangen': int})
+
+    recent_ascents = frames['recent_ascents'].assign(
+        datum=lambda frame: pd.to_datetime(frame['datum'], errors='coerce'),
+        schwierigkeit=lambda frame: pd.to_numeric(frame['schwierigkeit'], errors='coerce'),
+    )
+
+    oldest_comment = None
+    if not frames['oldest_comment'].empty:
+        oldest = frames['oldest_comment'].iloc[0]
+        oldest_comment = {
+            'datum': pd.to_datetime(oldest['datum']),
+            'kommentar': str(oldest['kommentar']).strip(),
+            'gipfel_name': oldest['gipfel_name'],
+        }
+
+    # Ziel: alle Gipfel
+    average_per_year = float(peaks_per_year.mean()) if not peaks_per_year.empty else 0.0
+    remaining_peaks = total_rocks - done_rocks
+    years_to_goal = remaining_peaks / average_per_year if average_per_year > 0 else None
+    years_to_goal_doubled = remaining_peaks / (average_per_year * 2) if average_per_year > 0 else None
+
+    return StatistikSnapshot(
+        version=_fingerprint(frames),
+        ascents=ascents,
+        total_rocks=total_rocks,
+        done_rocks=done_rocks,
+        percent_done=percent_done,
+        peaks_per_year=peaks_per_year,
+        partner_counts=partner_counts,
+        style_counts=style_counts,
+        top_partner=partner_counts.index[0] if not partner_counts.empty else None,
+        top_peak_id=top_peak_id,
+        top_peak_name=top_peak_name,
+        sector_progress=sector_progress,
+        monthly_styles=_monthly_matrix(frames['monthly_styles']),
+        recent_ascents=recent_ascents,
+        oldest_comment=oldest_comment,
+        average_per_year=average_per_year,
+        remaining_peaks=remaining_peaks,
+        years_to_goal=years_to_goal,
+        years_to_goal_doubled=years_to_goal_doubled,
+    )
+
+
+# Katalogänderungen (Felsen/Routen) betreffen alle Snapshots
+@depends_on("rocks", "routes")
+@st.cache_data(ttl=STATISTIK_TTL_SECONDS, max_entries=200, show_spinner=False)
+def _cached_snapshot(_client: Client, user_id: str, version: int) -> StatistikSnapshot:
+    return build_snapshot(fetch_statistik(user_id, _client, names=SNAPSHOT_QUERIES))
+
+
+def get_statistik_snapshot(user_id: str, client: Client | None = None) -> StatistikSnapshot:
+    """Snapshot für den aktuellen Datenstand des Benutzers (neu abgefragt nach eigenen Änderungen oder nach Ablauf der TTL)."""
+    return _cached_snapshot(client or get_user_client(), user_id, data_version(f"ascents:{user_id}"))
@@ -0,0 +1,221 @@
+# app_modules/statistik_figures.py
+
+"""
+Diagramme der Statistikseite.
+
+Jedes Diagramm wird aus Spalten-Arrays gebaut: eine Spur (Trace) pro Datenreihe,
+Farben pro Punkt als Array statt einer Spur pro Zeile. Hintergrund, Schriften und
+Achsen kommen aus einer gemeinsamen Vorlage (FELSENAPP_TEMPLATE), die nur einmal
+erzeugt wird und die deutlich größere Plotly-Standardvorlage im Figure-JSON ersetzt.
+"""
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+# --- ✅ FINALES PLOT-FARBSCHEMA (PASSEND ZU app.py, WCAG-OPTIMIERT) ---
+
+# === MARKENFARBEN ===
+PLOT_HIGHLIGHT_COLOR = "#359bca"     # Primärakzent – Cyan (Vorstieg, Highlights)
+PLOT_SECONDARY_COLOR = "#9bca35"     # Sekundärakzent – Limette (Nachstieg)
+PLOT_NEGATIVE_COLOR = "#ca359b"      # Negativ/Kritisch – Magenta
+PLOT_BG_COLOR = "#F7F7F7"            # Neutraler Hintergrund – Hellgrau
+
+# === TEXT & KONTRASTE ===
+PLOT_TEXT_COLOR = "#111111"          # Maximaler Kontrast auf Hellgrau
+PLOT_MUTED_TEXT = "#4D4D4D"          # Gedämpfter Text (optional)
+PLOT_OUTLINE_COLOR = "#111111"       # Klare schwarze Outlines
+
+# Stile, die im Kreisdiagramm als "negativ" gefärbt werden
+NEGATIVE_STYLES = ('abbruch', 'fehler', 'abgebrochen')
+
+# Linienfarben im Monatsverlauf; weitere Stile bekommen reihum die übrigen Varianten der Markenfarben
+STYLE_COLORS = {'Vorstieg': PLOT_HIGHLIGHT_COLOR, 'Nachstieg': PLOT_SECONDARY_COLOR}
+EXTRA_STYLE_COLORS = (PLOT_NEGATIVE_COLOR, "#ca9b35", "#35ca9b", "#9b35ca", PLOT_MUTED_TEXT)
+
+_AXIS = dict(
+    showgrid=False,
+    zeroline=False,
+    tickfont=dict(color=PLOT_TEXT_COLOR, family='Noto Sans', size=14),
+    title=dict(font=dict(color=PLOT_TEXT_COLOR, family='Noto Sans', size=16, weight='bold')),
+)
+
+# Ersetzt das frühere apply_plotly_styles: Hintergrund, Schriftarten aus dem globalen CSS, Achsen
+FELSENAPP_TEMPLATE = go.layout.Template(layout=dict(
+    paper_bgcolor=PLOT_BG_COLOR,
+    plot_bgcolor=PLOT_BG_COLOR,
+    font=dict(color=PLOT_TEXT_COLOR, family='Noto Sans, sans-serif', size=12),
+    title=dict(font=dict(color=PLOT_TEXT_COLOR, family='Noto Sans', size=24)),
+    xaxis=_AXIS,
+    yaxis=_AXIS,
+    legend=dict(font=dict(color=PLOT_TEXT_COLOR, family='Noto Sans', size=14)),
+))
+
+_LEGEND_BOX = dict(x=0.01, y=0.99, bgcolor='rgba(255,255,255,0.7)', bordercolor=PLOT_OUTLINE_COLOR, borderwidth=1)
+_OUTLINE = dict(color=PLOT_OUTLINE_COLOR, width=3)
+
+
+def _figure(data, **layout) -> go.Figure:
+    return go.Figure(data=data, layout=go.Layout(template=FELSENAPP_TEMPLATE, **layout))
+
+
+def done_donut(percent: float) -> go.Figure:
+    """Ring mit dem Anteil der erledigten Gipfel (Grün = geschafft, Pink = offen)."""
+    return _figure(
+        go.Pie(values=[percent, 100 - percent], hole=0.7, sort=False, textinfo='none',
+               marker=dict(colors=[PLOT_SECONDARY_COLOR, PLOT_NEGATIVE_COLOR], line=_OUTLINE)),
+        showlegend=False,
+        margin=dict(t=10, b=10, l=10, r=10),
+        height=250,
+        # Prozent-Anzeige in CYAN (Hauptfarbe sichtbar!)
+        annotations=[dict(text=f"<b style='color:{PLOT_HIGHLIGHT_COLOR}'>{percent:.0f}%</b>",
+                          x=0.5, y=0.5, font_size=36, showarrow=False, font_family='Oswald')],
+    )
+
+
+def peaks_per_year_bars(years, counts) -> go.Figure:
+    """Gipfel pro Jahr als ein horizontaler Balken-Trace, das stärkste Jahr hervorgehoben."""
+    df_years = pd.DataFrame({'Jahr': [str(y) for y in years], 'Gipfel': np.asarray(counts, dtype=int)})
+    df_years = df_years.sort_values(by='Gipfel', ascending=True, kind='stable')
+
+    colors = np.full(len(df_years), PLOT_SECONDARY_COLOR, dtype=object)
+    if len(df_years):
+        colors[int(np.argmax(df_years['Gipfel'].to_numpy()))] = PLOT_HIGHLIGHT_COLOR
+
+    return _figure(
+        go.Bar(y=df_years['Jahr'], x=df_years['Gipfel'], orientation='h',
+               marker=dict(color=colors, line=_OUTLINE),
+               text=[f"{g} " for g in df_years['Gipfel']], textposition='outside',
+               insidetextfont=dict(family='Noto Sans', size=24, color='white'),
+               textfont=dict(family='Noto Sans', size=20, color=PLOT_TEXT_COLOR),
+               hovertemplate="<b>%{y}</b><br>Gipfel: %{x}<extra></extra>"),
+        title="Gipfel pro Jahr",
+        height=300,
+        margin=dict(t=40, b=20),
+        showlegend=False,
+        transition=dict(duration=500),
+        yaxis=dict(type='category', categoryorder='array', categoryarray=df_years['Jahr'].tolist()),
+        xaxis=dict(showticklabels=False),
+    )
+
+
+def partner_bars(partner_counts: pd.Series) -> go.Figure:
+    """
+    Häufigkeit der Kletterpartner*innen (absteigend sortierte Series Name -> Anzahl).
+    Top-Partner*in hervorgehoben, einmalige Partner*innen in Magenta.
+    """
+    counts = partner_counts.to_numpy()
+    colors = np.where(counts <= 1, PLOT_NEGATIVE_COLOR, PLOT_SECONDARY_COLOR).astype(object)
+    colors[0] = PLOT_HIGHLIGHT_COLOR
+    return _figure(
+        go.Bar(x=counts, y=partner_counts.index, orientation='h',
+               marker=dict(color=colors, line=_OUTLINE),
+               text=counts, textposition='outside',
+               textfont=dict(family='Noto Sans', size=20, color=PLOT_TEXT_COLOR),
+               hovertemplate="Anzahl=%{x}<br>Partner*in=%{y}<extra></extra>"),
+        title='Häufigkeit der Kletterpartner*innen',
+        showlegend=False,
+        xaxis=dict(title='Anzahl'),
+        yaxis=dict(title='Partner*in', categoryorder='total ascending'),
+    )
+
+
+def style_pie(style_counts: pd.Series) -> go.Figure:
+    """Verteilung der Kletterstile, häufigster Stil hervorgehoben."""
+    labels = style_counts.index.astype(str)
+    colors = np.where(labels.str.lower().isin(NEGATIVE_STYLES), PLOT_NEGATIVE_COLOR, PLOT_SECONDARY_COLOR).astype(object)
+    colors[0] = PLOT_HIGHLIGHT_COLOR
+    return _figure(
+        go.Pie(labels=style_counts.index, values=style_counts.to_numpy(), hole=0.4, textinfo='label+percent',
+               marker=dict(colors=colors, line=_OUTLINE),
+               textfont=dict(color=PLOT_TEXT_COLOR, family='Noto Sans')),
+        title="Verteilung der Kletterstile",
+    )
+
+
+def sector_progress_bars(sector_progress: pd.DataFrame) -> go.Figure:
+    """Gestapelte Balken pro Gebiet: zwei Traces (Begangen/Offen) statt zwei pro Gebiet."""
+    gebiet = sector_progress['gebiet']
+    begangen = sector_progress['begangen'].astype(int).to_numpy()
+    offen = sector_progress['gesamt'].astype(int).to_numpy() - begangen
+    return _figure(
+        [
+            # Grün = geschafft
+            go.Bar(y=gebiet, x=begangen, name='Begangen', orientation='h',
+                   marker=dict(color=PLOT_SECONDARY_COLOR, line=_OUTLINE)),
+            # Pink = fehlt noch
+            go.Bar(y=gebiet, x=offen, name='Offen', orientation='h',
+                   marker=dict(color=PLOT_NEGATIVE_COLOR, line=_OUTLINE)),
+        ],
+        barmode='stack',
+        title='Felsen pro Gebiet (Grün = geschafft, Pink = offen)',
+        xaxis=dict(title='Anzahl Felsen'),
+        height=600,
+        showlegend=False,
+    )
+
+
+def monthly_styles_lines(monthly_counts: pd.DataFrame, title: str) -> go.Figure:
+    """Begehungen pro Monat: eine Linie pro Stil (Spalten der Monat x Stil-Matrix)."""
+    traces = []
+    extra_colors = iter(np.resize(EXTRA_STYLE_COLORS, len(monthly_counts.columns)))
+    for stil in monthly_counts.columns:
+        color = STYLE_COLORS.get(stil) or next(extra_colors)
+        traces.append(go.Scatter(x=monthly_counts.index, y=monthly_counts[stil].to_numpy(), mode='lines+markers', name=stil,
+                                 line=dict(color=color, width=3, dash='solid'),
+                                 marker=dict(color=color, size=8, line=dict(color=PLOT_OUTLINE_COLOR, width=2))))
+    return _figure(
+        traces,
+        title=title,
+        xaxis=dict(title='Monat'),
+        yaxis=dict(title='Anzahl Begehungen'),
+        legend=_LEGEND_BOX,
+    )
+
+
+def empty_monthly_figure() -> go.Figure:
+    return _figure([], title='Keine Daten für dieses Jahr', xaxis=dict(title='Monat'), yaxis=dict(title='Anzahl Begehungen'))
+
+
+def recent_ascents_bubbles(recent_ascents: pd.DataFrame) -> go.Figure:
+    """Die letzten Begehungen als Blasen (Größe = Schwierigkeit), eine Spur pro Stil."""
+    chart_data = pd.DataFrame({
+        'Datum': pd.to_datetime(recent_ascents['datum'], errors='coerce'),
+        'Schwierigkeit': pd.to_numeric(recent_ascents['schwierigkeit'], errors='coerce').fillna(0).astype(int),
+        'Gipfel': recent_ascents['gipfel_name'].fillna('Unbekannter Gipfel'),
+        'Stil': recent_ascents['stil'].fillna('Unbekannt'),
+        'Partner': recent_ascents['partnerin'].fillna('Ohne Partner'),
+    }).sort_values(by='Datum', ascending=True)
+    # Farben basierend auf Stil
+    chart_data['Farbe'] = np.where(chart_data['Stil'] == 'Vorstieg', PLOT_HIGHLIGHT_COLOR, PLOT_SECONDARY_COLOR)
+
+    traces = []
+    for stil_type, subset in chart_data.groupby('Stil', sort=False):
+        traces.append(go.Scatter(
+            x=subset['Datum'], y=subset['Schwierigkeit'], mode='markers', name=stil_type,
+            marker=dict(size=subset['Schwierigkeit'] * 5, color=subset['Farbe'], sizemode='diameter',
+                        line=dict(color=PLOT_OUTLINE_COLOR, width=2)),
+            hovertemplate=(
+                "<b style='font-size: 18px;'>Gipfel:</b> <span style='font-size: 16px;'>%{customdata[0]}</span><br>"
+                "<b style='font-size: 18px;'>Datum:</b> <span style='font-size: 16px;'>%{x|%d.%m.%Y}</span><br>"
+                "<b style='font-size: 18px;'>Schwierigkeit:</b> <span style='font-size: 16px;'>%{y}</span><br>"
+                "<b style='font-size: 18px;'>Stil:</b> <span style='font-size: 16px;'>%{customdata[1]}</span><br>"
+                "<b style='font-size: 18px;'>Partner:</b> <span style='font-size: 16px;'>%{customdata[2]}</span><extra></extra>"
+            ),
+            customdata=subset[['Gipfel', 'Stil', 'Partner']].to_numpy(),
+        ))
+
+    # Y-Achse mit etwas Puffer (Standard 0–10 ohne Daten)
+    y_axis_range = [0, 10]
+    if not chart_data.empty:
+        y_axis_range = [max(0, chart_data['Schwierigkeit'].min() - 1), chart_data['Schwierigkeit'].max() + 1.5]
+
+    return _figure(
+        traces,
+        title="Deine letzten 10 Begehungen (Schwierigkeit als Bubble-Größe)",
+        xaxis=dict(title="Datum", tickformat='%d.%m.%Y'),
+        yaxis=dict(title="Schwierigkeit", dtick=1, range=y_axis_range),
+        showlegend=True,
+        legend=_LEGEND_BOX,
+        height=500,
+    )
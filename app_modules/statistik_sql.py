@@ -0,0 +1,246 @@
+# app_modules/statistik_sql.py
+
+"""
+Aggregationen der Statistikseite als SQL.
+
+Jede Abfrage ist in einem SQL-Dialekt geschrieben, den Postgres und SQLite
+gleichermaßen verstehen (Parameter als :p_name, Jahr/Monat über substr auf
+dem Datum als Text). Daraus entstehen
+  - die Postgres-Funktionen für Supabase (aufgerufen per client.rpc(...)),
+  - die Ausführung im lokalen SQLite-Backend (LocalClient.rpc).
+Die Statistikseite baut daraus ihren StatistikSnapshot (app_modules.statistik_engine),
+die Startseite nutzt last_climbed_rocks.
+
+Migration erzeugen:
+    python -m app_modules.statistik_sql migration sql/statistik_functions.sql
+"""
+
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+import pandas as pd
+from supabase import Client
+
+from app_modules.db import FETCH_WORKERS, get_user_client
+
+USER_PARAM = ("p_user_id", "public.ascents.user_id%TYPE")
+YEAR_PARAM = ("p_year", "integer")
+LIMIT_PARAM = ("p_limit", "integer")
+
+# Standardwerte der optionalen Parameter (p_user_id ist immer Pflicht)
+PARAM_DEFAULTS = {"p_year": None, "p_limit": 10}
+
+
+@dataclass(frozen=True)
+class StatistikQuery:
+    """Eine Aggregation: Name, SQL und die Ergebnisspalten mit ihrem Postgres-Typ."""
+    name: str
+    sql: str
+    columns: tuple
+    params: tuple = (USER_PARAM,)
+
+    @property
+    def function_name(self) -> str:
+        return f"statistik_{self.name}"
+
+    @property
+    def column_names(self) -> list:
+        return [name for name, _ in self.columns]
+
+
+QUERIES = (
+    StatistikQuery(
+        name="overview",
+        sql="""
+            SELECT (SELECT COUNT(*) FROM rocks) AS total_rocks,
+                   COUNT(DISTINCT gipfel_id) AS done_rocks,
+                   COUNT(*) AS ascents
+            FROM ascents
+            WHERE user_id = :p_user_id
+        """,
+        columns=(("total_rocks", "bigint"), ("done_rocks", "bigint"), ("ascents", "bigint")),
+    ),
+    StatistikQuery(
+        name="peaks_per_year",
+        sql="""
+            SELECT CAST(substr(CAST(datum AS TEXT), 1, 4) AS INTEGER) AS jahr,
+                   COUNT(DISTINCT gipfel_id) AS gipfel
+            FROM ascents
+            WHERE user_id = :p_user_id AND datum IS NOT NULL
+            GROUP BY 1
+            ORDER BY 1
+        """,
+        columns=(("jahr", "integer"), ("gipfel", "bigint")),
+    ),
+    StatistikQuery(
+        name="partner_counts",
+        sql="""
+            SELECT partnerin, COUNT(*) AS anzahl
+            FROM ascents
+            WHERE user_id = :p_user_id AND partnerin IS NOT NULL
+            GROUP BY partnerin
+            ORDER BY anzahl DESC, partnerin
+        """,
+        columns=(("partnerin", "public.ascents.partnerin%TYPE"), ("anzahl", "bigint")),
+    ),
+    StatistikQuery(
+        name="style_counts",
+        sql="""
+            SELECT stil, COUNT(*) AS anzahl
+            FROM ascents
+            WHERE user_id = :p_user_id AND stil IS NOT NULL
+            GROUP BY stil
+            ORDER BY anzahl DESC, stil
+        """,
+        columns=(("stil", "public.ascents.stil%TYPE"), ("anzahl", "bigint")),
+    ),
+    StatistikQuery(
+        name="top_peak",
+        sql="""
+            SELECT a.gipfel_id, r.name, COUNT(*) AS anzahl
+            FROM ascents a
+            LEFT JOIN rocks r ON r.id = a.gipfel_id
+            WHERE a.user_id = :p_user_id AND a.gipfel_id IS NOT NULL
+            GROUP BY a.gipfel_id, r.name
+            ORDER BY anzahl DESC, a.gipfel_id
+            LIMIT 1
+        """,
+        columns=(("gipfel_id", "public.ascents.gipfel_id%TYPE"), ("name", "public.rocks.name%TYPE"), ("anzahl", "bigint")),
+    ),
+    StatistikQuery(
+        name="sector_progress",
+        sql="""
+            SELECT r.sector_id, s.name AS gebiet,
+                   COUNT(r.id) AS gesamt,
+                   COUNT(d.gipfel_id) AS begangen
+            FROM rocks r
+            LEFT JOIN sector s ON s.id = r.sector_id
+            LEFT JOIN (SELECT DISTINCT gipfel_id FROM ascents WHERE user_id = :p_user_id) d ON d.gipfel_id = r.id
+            GROUP BY r.sector_id, s.name
+            ORDER BY begangen, r.sector_id
+        """,
+        columns=(("sector_id", "public.rocks.sector_id%TYPE"), ("gebiet", "public.sector.name%TYPE"),
+                 ("gesamt", "bigint"), ("begangen", "bigint")),
+    ),
+    StatistikQuery(
+        name="monthly_styles",
+        sql="""
+            SELECT substr(CAST(datum AS TEXT), 1, 7) AS monat, stil, COUNT(*) AS anzahl
+            FROM ascents
+            WHERE user_id = :p_user_id AND datum IS NOT NULL
+              AND stil IS NOT NULL AND stil <> ''
+              AND (:p_year IS NULL OR substr(CAST(datum AS TEXT), 1, 4) = CAST(:p_year AS TEXT))
+            GROUP BY 1, 2
+            ORDER BY 1, 2
+        """,
+        columns=(("monat", "text"), ("stil", "public.ascents.stil%TYPE"), ("anzahl", "bigint")),
+        params=(USER_PARAM, YEAR_PARAM),
+    ),
+    StatistikQuery(
+        name="recent_ascents",
+        sql="""
+            SELECT a.datum, a.stil, a.partnerin, a.gipfel_id, r.name AS gipfel_name, rt.number AS schwierigkeit
+            FROM ascents a
+            LEFT JOIN rocks r ON r.id = a.gipfel_id
+            LEFT JOIN routes rt ON rt.id = a.route_id
+            WHERE a.user_id = :p_user_id
+            ORDER BY (a.datum IS NULL), a.datum DESC, a.id DESC
+            LIMIT 10
+        """,
+        columns=(("datum", "public.ascents.datum%TYPE"), ("stil", "public.ascents.stil%TYPE"),
+                 ("partnerin", "public.ascents.partnerin%TYPE"), ("gipfel_id", "public.ascents.gipfel_id%TYPE"),
+                 ("gipfel_name", "public.rocks.name%TYPE"), ("schwierigkeit", "public.routes.number%TYPE")),
+    ),
+    StatistikQuery(
+        name="last_climbed_rocks",
+        sql="""
+            SELECT gipfel_id, MAX(datum) AS zuletzt
+            FROM ascents
+            WHERE user_id = :p_user_id AND gipfel_id IS NOT NULL AND datum IS NOT NULL
+            GROUP BY gipfel_id
+            ORDER BY zuletzt DESC, gipfel_id
+            LIMIT :p_limit
+        """,
+        columns=(("gipfel_id", "public.ascents.gipfel_id%TYPE"), ("zuletzt", "public.ascents.datum%TYPE")),
+        params=(USER_PARAM, LIMIT_PARAM),
+    ),
+    StatistikQuery(
+        name="oldest_comment",
+        sql="""
+            SELECT a.datum, a.kommentar, r.name AS gipfel_name
+            FROM ascents a
+            LEFT JOIN rocks r ON r.id = a.gipfel_id
+            WHERE a.user_id = :p_user_id AND a.datum IS NOT NULL
+              AND a.kommentar IS NOT NULL AND TRIM(a.kommentar) <> ''
+            ORDER BY a.datum, a.id
+            LIMIT 1
+        """,
+        columns=(("datum", "public.ascents.datum%TYPE"), ("kommentar", "public.ascents.kommentar%TYPE"),
+                 ("gipfel_name", "public.rocks.name%TYPE")),
+    ),
+)
+
+# Nach Funktionsname, so wie sie per rpc() aufgerufen werden
+FUNCTIONS = {query.function_name: query for query in QUERIES}
+_BY_NAME = {query.name: query for query in QUERIES}
+
+
+def postgres_function(query: StatistikQuery) -> str:
+    """CREATE FUNCTION für Postgres/Supabase (läuft mit den Rechten des Aufrufers, RLS greift)."""
+    def default_sql(name):
+        if name not in PARAM_DEFAULTS:
+            return ""
+        default = PARAM_DEFAULTS[name]
+        return " DEFAULT NULL" if default is None else f" DEFAULT {default}"
+
+    params = ", ".join(f"{name} {pg_type}{default_sql(name)}" for name, pg_type in query.params)
+    returns = ", ".join(f"{name} {pg_type}" for name, pg_type in query.columns)
+    body = query.sql
+    for name, _ in query.params:
+        body = body.replace(f":{name}", name)
+    return (
+        f"CREATE OR REPLACE FUNCTION public.{query.function_name}({params})\n"
+        f"RETURNS TABLE ({returns})\n"
+        f"LANGUAGE sql STABLE\n"
+        f"AS $${body.rstrip()}\n$$;\n"
+    )
+
+
+def postgres_migration() -> str:
+    header = "-- Erzeugt mit: python -m app_modules.statistik_sql migration\n-- Nicht von Hand bearbeiten, Quelle ist app_modules/statistik_sql.py\n\n"
+    return header + "\n".join(postgres_function(query) for query in QUERIES)
+
+
+def run_query(name: str, user_id: str, client: Client | None = None, **params) -> pd.DataFrame:
+    """Führt eine Aggregation als RPC aus und gibt das (kleine) Ergebnis als DataFrame zurück."""
+    query = _BY_NAME[name]
+    args = {"p_user_id": user_id}
+    args.update({key if key.startswith("p_") else f"p_{key}": value for key, value in params.items()})
+    data = (client or get_user_client()).rpc(query.function_name, args).execute().data
+    return pd.DataFrame(data or [], columns=query.column_names)
+
+
+def fetch_statistik(user_id: str, client: Client | None = None, names=None) -> dict:
+    """
+    Führt mehrere Aggregationen parallel aus (Standard: alle ohne zusätzliche Parameter).
+    Gibt {name: DataFrame} zurück.
+    """
+    client = client or get_user_client()
+    if names is None:
+        names = [query.name for query in QUERIES if query.params == (USER_PARAM,)]
+    with ThreadPoolExecutor(max_workers=min(FETCH_WORKERS, len(names)) or 1) as executor:
+        frames = executor.map(lambda name: run_query(name, user_id, client), names)
+        return dict(zip(names, frames))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "migration":
+        path = sys.argv[2] if len(sys.argv) > 2 else os.path.join("sql", "statistik_functions.sql")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(postgres_migration())
+        print(f"Migration geschrieben: {path}")
+    else:
+        print("Aufruf: python -m app_modules.statistik_sql migration [pfad.sql]")
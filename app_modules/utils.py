@@ -1,72 +1,64 @@
 # app_modules/utils.py
 
-import pandas as pd
 import streamlit as st
 from supabase import Client
 
-def get_last_climbed_rocks_data(supabase: Client, user_id: str, num_rocks: int = 10):
+from app_modules.ascents_store import ascents_version
+from app_modules.catalog import get_catalog
+from app_modules.invalidation import depends_on
+from app_modules.statistik_sql import run_query
+
+# Namen kommen aus dem Katalog, die Begehungen sind über version abgedeckt
+@depends_on("rocks")
+@st.cache_data(ttl=60)
+def fetch_last_climbed_rocks(_supabase: Client, user_id: str, num_rocks: int = 10, version: int = 0):
     """
-    Ruft die Daten der letzten N bestiegenen Felsen für einen bestimmten Benutzer ab.
-    Gibt eine Liste von Dictionaries mit 'name' und 'gipfel_id' zurück.
+    Die letzten N bestiegenen Felsen eines Benutzers als Liste von Dictionaries mit 'name' und 'gipfel_id'.
+
+    Die Datenbank liefert direkt die N verschiedenen Gipfel mit der jüngsten Begehung
+    (eine kleine Abfrage, auch wenn ein Gipfel sehr oft wiederholt wurde),
+    die Namen kommen aus dem Katalog.
+    version (ascents_version) gehört zum Cache-Schlüssel, damit eine neu gespeicherte Begehung sofort erscheint.
+    Enthält keine Streamlit-Ausgaben (läuft auch im Home-Loader im Hintergrund-Thread), Fehler werden weitergereicht.
     """
     if not user_id:
         return []
 
-    try:
-        # 1. Begehungen (ascents) abrufen, sortiert nach Datum absteigend
-        ascents_data = supabase.table("ascents").select("gipfel_id, datum").eq("user_id", user_id).order("datum", desc=True).limit(num_rocks * 3).execute().data
-        ascents_df = pd.DataFrame(ascents_data)
-
-        if ascents_df.empty:
-            return []
-
-        # Sicherstellen, dass 'datum' ein datetime-Objekt ist und ungültige Daten entfernen
-        ascents_df['datum'] = pd.to_datetime(ascents_df['datum'], errors='coerce')
-        ascents_df.dropna(subset=['datum'], inplace=True)
-
-        # 2. Felsen (rocks) abrufen, um Namen zu bekommen
-        unique_gipfel_ids = ascents_df['gipfel_id'].dropna().astype(int).unique().tolist()
-        if not unique_gipfel_ids:
-            return []
-
-        rocks_data = supabase.table("rocks").select("id, name").in_("id", unique_gipfel_ids).execute().data
-        rocks_df = pd.DataFrame(rocks_data)
-
-        if rocks_df.empty:
-            return []
-
-        # 3. Begehungen mit Felsen-Namen mergen und die letzten N einzigartigen auswählen
-        merged_df = pd.merge(
-            ascents_df,
-            rocks_df,
-            left_on='gipfel_id',
-            right_on='id',
-            how='inner'
-        )
-
-        # Sortiere nochmals nach Datum (wichtig, um die neuesten Duplikate zu behalten)
-        merged_df = merged_df.sort_values(by='datum', ascending=False)
-
-        # Entferne Duplikate basierend auf 'gipfel_id', behalte den ersten (also den neuesten)
-        last_unique_climbs = merged_df.drop_duplicates(subset=['gipfel_id'], keep='first')
+    last_rocks = run_query("last_climbed_rocks", user_id, _supabase, limit=num_rocks)
+    if last_rocks.empty:
+        return []
 
-        # Wähle die letzten N einzigartigen bestiegenen Felsen aus
-        result = last_unique_climbs[['name', 'gipfel_id']].head(num_rocks).to_dict(orient='records')
-        
-        return result
+    rock_names = get_catalog(_supabase).rock_names
+    result = []
+    for gipfel_id in last_rocks['gipfel_id'].astype(int).tolist():
+        result.append({'name': rock_names.get(gipfel_id, f"Gipfel #{gipfel_id}"), 'gipfel_id': gipfel_id})
+    return result
 
+def get_last_climbed_rocks_data(_supabase: Client, user_id: str, num_rocks: int = 10):
+    """
+    Ruft die Daten der letzten N bestiegenen Felsen für einen bestimmten Benutzer ab.
+    Gibt eine Liste von Dictionaries mit 'name' und 'gipfel_id' zurück.
+    """
+    try:
+        return fetch_last_climbed_rocks(_supabase, user_id, num_rocks, ascents_version(user_id))
     except Exception as e:
         st.error(f"Fehler beim Abrufen der letzten bestiegenen Felsen: {e}")
         return []
 
 # --- Neue Funktion zum Anzeigen in Streamlit ---
-def display_last_climbed_rocks(supabase: Client, user_id: str, num_rocks: int = 10):
+def display_last_climbed_rocks(supabase: Client, user_id: str, num_rocks: int = 10, last_climbs=None, error=None):
     """
     Zeigt die Liste der letzten N bestiegenen Felsen in Streamlit an.
+    last_climbs/error: bereits geladene Daten bzw. Ladefehler (z.B. aus dem Home-Loader),
+    ohne beides wird hier geladen.
     """
     st.subheader(f"Zuletzt bestiegene Gipfel ({num_rocks})")
     
-    last_climbs = get_last_climbed_rocks_data(supabase, user_id, num_rocks)
+    if error is not None:
+        st.error(f"Fehler beim Abrufen der letzten bestiegenen Felsen: {error}")
+        last_climbs = []
+    elif last_climbs is None:
+        last_climbs = get_last_climbed_rocks_data(supabase, user_id, num_rocks)
 
     if last_climbs:
         for i, rock in enumerate(last_climbs):
@@ -2,38 +2,27 @@ import streamlit as st
 import pandas as pd
 import folium
 from streamlit_folium import st_folium
-from supabase import create_client
-from dotenv import load_dotenv
-import os
-import math
 
-# 🔐 Supabase-Verbindung
-load_dotenv()
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+from app_modules.db import fetch_all_rows, get_client, has_credentials
+from app_modules.invalidation import depends_on
+from app_modules.map_geometry import triangle_feature_collection, triangle_layer
 
-if not SUPABASE_URL or not SUPABASE_KEY:
+# 🔐 Supabase-Verbindung
+if not has_credentials():
     st.error("❌ SUPABASE_URL oder SUPABASE_KEY fehlt in .env")
     st.stop()
 
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
-
+@depends_on("rocks")
 @st.cache_data
 def load_rocks():
-    response = supabase.table("rocks").select("id, name, latitude, longitude").execute()
-    df = pd.DataFrame(response.data)
+    # Alle Felsen über den geteilten Client, seitenweise (mehr als 1000 Zeilen)
+    df = pd.DataFrame(fetch_all_rows("rocks", "id, name, latitude, longitude", client=get_client()))
+    if df.empty:
+        return df
     df["latitude"] = pd.to_numeric(df["latitude"], errors="coerce")
     df["longitude"] = pd.to_numeric(df["longitude"], errors="coerce")
     return df.dropna(subset=["latitude", "longitude"])
 
-def make_triangle(lat, lon, size=0.0005):
-    # Einfaches gleichseitiges Dreieck mit Spitze nach oben
-    return [
-        [lat + size, lon],
-        [lat - size / 2, lon - size * math.sqrt(3)/2],
-        [lat - size / 2, lon + size * math.sqrt(3)/2]
-    ]
-
 def show_map(df):
     if df.empty:
         st.warning("Keine gültigen Koordinaten gefunden.")
@@ -43,16 +32,10 @@ def show_map(df):
     lon_center = df["longitude"].mean()
     m = folium.Map(location=[lat_center, lon_center], zoom_start=11)
 
-    for _, row in df.iterrows():
-        triangle = make_triangle(row["latitude"], row["longitude"])
-        folium.Polygon(
-            locations=triangle,
-            color="blue",
-            fill=True,
-            fill_opacity=0.6,
-            popup=row["name"],
-            tooltip=f"Gipfel #{row['id']}: {row['name']}"
-        ).add_to(m)
+    # Alle Dreiecke als eine GeoJSON-Ebene statt einem Polygon pro Gipfel
+    tooltip = "Gipfel #" + df["id"].astype(str) + ": " + df["name"].astype(str)
+    triangles = triangle_feature_collection(df, 0.0005, "blue", tooltip, properties=["name"])
+    triangle_layer(triangles, fill_opacity=0.6, stroke_color="blue", popup_field="name").add_to(m)
 
     st_folium(m, width=1000, height=600)
 
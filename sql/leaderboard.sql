@@ -0,0 +1,113 @@
+-- Erzeugt mit: python -m app_modules.leaderboard_sql migration
+-- Nicht von Hand bearbeiten, Quelle ist app_modules/leaderboard_sql.py
+
+CREATE TABLE IF NOT EXISTS leaderboard_peaks (user_id TEXT NOT NULL, gipfel_id BIGINT NOT NULL, begehungen INTEGER NOT NULL, PRIMARY KEY (user_id, gipfel_id));
+CREATE TABLE IF NOT EXISTS leaderboard_peak_years (user_id TEXT NOT NULL, jahr INTEGER NOT NULL, gipfel_id BIGINT NOT NULL, begehungen INTEGER NOT NULL, PRIMARY KEY (user_id, jahr, gipfel_id));
+CREATE TABLE IF NOT EXISTS leaderboard_users (user_id TEXT NOT NULL, gipfel INTEGER NOT NULL, begehungen INTEGER NOT NULL, PRIMARY KEY (user_id));
+CREATE TABLE IF NOT EXISTS leaderboard_sectors (user_id TEXT NOT NULL, sector_id BIGINT NOT NULL, gipfel INTEGER NOT NULL, PRIMARY KEY (user_id, sector_id));
+CREATE TABLE IF NOT EXISTS leaderboard_years (user_id TEXT NOT NULL, jahr INTEGER NOT NULL, gipfel INTEGER NOT NULL, PRIMARY KEY (user_id, jahr));
+
+ALTER TABLE public.leaderboard_peaks ENABLE ROW LEVEL SECURITY;
+DROP POLICY IF EXISTS leaderboard_peaks_read ON public.leaderboard_peaks;
+CREATE POLICY leaderboard_peaks_read ON public.leaderboard_peaks FOR SELECT TO authenticated USING (true);
+ALTER TABLE public.leaderboard_peak_years ENABLE ROW LEVEL SECURITY;
+DROP POLICY IF EXISTS leaderboard_peak_years_read ON public.leaderboard_peak_years;
+CREATE POLICY leaderboard_peak_years_read ON public.leaderboard_peak_years FOR SELECT TO authenticated USING (true);
+ALTER TABLE public.leaderboard_users ENABLE ROW LEVEL SECURITY;
+DROP POLICY IF EXISTS leaderboard_users_read ON public.leaderboard_users;
+CREATE POLICY leaderboard_users_read ON public.leaderboard_users FOR SELECT TO authenticated USING (true);
+ALTER TABLE public.leaderboard_sectors ENABLE ROW LEVEL SECURITY;
+DROP POLICY IF EXISTS leaderboard_sectors_read ON public.leaderboard_sectors;
+CREATE POLICY leaderboard_sectors_read ON public.leaderboard_sectors FOR SELECT TO authenticated USING (true);
+ALTER TABLE public.leaderboard_years ENABLE ROW LEVEL SECURITY;
+DROP POLICY IF EXISTS leaderboard_years_read ON public.leaderboard_years;
+CREATE POLICY leaderboard_years_read ON public.leaderboard_years FOR SELECT TO authenticated USING (true);
+
+CREATE OR REPLACE FUNCTION public.leaderboard_on_ascent()
+RETURNS trigger
+LANGUAGE plpgsql SECURITY DEFINER SET search_path = public
+AS $$
+BEGIN
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        UPDATE leaderboard_users SET gipfel = gipfel - (SELECT COUNT(*) FROM leaderboard_peaks WHERE user_id = CAST(OLD.user_id AS TEXT) AND gipfel_id = OLD.gipfel_id AND begehungen = 1), begehungen = begehungen - 1
+               WHERE user_id = CAST(OLD.user_id AS TEXT);
+        UPDATE leaderboard_sectors SET gipfel = gipfel - 1
+               WHERE user_id = CAST(OLD.user_id AS TEXT) AND sector_id = (SELECT sector_id FROM rocks WHERE id = OLD.gipfel_id)
+                 AND (SELECT COUNT(*) FROM leaderboard_peaks WHERE user_id = CAST(OLD.user_id AS TEXT) AND gipfel_id = OLD.gipfel_id AND begehungen = 1) = 1;
+        UPDATE leaderboard_years SET gipfel = gipfel - 1
+               WHERE user_id = CAST(OLD.user_id AS TEXT) AND jahr = CAST(substr(CAST(OLD.datum AS TEXT), 1, 4) AS INTEGER) AND (SELECT COUNT(*) FROM leaderboard_peak_years WHERE user_id = CAST(OLD.user_id AS TEXT) AND jahr = CAST(substr(CAST(OLD.datum AS TEXT), 1, 4) AS INTEGER) AND gipfel_id = OLD.gipfel_id AND begehungen = 1) = 1;
+        UPDATE leaderboard_peaks SET begehungen = begehungen - 1
+               WHERE user_id = CAST(OLD.user_id AS TEXT) AND gipfel_id = OLD.gipfel_id;
+        DELETE FROM leaderboard_peaks WHERE user_id = CAST(OLD.user_id AS TEXT) AND gipfel_id = OLD.gipfel_id AND begehungen <= 0;
+        UPDATE leaderboard_peak_years SET begehungen = begehungen - 1
+               WHERE user_id = CAST(OLD.user_id AS TEXT) AND jahr = CAST(substr(CAST(OLD.datum AS TEXT), 1, 4) AS INTEGER) AND gipfel_id = OLD.gipfel_id;
+        DELETE FROM leaderboard_peak_years
+               WHERE user_id = CAST(OLD.user_id AS TEXT) AND jahr = CAST(substr(CAST(OLD.datum AS TEXT), 1, 4) AS INTEGER) AND gipfel_id = OLD.gipfel_id AND begehungen <= 0;
+        DELETE FROM leaderboard_users WHERE user_id = CAST(OLD.user_id AS TEXT) AND begehungen <= 0;
+        DELETE FROM leaderboard_sectors WHERE user_id = CAST(OLD.user_id AS TEXT) AND gipfel <= 0;
+        DELETE FROM leaderboard_years WHERE user_id = CAST(OLD.user_id AS TEXT) AND gipfel <= 0;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO leaderboard_peaks (user_id, gipfel_id, begehungen)
+               SELECT CAST(NEW.user_id AS TEXT), NEW.gipfel_id, 1 WHERE CAST(NEW.user_id AS TEXT) IS NOT NULL AND NEW.gipfel_id IS NOT NULL
+               ON CONFLICT (user_id, gipfel_id) DO UPDATE SET begehungen = leaderboard_peaks.begehungen + 1;
+        INSERT INTO leaderboard_peak_years (user_id, jahr, gipfel_id, begehungen)
+               SELECT CAST(NEW.user_id AS TEXT), CAST(substr(CAST(NEW.datum AS TEXT), 1, 4) AS INTEGER), NEW.gipfel_id, 1
+               WHERE CAST(NEW.user_id AS TEXT) IS NOT NULL AND NEW.gipfel_id IS NOT NULL AND NEW.datum IS NOT NULL
+               ON CONFLICT (user_id, jahr, gipfel_id) DO UPDATE SET begehungen = leaderboard_peak_years.begehungen + 1;
+        INSERT INTO leaderboard_users (user_id, gipfel, begehungen)
+               SELECT CAST(NEW.user_id AS TEXT), (SELECT COUNT(*) FROM leaderboard_peaks WHERE user_id = CAST(NEW.user_id AS TEXT) AND gipfel_id = NEW.gipfel_id AND begehungen = 1), 1 WHERE CAST(NEW.user_id AS TEXT) IS NOT NULL
+               ON CONFLICT (user_id) DO UPDATE SET gipfel = leaderboard_users.gipfel + excluded.gipfel,
+                                                   begehungen = leaderboard_users.begehungen + 1;
+        INSERT INTO leaderboard_sectors (user_id, sector_id, gipfel)
+               SELECT CAST(NEW.user_id AS TEXT), r.sector_id, 1 FROM rocks r
+               WHERE r.id = NEW.gipfel_id AND r.sector_id IS NOT NULL AND (SELECT COUNT(*) FROM leaderboard_peaks WHERE user_id = CAST(NEW.user_id AS TEXT) AND gipfel_id = NEW.gipfel_id AND begehungen = 1) = 1
+               ON CONFLICT (user_id, sector_id) DO UPDATE SET gipfel = leaderboard_sectors.gipfel + 1;
+        INSERT INTO leaderboard_years (user_id, jahr, gipfel)
+               SELECT CAST(NEW.user_id AS TEXT), CAST(substr(CAST(NEW.datum AS TEXT), 1, 4) AS INTEGER), 1 WHERE (SELECT COUNT(*) FROM leaderboard_peak_years WHERE user_id = CAST(NEW.user_id AS TEXT) AND jahr = CAST(substr(CAST(NEW.datum AS TEXT), 1, 4) AS INTEGER) AND gipfel_id = NEW.gipfel_id AND begehungen = 1) = 1
+               ON CONFLICT (user_id, jahr) DO UPDATE SET gipfel = leaderboard_years.gipfel + 1;
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+DROP TRIGGER IF EXISTS leaderboard_on_ascent ON public.ascents;
+CREATE TRIGGER leaderboard_on_ascent
+AFTER INSERT OR UPDATE OR DELETE ON public.ascents
+FOR EACH ROW EXECUTE FUNCTION public.leaderboard_on_ascent();
+
+
+CREATE OR REPLACE FUNCTION public.leaderboard_rebuild()
+RETURNS void
+LANGUAGE plpgsql SECURITY DEFINER SET search_path = public
+AS $$
+BEGIN
+    DELETE FROM leaderboard_peaks;
+    DELETE FROM leaderboard_peak_years;
+    DELETE FROM leaderboard_users;
+    DELETE FROM leaderboard_sectors;
+    DELETE FROM leaderboard_years;
+    INSERT INTO leaderboard_peaks (user_id, gipfel_id, begehungen)
+           SELECT user_id, gipfel_id, COUNT(*) FROM ascents
+           WHERE user_id IS NOT NULL AND gipfel_id IS NOT NULL
+           GROUP BY user_id, gipfel_id;
+    INSERT INTO leaderboard_peak_years (user_id, jahr, gipfel_id, begehungen)
+           SELECT user_id, CAST(substr(CAST(ascents.datum AS TEXT), 1, 4) AS INTEGER), gipfel_id, COUNT(*) FROM ascents
+           WHERE user_id IS NOT NULL AND gipfel_id IS NOT NULL AND datum IS NOT NULL
+           GROUP BY 1, 2, 3;
+    INSERT INTO leaderboard_users (user_id, gipfel, begehungen)
+           SELECT user_id, COUNT(DISTINCT gipfel_id), COUNT(*) FROM ascents
+           WHERE user_id IS NOT NULL
+           GROUP BY user_id;
+    INSERT INTO leaderboard_sectors (user_id, sector_id, gipfel)
+           SELECT p.user_id, r.sector_id, COUNT(*) FROM leaderboard_peaks p JOIN rocks r ON r.id = p.gipfel_id
+           WHERE r.sector_id IS NOT NULL
+           GROUP BY 1, 2;
+    INSERT INTO leaderboard_years (user_id, jahr, gipfel)
+           SELECT user_id, jahr, COUNT(*) FROM leaderboard_peak_years
+           GROUP BY 1, 2;
+END
+$$;
+REVOKE EXECUTE ON FUNCTION public.leaderboard_rebuild() FROM PUBLIC, anon, authenticated;
+
+SELECT public.leaderboard_rebuild();
@@ -0,0 +1,125 @@
+-- Erzeugt mit: python -m app_modules.statistik_sql migration
+-- Nicht von Hand bearbeiten, Quelle ist app_modules/statistik_sql.py
+
+CREATE OR REPLACE FUNCTION public.statistik_overview(p_user_id public.ascents.user_id%TYPE)
+RETURNS TABLE (total_rocks bigint, done_rocks bigint, ascents bigint)
+LANGUAGE sql STABLE
+AS $$
+            SELECT (SELECT COUNT(*) FROM rocks) AS total_rocks,
+                   COUNT(DISTINCT gipfel_id) AS done_rocks,
+                   COUNT(*) AS ascents
+            FROM ascents
+            WHERE user_id = p_user_id
+$$;
+
+CREATE OR REPLACE FUNCTION public.statistik_peaks_per_year(p_user_id public.ascents.user_id%TYPE)
+RETURNS TABLE (jahr integer, gipfel bigint)
+LANGUAGE sql STABLE
+AS $$
+            SELECT CAST(substr(CAST(datum AS TEXT), 1, 4) AS INTEGER) AS jahr,
+                   COUNT(DISTINCT gipfel_id) AS gipfel
+            FROM ascents
+            WHERE user_id = p_user_id AND datum IS NOT NULL
+            GROUP BY 1
+            ORDER BY 1
+$$;
+
+CREATE OR REPLACE FUNCTION public.statistik_partner_counts(p_user_id public.ascents.user_id%TYPE)
+RETURNS TABLE (partnerin public.ascents.partnerin%TYPE, anzahl bigint)
+LANGUAGE sql STABLE
+AS $$
+            SELECT partnerin, COUNT(*) AS anzahl
+            FROM ascents
+            WHERE user_id = p_user_id AND partnerin IS NOT NULL
+            GROUP BY partnerin
+            ORDER BY anzahl DESC, partnerin
+$$;
+
+CREATE OR REPLACE FUNCTION public.statistik_style_counts(p_user_id public.ascents.user_id%TYPE)
+RETURNS TABLE (stil public.ascents.stil%TYPE, anzahl bigint)
+LANGUAGE sql STABLE
+AS $$
+            SELECT stil, COUNT(*) AS anzahl
+            FROM ascents
+            WHERE user_id = p_user_id AND stil IS NOT NULL
+            GROUP BY stil
+            ORDER BY anzahl DESC, stil
+$$;
+
+CREATE OR REPLACE FUNCTION public.statistik_top_peak(p_user_id public.ascents.user_id%TYPE)
+RETURNS TABLE (gipfel_id public.ascents.gipfel_id%TYPE, name public.rocks.name%TYPE, anzahl bigint)
+LANGUAGE sql STABLE
+AS $$
+            SELECT a.gipfel_id, r.name, COUNT(*) AS anzahl
+            FROM ascents a
+            LEFT JOIN rocks r ON r.id = a.gipfel_id
+            WHERE a.user_id = p_user_id AND a.gipfel_id IS NOT NULL
+            GROUP BY a.gipfel_id, r.name
+            ORDER BY anzahl DESC, a.gipfel_id
+            LIMIT 1
+$$;
+
+CREATE OR REPLACE FUNCTION public.statistik_sector_progress(p_user_id public.ascents.user_id%TYPE)
+RETURNS TABLE (sector_id public.rocks.sector_id%TYPE, gebiet public.sector.name%TYPE, gesamt bigint, begangen bigint)
+LANGUAGE sql STABLE
+AS $$
+            SELECT r.sector_id, s.name AS gebiet,
+                   COUNT(r.id) AS gesamt,
+                   COUNT(d.gipfel_id) AS begangen
+            FROM rocks r
+            LEFT JOIN sector s ON s.id = r.sector_id
+            LEFT JOIN (SELECT DISTINCT gipfel_id FROM ascents WHERE user_id = p_user_id) d ON d.gipfel_id = r.id
+            GROUP BY r.sector_id, s.name
+            ORDER BY begangen, r.sector_id
+$$;
+
+CREATE OR REPLACE FUNCTION public.statistik_monthly_styles(p_user_id public.ascents.user_id%TYPE, p_year integer DEFAULT NULL)
+RETURNS TABLE (monat text, stil public.ascents.stil%TYPE, anzahl bigint)
+LANGUAGE sql STABLE
+AS $$
+            SELECT substr(CAST(datum AS TEXT), 1, 7) AS monat, stil, COUNT(*) AS anzahl
+            FROM ascents
+            WHERE user_id = p_user_id AND datum IS NOT NULL
+              AND stil IS NOT NULL AND stil <> ''
+              AND (p_year IS NULL OR substr(CAST(datum AS TEXT), 1, 4) = CAST(p_year AS TEXT))
+            GROUP BY 1, 2
+            ORDER BY 1, 2
+$$;
+
+CREATE OR REPLACE FUNCTION public.statistik_recent_ascents(p_user_id public.ascents.user_id%TYPE)
+RETURNS TABLE (datum public.ascents.datum%TYPE, stil public.ascents.stil%TYPE, partnerin public.ascents.partnerin%TYPE, gipfel_id public.ascents.gipfel_id%TYPE, gipfel_name public.rocks.name%TYPE, schwierigkeit public.routes.number%TYPE)
+LANGUAGE sql STABLE
+AS $$
+            SELECT a.datum, a.stil, a.partnerin, a.gipfel_id, r.name AS gipfel_name, rt.number AS schwierigkeit
+            FROM ascents a
+            LEFT JOIN rocks r ON r.id = a.gipfel_id
+            LEFT JOIN routes rt ON rt.id = a.route_id
+            WHERE a.user_id = p_user_id
+            ORDER BY (a.datum IS NULL), a.datum DESC, a.id DESC
+            LIMIT 10
+$$;
+
+CREATE OR REPLACE FUNCTION public.statistik_last_climbed_rocks(p_user_id public.ascents.user_id%TYPE, p_limit integer DEFAULT 10)
+RETURNS TABLE (gipfel_id public.ascents.gipfel_id%TYPE, zuletzt public.ascents.datum%TYPE)
+LANGUAGE sql STABLE
+AS $$
+            SELECT gipfel_id, MAX(datum) AS zuletzt
+            FROM ascents
+            WHERE user_id = p_user_id AND gipfel_id IS NOT NULL AND datum IS NOT NULL
+            GROUP BY gipfel_id
+            ORDER BY zuletzt DESC, gipfel_id
+            LIMIT p_limit
+$$;
+
+CREATE OR REPLACE FUNCTION public.statistik_oldest_comment(p_user_id public.ascents.user_id%TYPE)
+RETURNS TABLE (datum public.ascents.datum%TYPE, kommentar public.ascents.kommentar%TYPE, gipfel_name public.rocks.name%TYPE)
+LANGUAGE sql STABLE
+AS $$
+            SELECT a.datum, a.kommentar, r.name AS gipfel_name
+            FROM ascents a
+            LEFT JOIN rocks r ON r.id = a.gipfel_id
+            WHERE a.user_id = p_user_id AND a.datum IS NOT NULL
+              AND a.kommentar IS NOT NULL AND TRIM(a.kommentar) <> ''
+            ORDER BY a.datum, a.id
+            LIMIT 1
+$$;